@@ -20,10 +20,20 @@ from bot.infra.db import (
     get_admin_users,
     get_event_logs,
     get_site_by_id,
+    get_user_check_settings,
     get_user_logs,
     log_user_action,
+    set_site_check_settings_by_id,
     set_site_paused_by_id,
+    set_user_check_settings,
 )
+from bot.checks.domain_cache import domain_registrations
+from bot.checks.geoip_cache import enrich_ips
+from bot.checks.subdomain_cache import subdomain_scans
+from bot.core.status_formatter import country_flag
+from bot.checks.whois_client import whois_client
+from bot.core.check_settings import PRIORITY_LABELS, CheckSettingsError, parse_interval
+from bot.infra.dns_resolver import resolver
 
 
 ADMIN_WEB_TOKEN = os.getenv("ADMIN_WEB_TOKEN")
@@ -50,6 +60,70 @@ def redirect_messages(result: str) -> web.HTTPFound:
     return web.HTTPFound("/admin/messages?" + urlencode({"result": result}))
 
 
+def fmt_network(site) -> str:
+    if not site["ip"]:
+        return "—"
+    parts = [esc(site["ip"])]
+    if site["country"]:
+        parts.append(f"{country_flag(site['country'])} {esc(site['country'])}")
+    if site["asn"] is not None:
+        parts.append(f"AS{site['asn']} {esc(site['as_name'] or '')}".strip())
+    return "<br>".join(parts)
+
+
+def check_settings_form(action, interval, priority) -> str:
+    """Интервал (минуты) и приоритет; пустые значения — наследовать от пользователя или общие."""
+    options = [("", "приоритет по умолчанию")] + [(str(value), label) for value, label in PRIORITY_LABELS.items()]
+    selected = "" if priority is None else str(priority)
+    options_html = "".join(
+        f'<option value="{value}"{" selected" if value == selected else ""}>{esc(label)}</option>'
+        for value, label in options
+    )
+    return f"""<form class="settings" method="post" action="{action}">
+  <input name="interval" value="{esc(interval)}" placeholder="мин" inputmode="numeric" title="Интервал проверки, минут">
+  <select name="priority">{options_html}</select>
+  <button class="secondary" type="submit">Сохранить</button>
+</form>"""
+
+
+async def read_check_settings(request: web.Request):
+    form = await request.post()
+    interval = (form.get("interval") or "").strip()
+    priority = (form.get("priority") or "").strip()
+    try:
+        interval = parse_interval(interval) if interval else None
+    except CheckSettingsError as e:
+        raise web.HTTPBadRequest(text=str(e))
+    if priority and (not priority.isdigit() or int(priority) not in PRIORITY_LABELS):
+        raise web.HTTPBadRequest(text="неизвестный приоритет")
+    return interval, int(priority) if priority else None
+
+
+def scheduler_panel(engine) -> str:
+    """Загрузка планировщика проверок: очереди стадий, отставание от расписания, перекрытия."""
+    if engine is None:
+        return ""
+    stats = engine.stats()
+    metrics = [
+        ("Ресурсов в расписании", stats["targets"]),
+        ("Занято воркеров", f"{stats['busy']}/{stats['workers']}"),
+        ("Ждут записи", stats["writing"]),
+        ("Ждут в очереди", stats["queued"]),
+        ("Дольше всех ждёт, с", f"{stats['oldest_wait']:.0f}"),
+        ("Отставание среднее, с", f"{stats['lag_avg']:.1f}"),
+        ("Отставание p95, с", f"{stats['lag_p95']:.1f}"),
+        ("Проверка в среднем, с", f"{stats['check_avg']:.1f}"),
+        ("Отложено до конца прошлой проверки", stats["backlog"]),
+        ("Срок наступил во время проверки", stats["overlaps"]),
+        ("Начаты позже следующего слота", stats["late"]),
+    ]
+    tiles = "".join(f'<div class="metric"><strong>{value}</strong><span>{label}</span></div>' for label, value in metrics)
+    state = (
+        '<span class="status-bad">не успевает</span>' if stats["overloaded"] else '<span class="status-ok">успевает</span>'
+    )
+    return f'<h2>Планировщик проверок: {state}</h2>\n<div class="grid">{tiles}</div>'
+
+
 def bar_chart(rows, value_key: str, label: str, empty_text: str = "Данных пока нет") -> str:
     max_value = max((row.get(value_key, 0) for row in rows), default=0)
     if max_value <= 0:
@@ -163,6 +237,9 @@ def page(title: str, body: str, active: str = "") -> web.Response:
     tr:last-child td {{ border-bottom: 0; }}
     code {{ background: #eef2f5; padding: 2px 5px; border-radius: 4px; }}
     form.inline {{ display: inline; }}
+    form.settings {{ display: flex; gap: 6px; align-items: center; }}
+    form.settings input {{ width: 72px; }}
+    form.settings select {{ width: auto; }}
     input, textarea, select {{
       width: 100%;
       border: 1px solid #b8c2cc;
@@ -293,9 +370,14 @@ async def dashboard(request: web.Request) -> web.Response:
     response_stats = get_admin_bot_response_stats()
     recent_logs = get_user_logs()[:10]
     recent_events = get_event_logs()[:10]
+    dns_stats = resolver.stats()
+    domain_stats = domain_registrations.stats()
+    whois_stats = whois_client.stats()
+    subdomain_stats = subdomain_scans.stats()
     metrics = [
         ("Пользователей с сайтами", stats["users_with_sites"]),
         ("Сайтов", stats["site_count"]),
+        ("Уникальных ресурсов", stats["target_count"]),
         ("Активных сайтов", stats["active_sites"]),
         ("На паузе", stats["paused_sites"]),
         ("Активных за 14 дней", stats["active_users_14d"]),
@@ -303,8 +385,17 @@ async def dashboard(request: web.Request) -> web.Response:
         ("Событий за 14 дней", stats["events_14d"]),
         ("Сообщений бота", stats["sent_messages_14d"]),
         ("Ошибок отправки", stats["failed_messages_14d"]),
+        ("DNS-кэш: попаданий", dns_stats["hits"] + dns_stats["negative_hits"]),
+        ("DNS-кэш: промахов", dns_stats["misses"]),
+        ("WHOIS-кэш: попаданий", domain_stats["hits"] + domain_stats["store_hits"] + domain_stats["joined"]),
+        ("WHOIS-запросов", domain_stats["misses"]),
+        ("WHOIS: ограничено сервером", whois_stats["throttled"] + whois_stats["rejected"]),
+        ("WHOIS: в очереди", whois_stats["queued"]),
+        ("Поддомены: из кэша", subdomain_stats["hits"] + subdomain_stats["store_hits"] + subdomain_stats["joined"]),
+        ("Поддомены: поисков", subdomain_stats["full_scans"] + subdomain_stats["incremental_scans"]),
     ]
     metric_html = "".join(f'<div class="metric"><strong>{value}</strong><span>{label}</span></div>' for label, value in metrics)
+    scheduler_html = scheduler_panel(request.app["monitor_engine"])
     logs_html = "".join(
         f"<tr><td>{fmt_dt(ts)}</td><td>{esc(user_id)}</td><td>{esc(username or 'без username')}</td><td>{esc(action)}</td></tr>"
         for ts, user_id, username, action in recent_logs
@@ -324,6 +415,7 @@ async def dashboard(request: web.Request) -> web.Response:
     body = f"""
 <h2>Обзор</h2>
 <div class="grid">{metric_html}</div>
+{scheduler_html}
 <div class="split" style="margin-bottom:24px">
   <section>
     <h2>Действия пользователей</h2>
@@ -384,6 +476,12 @@ async def user_detail(request: web.Request) -> web.Response:
     user_id = int(request.match_info["user_id"])
     profile = get_admin_user(user_id)
     sites = get_admin_sites(user_id=user_id)
+    # Адреса, которых ещё нет в ip_geo, дополняем из локальной базы одним пакетом.
+    networks = enrich_ips(site["ip"] for site in sites if site["ip"] and site["asn"] is None)
+    for site in sites:
+        info = networks.get(site["ip"])
+        if info is not None:
+            site.update(country=info.country, asn=info.asn, as_name=info.as_name)
     logs = [row for row in get_user_logs() if row[1] == user_id][:30]
     username = profile.get("username")
     title = f"@{username}" if username else "без username"
@@ -392,6 +490,8 @@ async def user_detail(request: web.Request) -> web.Response:
   <td>{esc(site['url'])}</td>
   <td>{'<span class="status-bad">пауза</span>' if site['is_paused'] else '<span class="status-ok">активен</span>'}</td>
   <td>{fmt_dt(site['last_checked'])}</td>
+  <td>{fmt_network(site)}</td>
+  <td>{check_settings_form(f"/admin/sites/{site['id']}/settings", site['check_interval'], site['priority'])}</td>
   <td>{esc((site['last_status'] or 'нет данных')[:240])}</td>
   <td class="actions">
     <form class="inline" method="post" action="/admin/sites/{site['id']}/{'resume' if site['is_paused'] else 'pause'}"><button class="secondary" type="submit">{'Возобновить' if site['is_paused'] else 'Пауза'}</button></form>
@@ -399,7 +499,8 @@ async def user_detail(request: web.Request) -> web.Response:
   </td>
 </tr>"""
         for site in sites
-    ) or '<tr><td colspan="5">Сайтов нет</td></tr>'
+    ) or '<tr><td colspan="7">Сайтов нет</td></tr>'
+    defaults = get_user_check_settings(user_id)
     log_rows = "".join(
         f"<tr><td>{fmt_dt(ts)}</td><td>{esc(username or 'без username')}</td><td>{esc(action)}</td></tr>"
         for ts, _, username, action in logs
@@ -415,8 +516,10 @@ async def user_detail(request: web.Request) -> web.Response:
     <form class="inline" method="post" action="/admin/users/{user_id}/delete"><button class="danger" type="submit">Удалить данные пользователя</button></form>
   </div>
 </div>
+<h2>Настройки проверок</h2>
+<div class="panel">Для сайтов без своих значений: {check_settings_form(f"/admin/users/{user_id}/settings", defaults["interval"], defaults["priority"])}</div>
 <h2>Сайты</h2>
-<table><thead><tr><th>URL</th><th>Статус</th><th>Проверка</th><th>Последний результат</th><th></th></tr></thead><tbody>{site_rows}</tbody></table>
+<table><thead><tr><th>URL</th><th>Статус</th><th>Проверка</th><th>Сеть</th><th>Интервал и приоритет</th><th>Последний результат</th><th></th></tr></thead><tbody>{site_rows}</tbody></table>
 <h2 style="margin-top:24px">Логи пользователя</h2>
 <table><thead><tr><th>Дата</th><th>Username</th><th>Действие</th></tr></thead><tbody>{log_rows}</tbody></table>"""
     return page(f"Пользователь {user_id}", body, "users")
@@ -578,9 +681,35 @@ async def resume_site(request: web.Request) -> web.Response:
     raise web.HTTPFound("/admin/users")
 
 
-def create_app(bot) -> web.Application:
+@require_auth
+async def site_settings(request: web.Request) -> web.Response:
+    site_id = int(request.match_info["site_id"])
+    interval, priority = await read_check_settings(request)
+    site = get_site_by_id(site_id)
+    if site:
+        set_site_check_settings_by_id(site_id, site[1], interval=interval, priority=priority)
+        log_user_action(
+            BOT_OWNER_ID, f"web: настройки проверки {site[3]}: интервал {interval}, приоритет {priority}", "web-admin"
+        )
+        raise web.HTTPFound(f"/admin/users/{site[1]}")
+    raise web.HTTPFound("/admin/users")
+
+
+@require_auth
+async def user_settings(request: web.Request) -> web.Response:
+    user_id = int(request.match_info["user_id"])
+    interval, priority = await read_check_settings(request)
+    set_user_check_settings(user_id, interval=interval, priority=priority)
+    log_user_action(
+        BOT_OWNER_ID, f"web: настройки проверки пользователя {user_id}: интервал {interval}, приоритет {priority}", "web-admin"
+    )
+    raise web.HTTPFound(f"/admin/users/{user_id}")
+
+
+def create_app(bot, monitor_engine=None) -> web.Application:
     app = web.Application()
     app["bot"] = bot
+    app["monitor_engine"] = monitor_engine
     app.router.add_get("/admin/login", login_page)
     app.router.add_post("/admin/login", login)
     app.router.add_get("/admin/logout", logout)
@@ -589,6 +718,7 @@ def create_app(bot) -> web.Application:
     app.router.add_get("/admin/users", users)
     app.router.add_get("/admin/users/{user_id:\\d+}", user_detail)
     app.router.add_post("/admin/users/{user_id:\\d+}/delete", delete_user)
+    app.router.add_post("/admin/users/{user_id:\\d+}/settings", user_settings)
     app.router.add_get("/admin/logs", logs)
     app.router.add_get("/admin/events", events)
     app.router.add_get("/admin/messages", messages)
@@ -597,15 +727,16 @@ def create_app(bot) -> web.Application:
     app.router.add_post("/admin/sites/{site_id:\\d+}/delete", delete_site)
     app.router.add_post("/admin/sites/{site_id:\\d+}/pause", pause_site)
     app.router.add_post("/admin/sites/{site_id:\\d+}/resume", resume_site)
+    app.router.add_post("/admin/sites/{site_id:\\d+}/settings", site_settings)
     return app
 
 
-async def start_admin_console(bot):
+async def start_admin_console(bot, monitor_engine=None):
     if not ADMIN_WEB_TOKEN:
         print("Admin web console disabled: ADMIN_WEB_TOKEN is not set")
         return None
 
-    app = create_app(bot)
+    app = create_app(bot, monitor_engine)
     runner = web.AppRunner(app)
     await runner.setup()
     site = web.TCPSite(runner, ADMIN_WEB_HOST, ADMIN_WEB_PORT)
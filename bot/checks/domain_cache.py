@@ -0,0 +1,177 @@
+"""Domain registration cache shared by all sites, keyed by registrable domain."""
+import asyncio
+import os
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+
+from bot.checks.whois_client import WhoisThrottled, lookup_registration
+from bot.core.cache import MISSING, TtlLruCache
+from bot.core.refresh_policy import domain_refresh_delay
+
+DOMAIN_CACHE_SIZE = int(os.getenv("DOMAIN_CACHE_SIZE", "10000"))
+# Не спрашиваем сервер, ограничивший запросы, раньше этого срока, даже если он просил меньше.
+DOMAIN_THROTTLED_MIN_DELAY = timedelta(minutes=5)
+
+STATUS_OK = "ok"
+STATUS_UNKNOWN = "unknown"
+STATUS_THROTTLED = "throttled"
+
+
+@dataclass(frozen=True)
+class DomainRegistration:
+    domain: str
+    expires_at: datetime | None
+    registrar: str | None
+    contact_url: str | None
+    checked_at: datetime
+    next_refresh_at: datetime | None = None
+    failures: int = 0
+    # ok — дата известна; unknown — реестр ответил без даты или lookup не удался;
+    # throttled — сервер ограничил запросы, данных нет, повтор назначен по его паузе.
+    status: str = STATUS_UNKNOWN
+
+    def days_left(self, now=None):
+        if self.expires_at is None:
+            return -1
+        days = (self.expires_at - (now or datetime.utcnow())).days
+        return days if days >= 0 else -1
+
+
+class DomainRegistrationCache:
+    """Кэш данных регистрации: LRU в памяти, под ним таблица БД, под ней RDAP/WHOIS.
+
+    Запись живёт до своего next_refresh_at, который назначает refresh_policy: далёкие
+    даты окончания проверяются раз в неделю, близкие — несколько раз в день, после
+    неудачного lookup — с растущей паузой и сохранением прежних данных.
+    Одновременные запросы одного домена объединяются в один lookup.
+    """
+
+    def __init__(
+        self,
+        max_entries=DOMAIN_CACHE_SIZE,
+        lookup=lookup_registration,
+        load=None,
+        save=None,
+    ):
+        self._lookup = lookup
+        self._load = load
+        self._save = save
+        self._cache = TtlLruCache(max_entries=max_entries)
+        self._inflight = {}
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.throttled = 0
+        self.joined = 0
+
+    def use_store(self, load, save):
+        """Подключает хранение в БД: load(domain) -> dict | None, save(domain, **record)."""
+        self._load = load
+        self._save = save
+
+    def _from_store(self, domain):
+        if self._load is None:
+            return None
+        row = self._load(domain)
+        if not row:
+            return None
+        row = dict(row)
+        row["status"] = row.get("status") or (STATUS_OK if row.get("expires_at") else STATUS_UNKNOWN)
+        record = DomainRegistration(domain=domain, **row)
+        if record.next_refresh_at is None:
+            record = replace(record, next_refresh_at=record.checked_at + domain_refresh_delay(record.days_left()))
+        return record
+
+    async def get(self, domain, session=None):
+        """Возвращает DomainRegistration; expires_at None, если дату узнать не удалось."""
+        cached = self._cache.get(domain)
+        if cached is not MISSING:
+            self.hits += 1
+            return cached
+
+        future = self._inflight.get(domain)
+        if future is not None:
+            self.joined += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if future.cancelled():
+                    return await self.get(domain, session)
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[domain] = future
+        try:
+            record = self._from_store(domain)
+            if record is not None and record.next_refresh_at > datetime.utcnow():
+                self.store_hits += 1
+            else:
+                self.misses += 1
+                record = await self._fetch(domain, session, record)
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            self._inflight.pop(domain, None)
+
+        ttl = (record.next_refresh_at - datetime.utcnow()).total_seconds()
+        self._cache.set(domain, record, ttl=max(ttl, 0.0))
+        future.set_result(record)
+        return record
+
+    async def _fetch(self, domain, session, previous=None):
+        now = datetime.utcnow()
+        try:
+            expires_at, registrar, contact_url = await self._lookup(domain, session=session)
+        except WhoisThrottled as e:
+            self.throttled += 1
+            print(f"WHOIS throttled for {domain}: {e}")
+            # Ограничение — не ошибка домена: failures не растут, повтор после паузы сервера.
+            delay = max(DOMAIN_THROTTLED_MIN_DELAY, timedelta(seconds=e.retry_after))
+            record = replace(
+                previous or DomainRegistration(domain, None, None, None, now),
+                status=STATUS_THROTTLED,
+                next_refresh_at=now + delay,
+            )
+        except Exception as e:
+            self.errors += 1
+            print(f"WHOIS error for {domain}: {type(e).__name__}: {e}")
+            # Прежние данные остаются в силе, повтор — с растущей паузой.
+            failures = (previous.failures if previous else 0) + 1
+            record = replace(
+                previous or DomainRegistration(domain, None, None, None, now),
+                failures=failures,
+                status=STATUS_OK if previous and previous.expires_at else STATUS_UNKNOWN,
+                next_refresh_at=now + domain_refresh_delay(None, failures),
+            )
+        else:
+            status = STATUS_OK if expires_at else STATUS_UNKNOWN
+            record = DomainRegistration(domain, expires_at, registrar, contact_url, now, status=status)
+            record = replace(record, next_refresh_at=now + domain_refresh_delay(record.days_left(now)))
+        if self._save is not None:
+            self._save(
+                domain,
+                expires_at=record.expires_at,
+                registrar=record.registrar,
+                contact_url=record.contact_url,
+                checked_at=record.checked_at,
+                next_refresh_at=record.next_refresh_at,
+                failures=record.failures,
+                status=record.status,
+            )
+        return record
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "store_hits": self.store_hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "throttled": self.throttled,
+            "joined": self.joined,
+            "cached": len(self._cache),
+        }
+
+
+domain_registrations = DomainRegistrationCache()
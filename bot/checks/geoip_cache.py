@@ -0,0 +1,84 @@
+"""Per-IP GeoIP/ASN cache shared by the add flow, the monitor and the admin console."""
+import os
+from datetime import datetime, timedelta
+
+from bot.core.cache import MISSING, TtlLruCache
+from bot.core.geoip import GeoInfo, lookup_ip
+
+GEOIP_CACHE_SIZE = int(os.getenv("GEOIP_CACHE_SIZE", "50000"))
+GEOIP_CACHE_TTL = float(os.getenv("GEOIP_CACHE_TTL", str(24 * 60 * 60)))
+
+
+class GeoIpCache:
+    """Результаты GeoIP по IP: LRU в памяти, под ним таблица ip_geo, под ней локальная база диапазонов.
+
+    Хранятся и промахи (адрес вне диапазонов), чтобы не искать их повторно до истечения TTL.
+    """
+
+    def __init__(self, max_entries=GEOIP_CACHE_SIZE, ttl=GEOIP_CACHE_TTL, lookup=lookup_ip, load_many=None, save_many=None):
+        self.ttl = ttl
+        self._lookup = lookup
+        self._load_many = load_many
+        self._save_many = save_many
+        self._cache = TtlLruCache(max_entries=max_entries, ttl=ttl)
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    def use_store(self, load_many, save_many):
+        """Подключает таблицу БД: load_many(ips) -> {ip: dict}, save_many([(ip, country, asn, as_name, checked_at)])."""
+        self._load_many = load_many
+        self._save_many = save_many
+
+    def enrich_ips(self, ips):
+        """Возвращает {ip: GeoInfo | None} для всех адресов, с одним запросом к БД на пакет."""
+        result = {}
+        missing = []
+        for ip in dict.fromkeys(ip for ip in ips if ip):
+            cached = self._cache.get(ip)
+            if cached is MISSING:
+                missing.append(ip)
+            else:
+                self.hits += 1
+                result[ip] = cached
+        if not missing:
+            return result
+
+        now = datetime.utcnow()
+        fresh_after = now - timedelta(seconds=self.ttl)
+        stored = self._load_many(missing) if self._load_many is not None else {}
+        to_save = []
+        for ip in missing:
+            row = stored.get(ip)
+            if row and row["checked_at"] > fresh_after:
+                self.store_hits += 1
+                info = GeoInfo(row["country"], row["asn"], row["as_name"]) if row["asn"] is not None else None
+            else:
+                self.misses += 1
+                info = self._lookup(ip)
+                to_save.append(
+                    (ip, info.country, info.asn, info.as_name, now) if info else (ip, None, None, None, now)
+                )
+            self._cache.set(ip, info)
+            result[ip] = info
+        if to_save and self._save_many is not None:
+            self._save_many(to_save)
+        return result
+
+    def get(self, ip):
+        return self.enrich_ips([ip]).get(ip)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "store_hits": self.store_hits,
+            "misses": self.misses,
+            "cached": len(self._cache),
+        }
+
+
+geoip_cache = GeoIpCache()
+
+
+def enrich_ips(ips):
+    return geoip_cache.enrich_ips(ips)
@@ -1,24 +1,24 @@
 import aiohttp
-import ssl
-import socket
 import asyncio
-import re
 import os
 import time
-from datetime import datetime, timezone
-from cryptography import x509
-from cryptography.hazmat.backends import default_backend
+from types import SimpleNamespace
 from urllib.parse import urlparse
 
+from bot.checks.domain_cache import STATUS_THROTTLED, domain_registrations
+from bot.checks.geoip_cache import geoip_cache
+from bot.checks.tls_probe import fetch_certificate, parse_certificate
+from bot.core.public_suffix import registrable_domain
+from bot.core.status_formatter import format_geo_info
+from bot.infra.dns_resolver import resolve_host
+from bot.infra.http_client import VERIFIED_SSL_CONTEXT, http_session_scope
 
-def resolve_hostname(url):
+
+async def resolve_hostname(url):
     hostname = urlparse(url).hostname
     if not hostname:
         return None
-    try:
-        return socket.gethostbyname(hostname)
-    except socket.error:
-        return None
+    return await resolve_host(hostname)
 
 #async def check_http(url):
 #    try:
@@ -44,7 +44,44 @@ def resolve_hostname(url):
 #
 #    return False
 
-async def check_http_details(url, retries=3, delay=5):
+async def _send_request(session, method, url, verify_tls, **kwargs):
+    """Отправляет запрос; при невалидном сертификате повторяет его без проверки TLS.
+
+    Возвращает ответ и ошибку проверки сертификата (если она была).
+    """
+    if not verify_tls or not url.startswith("https://"):
+        return await session.request(method, url, ssl=False, **kwargs), None
+    try:
+        return await session.request(method, url, ssl=VERIFIED_SSL_CONTEXT, **kwargs), None
+    except aiohttp.ClientConnectorCertificateError as e:
+        return await session.request(method, url, ssl=False, **kwargs), e
+
+
+def _certificate_from_response(resp, trace, resolved_ip):
+    # Сертификат снят с соединения в PeerCertificateResponse.start(), пока оно было у ответа.
+    der = getattr(resp, "peer_certificate", None)
+    if not der:
+        return None
+    details = parse_certificate(der)
+    details.update({
+        "ok": True,
+        "error": None,
+        "ip": resolved_ip,
+        # Для нового соединения — время TCP-подключения вместе с TLS-рукопожатием;
+        # отдельно рукопожатие aiohttp не замеряет, а соединение из пула его не делало.
+        "connect_ms": trace.connect_ms,
+        "handshake_ms": None,
+        "reused": trace.connect_ms is None,
+    })
+    return details
+
+
+async def check_http_details(url, retries=3, delay=5, session=None, with_certificate=False, on_certificate=None):
+    """Проверяет доступность сайта с повторами.
+
+    on_certificate(certificate) вызывается один раз после первого HTTPS-запроса — с сертификатом
+    его соединения или None, — не дожидаясь остальных повторов.
+    """
     timeout = aiohttp.ClientTimeout(total=12)
     headers = {
         "User-Agent": (
@@ -59,33 +96,69 @@ async def check_http_details(url, retries=3, delay=5):
     }
 
     allow_http_fallback = os.getenv("HTTP_ALLOW_PLAIN_FALLBACK", "1") == "1"
-    resolved_ip = resolve_hostname(url)
+    resolved_ip = await resolve_hostname(url)
     urls_to_try = [url]
     if allow_http_fallback and url.startswith("https://"):
         urls_to_try.append("http://" + url[len("https://"):])
 
-    connector = aiohttp.TCPConnector(ssl=False, limit=10)
     last_error = None
     attempts = 0
-    async with aiohttp.ClientSession(
-        timeout=timeout,
-        headers=headers,
-        connector=connector,
-        max_field_size=65536
-    ) as session:
+    # Сертификат читаем из того же TLS-соединения, через которое идёт HTTPS-запрос.
+    certificate = None
+    verify_tls = with_certificate
+
+    reported = False
+
+    def finish(result):
+        if with_certificate:
+            result["certificate"] = certificate
+        return result
+
+    def report_certificate():
+        nonlocal reported
+        if on_certificate is not None and not reported:
+            reported = True
+            on_certificate(certificate)
+
+    async with http_session_scope(session) as session:
         for attempt in range(1, retries + 1):
             for current_url in urls_to_try:
                 try:
                     for method in ("HEAD", "GET"):
                         attempts += 1
                         started = time.monotonic()
-                        async with session.request(method, current_url, allow_redirects=False) as resp:
+                        trace = SimpleNamespace(connect_ms=None)
+                        resp, cert_error = await _send_request(
+                            session,
+                            method,
+                            current_url,
+                            verify_tls,
+                            allow_redirects=False,
+                            headers=headers,
+                            timeout=timeout,
+                            trace_request_ctx=trace,
+                        )
+                        try:
                             latency_ms = int((time.monotonic() - started) * 1000)
                             print(f"[Attempt {attempt}] {method} {resp.status} for {current_url}")
+                            if cert_error is not None:
+                                certificate = {
+                                    "ok": False,
+                                    "days": -1,
+                                    "error": f"TLS: {cert_error.certificate_error}",
+                                    "ip": resolved_ip,
+                                    "connect_ms": None,
+                                    "handshake_ms": None,
+                                }
+                                verify_tls = False
+                            elif verify_tls and certificate is None and current_url.startswith("https://"):
+                                certificate = _certificate_from_response(resp, trace, resolved_ip)
+                            if current_url.startswith("https://"):
+                                report_certificate()
                             # 4xx означает, что сервер отвечает, но может блокировать ботов/доступ.
                             # Для мониторинга доступности это считаем "сайт жив".
                             if 200 <= resp.status < 500:
-                                return {
+                                return finish({
                                     "ok": True,
                                     "status_code": resp.status,
                                     "method": method,
@@ -94,17 +167,21 @@ async def check_http_details(url, retries=3, delay=5):
                                     "attempts": attempts,
                                     "error": None,
                                     "ip": resolved_ip,
-                                }
+                                })
+                        finally:
+                            resp.release()
 
-                            # Если HEAD не дал положительный ответ, пробуем GET.
-                            if method == "HEAD":
-                                continue
-                            last_error = f"HTTP {resp.status}"
-                            break
+                        # Если HEAD не дал положительный ответ, пробуем GET.
+                        if method == "HEAD":
+                            continue
+                        last_error = f"HTTP {resp.status}"
+                        break
                 except Exception as e:
+                    if current_url.startswith("https://"):
+                        report_certificate()
                     error_text = str(e)
                     if "Header value is too long" in error_text:
-                        return {
+                        return finish({
                             "ok": True,
                             "status_code": None,
                             "method": method,
@@ -113,13 +190,14 @@ async def check_http_details(url, retries=3, delay=5):
                             "attempts": attempts,
                             "error": "Header value is too long",
                             "ip": resolved_ip,
-                        }
+                        })
                     last_error = error_text or type(e).__name__
                     print(f"[Attempt {attempt}] Error checking {current_url}: {error_text or type(e).__name__}")
 
-            await asyncio.sleep(delay * attempt)
+            if attempt < retries:
+                await asyncio.sleep(delay * attempt)
 
-    return {
+    return finish({
         "ok": False,
         "status_code": None,
         "method": None,
@@ -128,86 +206,41 @@ async def check_http_details(url, retries=3, delay=5):
         "attempts": attempts,
         "error": last_error or "No successful HTTP response",
         "ip": resolved_ip,
-    }
+    })
 
 
-async def check_http(url, retries=3, delay=5):
-    details = await check_http_details(url, retries=retries, delay=delay)
+async def check_http(url, retries=3, delay=5, session=None):
+    details = await check_http_details(url, retries=retries, delay=delay, session=session)
     return details["ok"]
 
 
-async def check_ssl(url):
-    hostname = url.replace("https://", "").replace("http://", "").split("/")[0].lower()
-    try:
-        ctx = ssl.create_default_context()
-        with socket.create_connection((hostname, 443), timeout=5) as sock:
-            with ctx.wrap_socket(sock, server_hostname=hostname) as ssock:
-                cert = ssock.getpeercert(True)
-                x509_cert = x509.load_der_x509_certificate(cert, default_backend())
-
-                if hasattr(x509_cert, "not_valid_after_utc"):
-                    expire_date = x509_cert.not_valid_after_utc
-                    now = datetime.now(timezone.utc)
-                else:
-                    expire_date = x509_cert.not_valid_after
-                    now = datetime.utcnow()
-
-                return (expire_date - now).days
-    except:
-        return -1
-
-async def check_domain_expiry(url):
+async def check_ssl_details(url):
     hostname = url.replace("https://", "").replace("http://", "").split("/")[0].lower()
-    hostname = hostname.replace("www.", "")
-    parts = [p for p in hostname.split(".") if p]
-    if len(parts) < 2:
-        return -1, None, None
-
-    # Пробуем whois от более полного имени к базовому домену.
-    # Пример: a.b.example.com -> b.example.com -> example.com
-    candidates = [".".join(parts[i:]) for i in range(0, len(parts) - 1)]
-
-    try:
-        for candidate in candidates:
-            proc = await asyncio.create_subprocess_exec(
-                "whois", candidate,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.DEVNULL
-            )
-            stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=10)
-            text = stdout.decode(errors="ignore")
-
-            # 1. Дата окончания
-            match = re.search(
-                r"(paid-till|expiry date|expiration date)[\s:]+([0-9T:\-\.Z]+)",
-                text, flags=re.IGNORECASE
-            )
-            date_str = match.group(2).strip() if match else None
-            days = -1
-            if date_str:
-                for fmt in ("%Y-%m-%d", "%Y-%m-%dT%H:%M:%SZ", "%d-%b-%Y", "%Y.%m.%d"):
-                    try:
-                        expire = datetime.strptime(date_str, fmt)
-                        days = (expire - datetime.utcnow()).days
-                        break
-                    except:
-                        continue
-
-            # 2. Регистратор
-            registrar_match = re.search(r"registrar:\s*(.+)", text, re.IGNORECASE)
-            registrar = registrar_match.group(1).strip() if registrar_match else "Не найден"
+    return await fetch_certificate(hostname)
 
-            # 3. Ссылка на контакт/регистратора
-            contact_match = re.search(r"(admin-contact|registrar url):\s*(https?://\S+)", text, re.IGNORECASE)
-            contact_url = contact_match.group(2).strip() if contact_match else None
 
-            if days >= 0:
-                return days, registrar, contact_url
+async def check_ssl(url):
+    details = await check_ssl_details(url)
+    return details["days"]
 
+async def check_domain_expiry(url, session=None):
+    hostname = urlparse(url if "://" in url else "https://" + url).hostname
+    # WHOIS знает только зарегистрированные домены: a.b.example.co.uk -> example.co.uk.
+    domain = registrable_domain(hostname, include_private=False)
+    if not domain:
         return -1, None, None
+    hosted = registrable_domain(hostname)
+    if hosted is not None and hosted != domain:
+        # Имя на домене хостинга (user.github.io): WHOIS покажет владельца платформы.
+        return -2, None, None
 
-    except Exception as e:
+    record = await domain_registrations.get(domain, session=session)
+    if record is None:
         return -1, None, None
+    if record.days_left() < 0:
+        # -3: WHOIS-сервер ограничил запросы, это не «дата неизвестна».
+        return (-3 if record.status == STATUS_THROTTLED else -1), None, None
+    return record.days_left(), record.registrar or "Не найден", record.contact_url
 
 
 #async def get_geo_info(url: str) -> str:
@@ -233,21 +266,10 @@ async def check_domain_expiry(url):
 #    except Exception as e:
 #        return "⚠️ GeoIP/ASN информация недоступна"
 async def get_geo_info(url: str) -> str:
-    try:
-        hostname = url.replace("https://", "").replace("http://", "").split("/")[0].lower()
-        ip = socket.gethostbyname(hostname)
-
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"https://ipapi.co/{ip}/json/") as resp:
-                data = await resp.json()
-
-        country = data.get("country_name", "неизвестно")
-        region = data.get("region", "")
-        location = f"{country}, {region}".strip(", ")
-
-        asn = data.get("asn", "—")
-        org = data.get("org", "—")
-
-        return f"🌐 IP: {ip}\n📍 Местоположение: {location}\n🛰️  ASN: {asn} ({org})"
-    except Exception:
+    hostname = url.replace("https://", "").replace("http://", "").split("/")[0].lower()
+    ip = await resolve_host(hostname)
+    # Локальная база из bot.tools.update_geoip через кэш по IP: без внешних запросов.
+    info = geoip_cache.get(ip) if ip else None
+    if info is None:
         return "⚠️ GeoIP/ASN информация недоступна"
+    return format_geo_info(ip, info)
@@ -1,6 +1,11 @@
+import asyncio
+import os
 from dataclasses import dataclass
 
-from bot.checks.monitor import check_domain_expiry, check_http_details, check_ssl
+from bot.checks.monitor import check_domain_expiry, check_http_details, check_ssl_details
+
+CHECK_DEADLINE_SECONDS = float(os.getenv("CHECK_DEADLINE_SECONDS", "60"))
+DEADLINE_ERROR = "превышено общее время проверки"
 
 
 @dataclass(frozen=True)
@@ -13,28 +18,133 @@ class ResourceCheckResult:
     contact_url: str | None = None
     country: str | None = None
     agent_id: str | None = None
+    ssl: dict | None = None
+    completed: tuple[str, ...] = ()
+    timed_out: tuple[str, ...] = ()
+    failed: tuple[str, ...] = ()
+
+
+async def _check_http_part(url, session, parts, probe_ssl, retries):
+    tls_probe = None
+
+    def on_certificate(certificate):
+        nonlocal tls_probe
+        if certificate is not None:
+            # SSL готов после первого HTTPS-ответа, повторы HTTP его не задерживают.
+            parts["ssl"] = certificate
+        else:
+            # Первый HTTPS-запрос не дал сертификата — отдельный TLS-зонд сразу, а не после всех повторов.
+            tls_probe = asyncio.create_task(_check_ssl_part(url, parts))
+
+    try:
+        http = await check_http_details(
+            url,
+            retries=retries,
+            session=session,
+            with_certificate=probe_ssl,
+            on_certificate=on_certificate if probe_ssl else None,
+        )
+        certificate = http.pop("certificate", None)
+        parts["http"] = http
+        if tls_probe is not None:
+            await tls_probe
+        elif probe_ssl and "ssl" not in parts:
+            # HTTP-проверка не дошла до HTTPS-запроса — нужен отдельный TLS-зонд.
+            parts["ssl"] = certificate or await check_ssl_details(url)
+    finally:
+        if tls_probe is not None:
+            tls_probe.cancel()
+
+
+async def _check_ssl_part(url, parts):
+    parts["ssl"] = await check_ssl_details(url)
+
+
+async def _check_domain_part(url, session, parts):
+    parts["domain"] = await check_domain_expiry(url, session=session)
 
 
 async def check_resource(
     url: str,
     *,
     include_domain: bool = True,
+    include_ssl: bool = True,
     country: str | None = None,
     agent_id: str | None = None,
+    session=None,
+    deadline: float = CHECK_DEADLINE_SECONDS,
+    http_retries: int = 3,
 ) -> ResourceCheckResult:
-    http = await check_http_details(url)
-    ssl_days = await check_ssl(url)
+    parts = {}
+    failed = []
+    expected = ["http"]
+    # Для https сертификат приходит вместе с HTTP-ответом; для http TLS-зонд
+    # независим и запускается параллельно.
+    combined = include_ssl and url.startswith("https://")
+    tasks = {"http": asyncio.create_task(_check_http_part(url, session, parts, combined, http_retries))}
+    if include_ssl:
+        expected.append("ssl")
+    if include_ssl and not combined:
+        tasks["ssl"] = asyncio.create_task(_check_ssl_part(url, parts))
     if include_domain:
-        domain_days, registrar, contact_url = await check_domain_expiry(url)
-    else:
-        domain_days, registrar, contact_url = -1, None, None
+        expected.append("domain")
+        tasks["domain"] = asyncio.create_task(_check_domain_part(url, session, parts))
+
+    done, pending = await asyncio.wait(tasks.values(), timeout=deadline)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    for name, task in tasks.items():
+        if task not in done or task.exception() is None:
+            continue
+        # Сбой одной части не отменяет готовые: записываем ошибку только ей.
+        error = str(task.exception()) or type(task.exception()).__name__
+        failed_parts = [name, "ssl"] if name == "http" and combined else [name]
+        for part in failed_parts:
+            if part in parts:
+                continue
+            failed.append(part)
+            if part == "http":
+                parts["http"] = {
+                    "ok": False,
+                    "status_code": None,
+                    "method": None,
+                    "url": url,
+                    "latency_ms": None,
+                    "attempts": None,
+                    "error": error,
+                    "ip": None,
+                }
+            elif part == "ssl":
+                parts["ssl"] = {"ok": False, "days": -1, "error": f"TLS: {error}"}
+            else:
+                parts["domain"] = (-1, None, None)
+
+    http = parts.get("http") or {
+        "ok": False,
+        "status_code": None,
+        "method": None,
+        "url": url,
+        "latency_ms": None,
+        "attempts": None,
+        "error": DEADLINE_ERROR,
+        "ip": None,
+    }
+    ssl = parts.get("ssl")
+    if ssl is None and include_ssl:
+        ssl = {"ok": False, "days": -1, "error": f"TLS: {DEADLINE_ERROR}"}
+    domain_days, registrar, contact_url = parts.get("domain", (-1, None, None))
     return ResourceCheckResult(
         url=url,
         http=http,
-        ssl_days=ssl_days,
+        ssl_days=ssl["days"] if ssl else -1,
         domain_days=domain_days,
         registrar=registrar,
         contact_url=contact_url,
         country=country,
         agent_id=agent_id,
+        ssl=ssl,
+        completed=tuple(part for part in expected if part in parts and part not in failed),
+        timed_out=tuple(part for part in expected if part not in parts),
+        failed=tuple(failed),
     )
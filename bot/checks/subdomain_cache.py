@@ -0,0 +1,190 @@
+"""Subdomain scan results shared by all users, refreshed incrementally from crt.sh."""
+import asyncio
+import inspect
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from functools import partial
+
+from bot.checks.subfinder import SUBDOMAIN_SOURCES, discover_subdomains
+from bot.core.cache import MISSING, TtlLruCache
+
+SUBDOMAIN_CACHE_TTL = float(os.getenv("SUBDOMAIN_CACHE_TTL", str(6 * 60 * 60)))
+SUBDOMAIN_INCOMPLETE_TTL = float(os.getenv("SUBDOMAIN_INCOMPLETE_TTL", "600"))
+SUBDOMAIN_CACHE_SIZE = 1000
+
+
+@dataclass
+class SubdomainScan:
+    domain: str
+    subdomains: list
+    scanned_at: datetime
+    last_crtsh_id: int | None = None
+    from_cache: bool = False
+    # Новые имена по сравнению с прошлым поиском (для инкрементального обновления).
+    added: int = 0
+    sources: list = field(default_factory=list)
+    crtsh: object = None
+    # False, если crt.sh не ответил или ответ обрезан: такой результат не считается свежим.
+    complete: bool = True
+
+
+class SubdomainScanCache:
+    """Результаты поиска поддоменов: LRU в памяти, под ним таблица subdomain_scans.
+
+    Пока результат моложе ttl, повторный запрос отдаётся без обращения к источникам.
+    Неполный результат (crt.sh не ответил или обрезан) живёт только incomplete_ttl в памяти,
+    а в таблицу пишется со старой датой поиска, чтобы следующий запрос искал заново.
+    Устаревший результат дополняется: crt.sh читается только до последнего известного id,
+    найденное объединяется с сохранённым. Одновременные поиски одного домена объединяются.
+    """
+
+    def __init__(
+        self,
+        ttl=SUBDOMAIN_CACHE_TTL,
+        load=None,
+        save=None,
+        discover=discover_subdomains,
+        sources=None,
+        incomplete_ttl=SUBDOMAIN_INCOMPLETE_TTL,
+    ):
+        self.ttl = ttl
+        self.incomplete_ttl = incomplete_ttl
+        self._load = load
+        self._save = save
+        self._discover = discover
+        self._sources = sources
+        self._cache = TtlLruCache(max_entries=SUBDOMAIN_CACHE_SIZE, ttl=ttl)
+        self._inflight = {}
+        self.hits = 0
+        self.store_hits = 0
+        self.full_scans = 0
+        self.incremental_scans = 0
+        self.joined = 0
+
+    def use_store(self, load, save):
+        """Подключает хранение в БД: load(domain) -> dict | None, save(domain, subdomains, scanned_at, last_crtsh_id)."""
+        self._load = load
+        self._save = save
+
+    def _from_store(self, domain):
+        if self._load is None:
+            return None
+        row = self._load(domain)
+        if not row:
+            return None
+        return SubdomainScan(domain, sorted(row["subdomains"]), row["scanned_at"], row["last_crtsh_id"])
+
+    async def scan(self, domain, session=None, on_progress=None, on_source_done=None, force=False):
+        if not force:
+            cached = self._cache.get(domain)
+            if cached is not MISSING:
+                self.hits += 1
+                return cached
+
+        future = self._inflight.get(domain)
+        if future is not None:
+            self.joined += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if future.cancelled():
+                    return await self.scan(domain, session, on_progress, on_source_done, force)
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[domain] = future
+        try:
+            result = await self._scan(domain, session, on_progress, on_source_done, force)
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            self._inflight.pop(domain, None)
+        future.set_result(result)
+        return result
+
+    async def _scan(self, domain, session, on_progress, on_source_done, force):
+        now = datetime.utcnow()
+        previous = self._from_store(domain)
+        if previous is not None and not force:
+            age = (now - previous.scanned_at).total_seconds()
+            if age < self.ttl:
+                self.store_hits += 1
+                result = SubdomainScan(**{**previous.__dict__, "from_cache": True})
+                self._cache.set(domain, result, ttl=self.ttl - age)
+                return result
+
+        sources = dict(SUBDOMAIN_SOURCES if self._sources is None else self._sources)
+        min_id = previous.last_crtsh_id if previous is not None else None
+        if min_id is not None and "crt.sh" in sources:
+            sources["crt.sh"] = partial(sources["crt.sh"], min_id=min_id)
+            self.incremental_scans += 1
+        else:
+            self.full_scans += 1
+
+        crtsh_state = {}
+
+        async def track_progress(progress):
+            crtsh_state["progress"] = progress
+            forwarded = on_progress(progress) if on_progress is not None else None
+            if inspect.isawaitable(forwarded):
+                await forwarded
+
+        discovery = await self._discover(
+            domain, sources=sources, session=session, on_progress=track_progress, on_source_done=on_source_done
+        )
+        known = set(previous.subdomains) if previous is not None else set()
+        merged = known | set(discovery.subdomains)
+
+        crtsh = crtsh_state.get("progress")
+        crtsh_ok = any(result.name == "crt.sh" and result.ok for result in discovery.sources)
+        last_crtsh_id = min_id
+        if "crt.sh" in sources:
+            complete = crtsh_ok and crtsh is not None and not crtsh.truncated
+        else:
+            complete = any(source.ok for source in discovery.sources)
+        if complete and crtsh is not None and crtsh.max_id is not None:
+            # Обрезанный или неудачный ответ не сдвигает точку отсчёта: пропущенное дочитаем позже.
+            last_crtsh_id = max(crtsh.max_id, min_id or 0)
+
+        result = SubdomainScan(
+            domain,
+            sorted(merged),
+            now,
+            last_crtsh_id,
+            added=len(merged - known),
+            sources=discovery.sources,
+            crtsh=crtsh,
+            complete=complete,
+        )
+        if not any(source.ok for source in discovery.sources):
+            # Все источники отказали: не закрываем кэшем следующую попытку.
+            return result
+        if self._save is not None:
+            # Найденные имена сохраняем всегда, но неполный поиск не продлевает свежесть строки.
+            if complete:
+                stored_at = now
+            elif previous is not None:
+                stored_at = previous.scanned_at
+            else:
+                stored_at = now - timedelta(seconds=self.ttl)
+            self._save(domain, result.subdomains, stored_at, last_crtsh_id)
+        self._cache.set(
+            domain,
+            SubdomainScan(**{**result.__dict__, "from_cache": True}),
+            ttl=self.ttl if complete else min(self.incomplete_ttl, self.ttl),
+        )
+        return result
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "store_hits": self.store_hits,
+            "full_scans": self.full_scans,
+            "incremental_scans": self.incremental_scans,
+            "joined": self.joined,
+        }
+
+
+subdomain_scans = SubdomainScanCache()
@@ -0,0 +1,136 @@
+"""Bulk liveness check of discovered subdomains: DNS for every name, optional HTTP probe."""
+import asyncio
+import inspect
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+
+import aiohttp
+
+from bot.infra.dns_resolver import DnsResolver
+from bot.infra.http_client import http_session_scope
+
+SUBDOMAIN_PROBE_CONCURRENCY = int(os.getenv("SUBDOMAIN_PROBE_CONCURRENCY", "200"))
+SUBDOMAIN_DNS_WORKERS = int(os.getenv("SUBDOMAIN_DNS_WORKERS", "64"))
+SUBDOMAIN_DNS_TIMEOUT = float(os.getenv("SUBDOMAIN_DNS_TIMEOUT", "3"))
+SUBDOMAIN_HTTP_TIMEOUT = float(os.getenv("SUBDOMAIN_HTTP_TIMEOUT", "5"))
+
+# Схемы в порядке опроса и их порты.
+HTTP_PROBE_PORTS = {"https": 443, "http": 80}
+
+STATUS_WILDCARD = "wildcard"
+STATUS_UNRESOLVED = "unresolved"
+STATUS_RESOLVED = "resolved"
+STATUS_TIMEOUT = "timeout"
+STATUS_UNREACHABLE = "unreachable"
+
+_dns_executor = None
+
+
+def _dns_pool():
+    # Свой пул потоков: тысячи getaddrinfo не должны занимать пул цикла, нужный проверкам сайтов.
+    global _dns_executor
+    if _dns_executor is None:
+        _dns_executor = ThreadPoolExecutor(max_workers=SUBDOMAIN_DNS_WORKERS, thread_name_prefix="subdomain-dns")
+    return _dns_executor
+
+
+async def _bulk_getaddrinfo(hostname):
+    loop = asyncio.get_running_loop()
+    infos = await loop.run_in_executor(
+        _dns_pool(), partial(socket.getaddrinfo, hostname, None, socket.AF_INET, socket.SOCK_STREAM)
+    )
+    return infos[0][4][0] if infos else None
+
+
+# Отдельный кэш: массовая проверка не вытесняет имена, которые резолвит мониторинг.
+# В работе не больше lookup, чем потоков пула, иначе таймаут съедает ожидание свободного потока.
+bulk_resolver = DnsResolver(
+    timeout=SUBDOMAIN_DNS_TIMEOUT, lookup=_bulk_getaddrinfo, concurrency=SUBDOMAIN_DNS_WORKERS
+)
+
+
+@dataclass
+class SubdomainProbe:
+    name: str
+    ip: str | None = None
+    # Код HTTP-ответа строкой либо одно из STATUS_*.
+    status: str = STATUS_UNRESOLVED
+    latency_ms: int | None = None
+
+    @property
+    def alive(self):
+        return self.ip is not None and self.status not in (STATUS_TIMEOUT, STATUS_UNREACHABLE)
+
+
+async def _probe_http(session, name, ip):
+    """Первый ответ по https, при ошибке соединения — по http; тело не читается.
+
+    Соединяемся с уже найденным IP, имя передаём в Host и SNI, чтобы не резолвить его второй раз.
+    """
+    timeout = aiohttp.ClientTimeout(total=SUBDOMAIN_HTTP_TIMEOUT)
+    for scheme, port in HTTP_PROBE_PORTS.items():
+        extra = {"server_hostname": name} if scheme == "https" else {}
+        try:
+            async with session.get(
+                f"{scheme}://{ip}:{port}/", headers={"Host": name}, timeout=timeout, allow_redirects=False, **extra
+            ) as resp:
+                return str(resp.status)
+        except asyncio.TimeoutError:
+            return STATUS_TIMEOUT
+        except (aiohttp.ClientError, OSError, ValueError):
+            continue
+    return STATUS_UNREACHABLE
+
+
+async def _probe_one(name, resolver, session):
+    if name.startswith("*."):
+        return SubdomainProbe(name, status=STATUS_WILDCARD)
+    started = time.monotonic()
+    ip = await resolver.resolve(name)
+    if ip is None:
+        return SubdomainProbe(name)
+    if session is None:
+        return SubdomainProbe(name, ip, STATUS_RESOLVED, int((time.monotonic() - started) * 1000))
+    started = time.monotonic()
+    status = await _probe_http(session, name, ip)
+    return SubdomainProbe(name, ip, status, int((time.monotonic() - started) * 1000))
+
+
+async def validate_subdomains(
+    names,
+    *,
+    probe_http=False,
+    session=None,
+    resolver=None,
+    concurrency=SUBDOMAIN_PROBE_CONCURRENCY,
+    on_progress=None,
+):
+    """Проверяет все имена одновременно, не более `concurrency` сразу; порядок результата как у names.
+
+    Без probe_http latency — время резолва, с ним — время до первого HTTP-ответа.
+    HTTP-зонд по умолчанию идёт через свою сессию на `concurrency` соединений, а не через пул мониторинга.
+    on_progress(done, total) вызывается после каждого имени.
+    """
+    resolver = resolver or bulk_resolver
+    names = list(names)
+    semaphore = asyncio.Semaphore(concurrency)
+    done = 0
+
+    async def run(name, http_session):
+        nonlocal done
+        async with semaphore:
+            probe = await _probe_one(name, resolver, http_session)
+        done += 1
+        reported = on_progress(done, len(names)) if on_progress is not None else None
+        if inspect.isawaitable(reported):
+            await reported
+        return probe
+
+    if not probe_http:
+        return await asyncio.gather(*(run(name, None) for name in names))
+    async with http_session_scope(session, limit=concurrency) as http_session:
+        return await asyncio.gather(*(run(name, http_session) for name in names))
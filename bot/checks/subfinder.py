@@ -1,75 +1,287 @@
 import aiohttp
+import asyncio
 from bs4 import BeautifulSoup
 import re
 import csv
+import inspect
 import tempfile
 import os
+import time
+from dataclasses import dataclass
 
-async def find_subdomains(domain: str) -> list:
-    subdomains = set()
+from bot.core.json_stream import JsonArrayStream
+from bot.infra.http_client import VERIFIED_SSL_CONTEXT, http_session_scope
 
-    # --- [1] crt.sh ---
-    crt_url = f"https://crt.sh/?q=%25.{domain}&output=json"
+CRTSH_URL = os.getenv("CRTSH_URL", "https://crt.sh/")
+CRTSH_TIMEOUT = float(os.getenv("CRTSH_TIMEOUT", "120"))
+CRTSH_MAX_BYTES = int(os.getenv("CRTSH_MAX_BYTES", str(256 * 1024 * 1024)))
+CRTSH_MAX_ENTRIES = int(os.getenv("CRTSH_MAX_ENTRIES", "1000000"))
+CRTSH_MAX_SUBDOMAINS = int(os.getenv("CRTSH_MAX_SUBDOMAINS", "50000"))
+CRTSH_CHUNK_SIZE = 64 * 1024
+DNSDUMPSTER_URL = os.getenv("DNSDUMPSTER_URL", "https://dnsdumpster.com")
+DNSDUMPSTER_TIMEOUT = float(os.getenv("DNSDUMPSTER_TIMEOUT", "20"))
+# Общий лимит на все источники одного поиска; по умолчанию не короче таймаута самого медленного источника.
+SUBDOMAIN_DEADLINE = float(os.getenv("SUBDOMAIN_DEADLINE", str(max(CRTSH_TIMEOUT, DNSDUMPSTER_TIMEOUT))))
+
+
+@dataclass
+class CrtShProgress:
+    bytes_read: int = 0
+    entries: int = 0
+    unique: int = 0
+    done: bool = False
+    # Причина остановки до конца ответа: "bytes", "entries" или "subdomains".
+    truncated: str | None = None
+    # Наибольший id записи crt.sh в ответе — точка отсчёта для следующего инкрементального поиска.
+    max_id: int | None = None
+    skipped: int = 0
+
+
+def _matches_domain(name, domain):
+    name = name.removeprefix("*.")
+    return name == domain or name.endswith("." + domain)
+
+
+async def _report(callback, *args):
+    """Вызывает необязательный колбэк; поддерживает и обычные функции, и корутины."""
+    if callback is None:
+        return
+    result = callback(*args)
+    if inspect.isawaitable(result):
+        await result
+
+
+async def fetch_crtsh_subdomains(
+    domain,
+    session=None,
+    on_progress=None,
+    *,
+    url=CRTSH_URL,
+    max_bytes=CRTSH_MAX_BYTES,
+    max_entries=CRTSH_MAX_ENTRIES,
+    max_subdomains=CRTSH_MAX_SUBDOMAINS,
+    min_id=None,
+    found=None,
+):
+    """Читает ответ crt.sh потоком и собирает уникальные имена по мере поступления записей.
+
+    Память ограничена набором найденных имён и одной недочитанной записью; при
+    достижении лимита по байтам, записям или именам чтение прекращается.
+    С min_id записи с id не больше него пропускаются: у crt.sh нет фильтра «новее чем»,
+    но записи приходят от новых к старым, и на первой известной записи чтение заканчивается.
+    Имена складываются в found (если передан) по мере чтения, так что при отмене
+    вызывающий сохраняет уже найденное.
+    """
+    subdomains = set() if found is None else found
+    progress = CrtShProgress()
+    reached_known = False
+    previous_id = None
+    descending = True
+    stream = JsonArrayStream()
+    params = {"q": f"%.{domain}", "output": "json"}
+    async with http_session_scope(session) as session:
+        # Общая сессия не проверяет сертификаты, поэтому проверку включаем явно.
+        timeout = aiohttp.ClientTimeout(total=CRTSH_TIMEOUT)
+        async with session.get(url, params=params, timeout=timeout, ssl=VERIFIED_SSL_CONTEXT) as resp:
+            if resp.status != 200:
+                raise aiohttp.ClientResponseError(
+                    resp.request_info, resp.history, status=resp.status, message=resp.reason or ""
+                )
+            async for chunk in resp.content.iter_chunked(CRTSH_CHUNK_SIZE):
+                progress.bytes_read += len(chunk)
+                for entry in stream.feed(chunk):
+                    progress.entries += 1
+                    entry_id = entry.get("id")
+                    if isinstance(entry_id, int):
+                        if progress.max_id is None or entry_id > progress.max_id:
+                            progress.max_id = entry_id
+                        descending = descending and (previous_id is None or entry_id <= previous_id)
+                        previous_id = entry_id
+                        if min_id is not None and entry_id <= min_id:
+                            progress.skipped += 1
+                            if descending:
+                                reached_known = True
+                                break
+                            continue
+                    for line in str(entry.get("name_value", "")).splitlines():
+                        name = line.strip().lower()
+                        if name and _matches_domain(name, domain):
+                            subdomains.add(name)
+                    if progress.entries >= max_entries:
+                        progress.truncated = "entries"
+                        break
+                    if len(subdomains) >= max_subdomains:
+                        progress.truncated = "subdomains"
+                        break
+                progress.unique = len(subdomains)
+                if progress.truncated is None and progress.bytes_read >= max_bytes:
+                    progress.truncated = "bytes"
+                if progress.truncated or stream.finished or reached_known:
+                    break
+                await _report(on_progress, progress)
+    if progress.truncated is None and not stream.finished and not reached_known:
+        stream.close()
+    progress.done = True
+    await _report(on_progress, progress)
+    return subdomains
+
+
+async def fetch_dnsdumpster_subdomains(domain, session=None, on_progress=None, *, url=DNSDUMPSTER_URL, found=None):
+    """Имена из таблицы DNSdumpster. Своя сессия: cookie CSRF не должна попадать в общую."""
+    subdomains = set() if found is None else found
+    headers = {
+        "User-Agent": "Mozilla/5.0",
+        "Referer": url,
+    }
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=DNSDUMPSTER_TIMEOUT)) as own_session:
+        async with own_session.get(url, headers=headers) as resp:
+            html = await resp.text()
+        token_match = re.search(r'name="csrfmiddlewaretoken" value="(.+?)"', html)
+        if not token_match:
+            raise ValueError("не удалось получить CSRF-токен")
+        token = token_match.group(1)
+
+        data = {"csrfmiddlewaretoken": token, "targetip": domain}
+        cookies = {"csrftoken": token}
+        async with own_session.post(url, data=data, headers=headers, cookies=cookies) as resp:
+            html = await resp.text()
+
+    soup = BeautifulSoup(html, "html.parser")
+    table = soup.find("table", class_="table table-bordered table-hover")
+    if table:
+        for row in table.find_all("tr"):
+            cols = row.find_all("td")
+            text = cols[0].get_text(" ", strip=True) if cols else ""
+            if text:
+                # В ячейке после имени могут идти баннеры сервисов.
+                host = text.split()[0].lower()
+                if _matches_domain(host, domain):
+                    subdomains.add(host)
+    return subdomains
+
+
+# Источники поиска: имя -> async fn(domain, session=None, on_progress=None) -> set имён.
+# Источник может принимать found=set(): туда имена складываются по мере нахождения,
+# и при отмене по общему лимиту найденное не теряется.
+SUBDOMAIN_SOURCES = {
+    "crt.sh": fetch_crtsh_subdomains,
+    "dnsdumpster": fetch_dnsdumpster_subdomains,
+}
+
+
+def register_subdomain_source(name, fetch):
+    SUBDOMAIN_SOURCES[name] = fetch
+
+
+@dataclass
+class SourceResult:
+    name: str
+    subdomains: set
+    elapsed: float
+    error: str | None = None
+    timed_out: bool = False
+
+    @property
+    def ok(self):
+        return self.error is None and not self.timed_out
+
+
+@dataclass
+class SubdomainDiscovery:
+    subdomains: list
+    sources: list
+
+
+def _accepts_found(fetch):
     try:
-        timeout = aiohttp.ClientTimeout(total=120)
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.get(crt_url) as resp:
-                if resp.status == 200:
-                    data = await resp.json(content_type=None)
-                    for entry in data:
-                        sub = entry.get("name_value", "")
-                        for line in sub.splitlines():
-                            if domain in line:
-                                subdomains.add(line.strip().lower())
-    except Exception as e:
-        print(f"[crt.sh] Ошибка: {e}")
+        return "found" in inspect.signature(fetch).parameters
+    except (TypeError, ValueError):
+        return False
 
-    # --- [2] DNSdumpster ---
+
+async def _run_source(name, fetch, domain, session, on_progress, found):
+    """found — набор, куда источник пишет имена по ходу работы; при ошибке он остаётся частичным результатом."""
+    started = time.monotonic()
+    kwargs = {"found": found} if _accepts_found(fetch) else {}
     try:
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=20)) as session:
-            headers = {
-                "User-Agent": "Mozilla/5.0",
-                "Referer": "https://dnsdumpster.com"
-            }
-
-            async with session.get("https://dnsdumpster.com", headers=headers) as resp:
-                html = await resp.text()
-                token_match = re.search(r'name="csrfmiddlewaretoken" value="(.+?)"', html)
-                token = token_match.group(1) if token_match else None
-
-            if not token:
-                print("[dnsdumpster] Не удалось получить токен")
-                return list(subdomains)
-
-            data = {"csrfmiddlewaretoken": token, "targetip": domain}
-            cookies = {"csrftoken": token}
-
-            async with session.post("https://dnsdumpster.com", data=data, headers=headers, cookies=cookies) as resp:
-                html = await resp.text()
-                soup = BeautifulSoup(html, "html.parser")
-                table = soup.find("table", class_="table table-bordered table-hover")
-                if table:
-                    rows = table.find_all("tr")
-                    for row in rows:
-                        cols = row.find_all("td")
-                        if cols and len(cols) > 0:
-                            host = cols[0].text.strip()
-                            if domain in host:
-                                subdomains.add(host.lower())
+        result = await fetch(domain, session=session, on_progress=on_progress, **kwargs)
     except Exception as e:
-        print(f"[dnsdumpster] Ошибка: {e}")
+        print(f"[{name}] Ошибка: {type(e).__name__}: {e}")
+        return SourceResult(name, set(found), time.monotonic() - started, error=f"{type(e).__name__}: {e}")
+    found |= set(result)
+    return SourceResult(name, set(found), time.monotonic() - started)
+
+
+async def discover_subdomains(
+    domain,
+    *,
+    sources=None,
+    session=None,
+    deadline=SUBDOMAIN_DEADLINE,
+    on_progress=None,
+    on_source_done=None,
+):
+    """Опрашивает все источники одновременно и объединяет найденные имена.
+
+    Источники, не уложившиеся в общий `deadline`, отменяются и помечаются timed_out;
+    имена, которые они успели найти, остаются в результате.
+    on_source_done(result, merged) вызывается по мере завершения, начиная с самого быстрого.
+    """
+    sources = SUBDOMAIN_SOURCES if sources is None else sources
+    started = time.monotonic()
+    merged = set()
+    results = []
+    found = {name: set() for name in sources}
+    tasks = {
+        asyncio.create_task(_run_source(name, fetch, domain, session, on_progress, found[name])): name
+        for name, fetch in sources.items()
+    }
+    pending = set(tasks)
+    try:
+        while pending:
+            remaining = deadline - (time.monotonic() - started)
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                results.append(result)
+                merged |= result.subdomains
+                await _report(on_source_done, result, merged)
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    for task in pending:
+        name = tasks[task]
+        result = SourceResult(name, set(found[name]), time.monotonic() - started, timed_out=True)
+        results.append(result)
+        merged |= result.subdomains
+        await _report(on_source_done, result, merged)
+    return SubdomainDiscovery(sorted(merged), results)
+
 
-    return sorted(subdomains)
+async def find_subdomains(domain: str, on_progress=None, session=None) -> list:
+    discovery = await discover_subdomains(domain, session=session, on_progress=on_progress)
+    return discovery.subdomains
 
 
-async def export_subdomains_csv(subdomains: list, domain: str) -> str:
-    """Создаёт временный CSV-файл со списком поддоменов и возвращает путь к нему"""
+async def export_subdomains_csv(subdomains: list, domain: str, probes=None) -> str:
+    """Создаёт временный CSV-файл со списком поддоменов и возвращает путь к нему.
+
+    probes — результаты validate_subdomains в том же порядке; добавляют колонки IP, статус и задержку.
+    """
     fd, path = tempfile.mkstemp(suffix=".csv", prefix=f"subdomains_{domain}_")
     os.close(fd)
     with open(path, "w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
-        writer.writerow(["Subdomain"])
-        for sub in subdomains:
-            writer.writerow([sub])
+        if probes is None:
+            writer.writerow(["Subdomain"])
+            for sub in subdomains:
+                writer.writerow([sub])
+        else:
+            writer.writerow(["Subdomain", "IP", "Status", "Latency ms"])
+            for probe in probes:
+                writer.writerow([probe.name, probe.ip or "", probe.status, "" if probe.latency_ms is None else probe.latency_ms])
     return path
-
@@ -0,0 +1,119 @@
+"""Asyncio TLS certificate probe."""
+import asyncio
+import os
+import ssl
+import time
+from datetime import datetime, timezone
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes
+from cryptography.x509.oid import NameOID
+
+from bot.infra.dns_resolver import resolve_host
+
+TLS_CONNECT_TIMEOUT = float(os.getenv("TLS_CONNECT_TIMEOUT", "5"))
+TLS_HANDSHAKE_TIMEOUT = float(os.getenv("TLS_HANDSHAKE_TIMEOUT", "5"))
+
+
+def _name_attr(name, oid):
+    values = name.get_attributes_for_oid(oid)
+    return values[0].value if values else None
+
+
+def parse_certificate(der: bytes, now=None) -> dict:
+    cert = x509.load_der_x509_certificate(der)
+    if hasattr(cert, "not_valid_after_utc"):
+        expires_at = cert.not_valid_after_utc
+        issued_at = cert.not_valid_before_utc
+    else:
+        expires_at = cert.not_valid_after.replace(tzinfo=timezone.utc)
+        issued_at = cert.not_valid_before.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    try:
+        san = cert.extensions.get_extension_for_class(x509.SubjectAlternativeName)
+        dns_names = san.value.get_values_for_type(x509.DNSName)
+    except x509.ExtensionNotFound:
+        dns_names = []
+    return {
+        "days": (expires_at - now).days,
+        "expires_at": expires_at,
+        "issued_at": issued_at,
+        "subject": _name_attr(cert.subject, NameOID.COMMON_NAME),
+        "issuer": _name_attr(cert.issuer, NameOID.ORGANIZATION_NAME) or _name_attr(cert.issuer, NameOID.COMMON_NAME),
+        "san": dns_names,
+        "serial": format(cert.serial_number, "x"),
+        "fingerprint": cert.fingerprint(hashes.SHA256()).hex(),
+    }
+
+
+def _failed(error, ip=None, connect_ms=None, handshake_ms=None):
+    return {
+        "ok": False,
+        "days": -1,
+        "error": error,
+        "ip": ip,
+        "connect_ms": connect_ms,
+        "handshake_ms": handshake_ms,
+    }
+
+
+async def fetch_certificate(
+    hostname,
+    port=443,
+    *,
+    connect_timeout=TLS_CONNECT_TIMEOUT,
+    handshake_timeout=TLS_HANDSHAKE_TIMEOUT,
+    ssl_context=None,
+) -> dict:
+    """Получает сертификат хоста без блокировки event loop.
+
+    Подключение и TLS-рукопожатие ограничены отдельными таймаутами, длительность
+    каждой фазы попадает в результат.
+    """
+    loop = asyncio.get_running_loop()
+    ip = await resolve_host(hostname)
+    if not ip:
+        return _failed("DNS: имя не резолвится")
+
+    started = time.monotonic()
+    try:
+        transport, protocol = await asyncio.wait_for(
+            loop.create_connection(asyncio.Protocol, ip, port),
+            timeout=connect_timeout,
+        )
+    except asyncio.TimeoutError:
+        return _failed("TCP: таймаут подключения", ip)
+    except OSError as e:
+        return _failed(f"TCP: {e.strerror or type(e).__name__}", ip)
+    connect_ms = int((time.monotonic() - started) * 1000)
+
+    started = time.monotonic()
+    tls_transport = None
+    try:
+        tls_transport = await loop.start_tls(
+            transport,
+            protocol,
+            ssl_context or ssl.create_default_context(),
+            server_hostname=hostname,
+            ssl_handshake_timeout=handshake_timeout,
+        )
+        handshake_ms = int((time.monotonic() - started) * 1000)
+        der = tls_transport.get_extra_info("ssl_object").getpeercert(True)
+    except ssl.SSLCertVerificationError as e:
+        return _failed(f"TLS: {e.verify_message or 'сертификат не прошёл проверку'}", ip, connect_ms)
+    except (ssl.SSLError, ConnectionError, asyncio.TimeoutError, OSError) as e:
+        return _failed(f"TLS: {str(e) or type(e).__name__}", ip, connect_ms)
+    finally:
+        (tls_transport or transport).abort()
+
+    if not der:
+        return _failed("TLS: сервер не передал сертификат", ip, connect_ms, handshake_ms)
+    details = parse_certificate(der)
+    details.update({
+        "ok": True,
+        "error": None,
+        "ip": ip,
+        "connect_ms": connect_ms,
+        "handshake_ms": handshake_ms,
+    })
+    return details
@@ -0,0 +1,375 @@
+"""Asyncio WHOIS (TCP/43) and RDAP clients for domain registration data."""
+import asyncio
+import os
+import re
+import time
+
+import aiohttp
+
+from bot.checks.whois_parser import parse_whois, parse_whois_date
+from bot.core.cache import MISSING, TtlLruCache
+from bot.core.rate_limit import TokenBucket
+from bot.infra.http_client import VERIFIED_SSL_CONTEXT, http_session_scope
+
+WHOIS_PORT = 43
+WHOIS_TIMEOUT = float(os.getenv("WHOIS_TIMEOUT", "10"))
+WHOIS_MAX_CONNECTIONS = int(os.getenv("WHOIS_MAX_CONNECTIONS", "20"))
+WHOIS_MAX_CONNECTIONS_PER_SERVER = int(os.getenv("WHOIS_MAX_CONNECTIONS_PER_SERVER", "2"))
+WHOIS_MAX_RESPONSE_BYTES = 256 * 1024
+WHOIS_MAX_REFERRALS = 2
+WHOIS_SERVER_CACHE_TTL = 24 * 60 * 60
+WHOIS_RATE_PER_SERVER = float(os.getenv("WHOIS_RATE_PER_SERVER", "1"))
+WHOIS_BURST_PER_SERVER = int(os.getenv("WHOIS_BURST_PER_SERVER", "3"))
+WHOIS_MAX_QUEUE_PER_SERVER = int(os.getenv("WHOIS_MAX_QUEUE_PER_SERVER", "100"))
+WHOIS_THROTTLE_BACKOFF = float(os.getenv("WHOIS_THROTTLE_BACKOFF", "60"))
+WHOIS_THROTTLE_BACKOFF_MAX = 30 * 60
+
+IANA_WHOIS_SERVER = os.getenv("IANA_WHOIS_SERVER", "whois.iana.org")
+RDAP_BOOTSTRAP_URL = os.getenv("RDAP_BOOTSTRAP_URL", "https://data.iana.org/rdap/dns.json")
+RDAP_TIMEOUT = float(os.getenv("RDAP_TIMEOUT", "10"))
+# Сколько секунд после неудачной загрузки bootstrap-файла RDAP не используется.
+RDAP_BOOTSTRAP_RETRY_SECONDS = float(os.getenv("RDAP_BOOTSTRAP_RETRY_SECONDS", "300"))
+
+# Самые частые зоны, чтобы не спрашивать IANA на каждом старте.
+KNOWN_WHOIS_SERVERS = {
+    "com": "whois.verisign-grs.com",
+    "net": "whois.verisign-grs.com",
+    "org": "whois.publicinterestregistry.org",
+    "ru": "whois.tcinet.ru",
+    "su": "whois.tcinet.ru",
+    "xn--p1ai": "whois.tcinet.ru",
+    "io": "whois.nic.io",
+    "me": "whois.nic.me",
+    "info": "whois.nic.info",
+    "de": "whois.denic.de",
+    "uk": "whois.nic.uk",
+}
+
+# Некоторые реестры без ключей отдают урезанный ответ.
+QUERY_FORMATS = {
+    "whois.denic.de": "-T dn,ace {}",
+    "whois.verisign-grs.com": "domain {}",
+}
+
+# Реестры с более строгим лимитом: (запросов в секунду, запросов подряд).
+SERVER_RATE_LIMITS = {
+    "whois.tcinet.ru": (0.5, 2),
+    "whois.denic.de": (0.5, 2),
+    "whois.nic.uk": (0.5, 2),
+}
+
+_THROTTLED_RE = re.compile(
+    r"limit exceeded|exceeded (?:the )?(?:allowed|maximum|query)|too many (?:requests|queries|connections)"
+    r"|query rate|rate limit|quota exceeded|try again later|temporarily (?:denied|blocked)",
+    re.IGNORECASE,
+)
+_REFER_RE = re.compile(r"^\s*(?:refer|whois):\s*(\S+)", re.IGNORECASE | re.MULTILINE)
+_REFERRAL_RE = re.compile(r"^\s*(?:registrar whois server|whois server):\s*(\S+)", re.IGNORECASE | re.MULTILINE)
+
+
+class WhoisError(Exception):
+    pass
+
+
+class WhoisThrottled(WhoisError):
+    """Сервер ограничил частоту запросов или очередь к нему переполнена."""
+
+    def __init__(self, server, retry_after, reason="лимит запросов"):
+        super().__init__(f"{server}: {reason}, повтор через {retry_after:.0f} с")
+        self.server = server
+        self.retry_after = retry_after
+
+
+def is_throttled_response(text):
+    """Короткий ответ с жалобой на частоту запросов вместо данных домена."""
+    return len(text) < 2048 and _THROTTLED_RE.search(text) is not None
+
+
+class _ServerSlot:
+    """Лимиты одного WHOIS-сервера: корзина токенов, соединения и длина очереди."""
+
+    def __init__(self, rate, burst, max_connections):
+        self.bucket = TokenBucket(rate, burst)
+        self.connections = asyncio.Semaphore(max_connections)
+        self.waiting = 0
+        self.throttles = 0
+
+
+def split_server(server, default_port=WHOIS_PORT):
+    """Разбирает `host`, `host:port` и `whois://host` из ответов реестров."""
+    server = server.strip().rstrip("/")
+    if "://" in server:
+        server = server.split("://", 1)[1]
+    host, sep, port = server.rpartition(":")
+    if sep and port.isdigit():
+        return host.lower(), int(port)
+    return server.lower(), default_port
+
+
+class WhoisClient:
+    """WHOIS по TCP/43 с поиском сервера зоны через IANA и переходом по referral.
+
+    Общее число соединений и число соединений к одному серверу ограничены семафорами.
+    Запросы к серверу проходят через его корзину токенов; ждать токена может не больше
+    max_queue_per_server запросов. Ответ «слишком много запросов» ставит сервер на паузу,
+    которая удваивается при повторах, и возвращается как WhoisThrottled.
+    """
+
+    def __init__(
+        self,
+        iana_server=IANA_WHOIS_SERVER,
+        timeout=WHOIS_TIMEOUT,
+        max_connections=WHOIS_MAX_CONNECTIONS,
+        max_connections_per_server=WHOIS_MAX_CONNECTIONS_PER_SERVER,
+        servers=None,
+        rate_per_server=WHOIS_RATE_PER_SERVER,
+        burst_per_server=WHOIS_BURST_PER_SERVER,
+        max_queue_per_server=WHOIS_MAX_QUEUE_PER_SERVER,
+        throttle_backoff=WHOIS_THROTTLE_BACKOFF,
+        rate_limits=None,
+    ):
+        self.iana_server = iana_server
+        self.timeout = timeout
+        self.max_connections_per_server = max_connections_per_server
+        self.rate_per_server = rate_per_server
+        self.burst_per_server = burst_per_server
+        self.max_queue_per_server = max_queue_per_server
+        self.throttle_backoff = throttle_backoff
+        self._rate_limits = dict(SERVER_RATE_LIMITS if rate_limits is None else rate_limits)
+        self._servers = dict(KNOWN_WHOIS_SERVERS if servers is None else servers)
+        self._discovered = TtlLruCache(max_entries=2000, ttl=WHOIS_SERVER_CACHE_TTL)
+        self._connections = asyncio.Semaphore(max_connections)
+        self._slots = {}
+        self.throttled = 0
+        self.rejected = 0
+
+    def _slot(self, host, port):
+        slot = self._slots.get((host, port))
+        if slot is None:
+            rate, burst = self._rate_limits.get(host, (self.rate_per_server, self.burst_per_server))
+            slot = self._slots[(host, port)] = _ServerSlot(rate, burst, self.max_connections_per_server)
+        return slot
+
+    async def query(self, server, text):
+        host, port = split_server(server)
+        slot = self._slot(host, port)
+        paused_for = slot.bucket.paused_for
+        if paused_for > self.timeout:
+            # Долгую паузу не пережидаем: вызывающий назначит повтор сам.
+            self.rejected += 1
+            raise WhoisThrottled(server, paused_for)
+        if slot.waiting >= self.max_queue_per_server:
+            self.rejected += 1
+            retry_after = paused_for + slot.waiting / slot.bucket.rate
+            raise WhoisThrottled(server, retry_after, reason="очередь запросов переполнена")
+
+        slot.waiting += 1
+        try:
+            await slot.bucket.acquire()
+        finally:
+            slot.waiting -= 1
+        async with self._connections, slot.connections:
+            response = await asyncio.wait_for(self._exchange(host, port, text), self.timeout)
+
+        if is_throttled_response(response):
+            self.throttled += 1
+            slot.throttles += 1
+            delay = min(WHOIS_THROTTLE_BACKOFF_MAX, self.throttle_backoff * 2 ** min(slot.throttles - 1, 10))
+            slot.bucket.backoff(delay)
+            raise WhoisThrottled(server, delay)
+        slot.throttles = 0
+        return response
+
+    async def _exchange(self, host, port, text):
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            writer.write(text.encode("ascii", errors="ignore") + b"\r\n")
+            await writer.drain()
+            chunks = []
+            size = 0
+            while size < WHOIS_MAX_RESPONSE_BYTES:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                size += len(chunk)
+            return b"".join(chunks).decode("utf-8", errors="ignore")
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    async def server_for(self, domain):
+        tld = domain.rsplit(".", 1)[-1].lower()
+        if tld in self._servers:
+            return self._servers[tld]
+        server = self._discovered.get(tld)
+        if server is not MISSING:
+            return server
+        response = await self.query(self.iana_server, tld)
+        match = _REFER_RE.search(response)
+        server = match.group(1) if match else None
+        self._discovered.set(tld, server)
+        return server
+
+    async def lookup(self, domain):
+        """Возвращает список ответов [(сервер, текст)]: сначала реестр, затем referral."""
+        server = await self.server_for(domain)
+        if not server:
+            raise WhoisError(f"WHOIS-сервер для {domain} не найден")
+        responses = []
+        visited = set()
+        while server and len(responses) <= WHOIS_MAX_REFERRALS:
+            key = split_server(server)
+            if key in visited:
+                break
+            visited.add(key)
+            query = QUERY_FORMATS.get(key[0], "{}").format(domain)
+            try:
+                text = await self.query(server, query)
+            except (OSError, asyncio.TimeoutError, WhoisThrottled) as e:
+                if responses:
+                    # Ответ реестра уже есть; недоступный сервер регистратора не ошибка.
+                    break
+                if isinstance(e, WhoisThrottled):
+                    raise
+                raise WhoisError(f"{server}: {type(e).__name__}: {e}") from e
+            responses.append((server, text))
+            match = _REFERRAL_RE.search(text)
+            server = match.group(1) if match else None
+        return responses
+
+    def stats(self):
+        return {
+            "throttled": self.throttled,
+            "rejected": self.rejected,
+            "queued": sum(slot.waiting for slot in self._slots.values()),
+            "paused_servers": sum(1 for slot in self._slots.values() if slot.bucket.paused_for > 0),
+        }
+
+
+class RdapClient:
+    """RDAP-клиент: сервер зоны берётся из bootstrap-файла IANA, запросы идут через общую HTTP-сессию.
+
+    Общая сессия не проверяет сертификаты (мониторингу нужен ответ и от сайтов с плохим
+    TLS), поэтому здесь проверка включается явно: иначе дату окончания можно подменить.
+
+    Если bootstrap-файл не загрузился, на retry_after секунд считается, что RDAP-серверов
+    нет, и поиск сразу идёт в WHOIS, а не ждёт таймаута IANA на каждом домене.
+    """
+
+    def __init__(
+        self, bootstrap_url=RDAP_BOOTSTRAP_URL, timeout=RDAP_TIMEOUT, retry_after=RDAP_BOOTSTRAP_RETRY_SECONDS,
+        clock=time.monotonic,
+    ):
+        self.bootstrap_url = bootstrap_url
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._clock = clock
+        self._bases = None
+        # Когда повторить загрузку после неудачи; None — файл загружен.
+        self._retry_at = None
+        self._bootstrap_lock = asyncio.Lock()
+
+    def _bootstrap_fresh(self):
+        return self._bases is not None and (self._retry_at is None or self._clock() < self._retry_at)
+
+    async def _load_bootstrap(self, session):
+        if self._bootstrap_fresh():
+            return self._bases
+        async with self._bootstrap_lock:
+            if self._bootstrap_fresh():
+                return self._bases
+            timeout = aiohttp.ClientTimeout(total=self.timeout)
+            try:
+                async with session.get(self.bootstrap_url, timeout=timeout, ssl=VERIFIED_SSL_CONTEXT) as resp:
+                    resp.raise_for_status()
+                    data = await resp.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                print(f"RDAP bootstrap недоступен: {type(e).__name__}: {e}; {self.retry_after:.0f} с только WHOIS")
+                self._bases = {}
+                self._retry_at = self._clock() + self.retry_after
+                return self._bases
+            bases = {}
+            for tlds, urls in data.get("services", []):
+                base = next((u for u in urls if u.startswith("https://")), urls[0] if urls else None)
+                for tld in tlds:
+                    bases[tld.lower()] = base
+            self._bases = bases
+            self._retry_at = None
+            return bases
+
+    async def base_for(self, domain, session):
+        bases = await self._load_bootstrap(session)
+        return bases.get(domain.rsplit(".", 1)[-1].lower())
+
+    async def lookup(self, domain, session=None):
+        """Возвращает JSON-ответ RDAP или None, если у зоны нет RDAP-сервера."""
+        async with http_session_scope(session) as session:
+            base = await self.base_for(domain, session)
+            if not base:
+                return None
+            url = base.rstrip("/") + "/domain/" + domain
+            timeout = aiohttp.ClientTimeout(total=self.timeout)
+            async with session.get(url, timeout=timeout, ssl=VERIFIED_SSL_CONTEXT) as resp:
+                if resp.status == 404:
+                    return None
+                resp.raise_for_status()
+                return await resp.json(content_type=None)
+
+
+def parse_rdap(data):
+    """Возвращает (дата окончания, регистратор, ссылка на регистратора) из ответа RDAP."""
+    expires_at = None
+    for event in data.get("events", []):
+        if event.get("eventAction") == "expiration":
+            expires_at = parse_whois_date(event.get("eventDate") or "")
+            break
+
+    registrar = None
+    contact_url = None
+    for entity in data.get("entities", []):
+        if "registrar" not in entity.get("roles", []):
+            continue
+        for item in (entity.get("vcardArray") or [None, []])[1]:
+            if item[0] == "fn":
+                registrar = item[3]
+            elif item[0] == "url" and contact_url is None:
+                contact_url = item[3]
+        if contact_url is None:
+            contact_url = next((link.get("href") for link in entity.get("links", []) if link.get("href")), None)
+        break
+    return expires_at, registrar, contact_url
+
+
+whois_client = WhoisClient()
+rdap_client = RdapClient()
+
+
+async def lookup_registration(domain, session=None):
+    """Данные регистрации домена: сначала RDAP, затем WHOIS.
+
+    Возвращает (дата окончания, регистратор, ссылка на регистратора); дата None, если её не нашли.
+    """
+    domain = domain.encode("idna").decode("ascii")
+    try:
+        data = await rdap_client.lookup(domain, session=session)
+    except Exception as e:
+        print(f"RDAP error for {domain}: {type(e).__name__}: {e}")
+        data = None
+    if data:
+        expires_at, registrar, contact_url = parse_rdap(data)
+        if expires_at:
+            return expires_at, registrar, contact_url
+
+    responses = await whois_client.lookup(domain)
+    expires_at, registrar, contact_url = None, None, None
+    # Ответ регистратора подробнее, но дата может быть только у реестра.
+    for server, text in reversed(responses):
+        found_expiry, found_registrar, found_contact = parse_whois(text, server)
+        expires_at = expires_at or found_expiry
+        registrar = registrar or found_registrar
+        contact_url = contact_url or found_contact
+    return expires_at, registrar, contact_url
@@ -0,0 +1,161 @@
+"""Table-driven WHOIS response parser with per-registry formats."""
+import re
+from datetime import datetime
+from typing import NamedTuple
+
+
+class WhoisRecord(NamedTuple):
+    expires_at: datetime | None
+    registrar: str | None
+    contact_url: str | None
+
+
+_MONTHS = {
+    name: number
+    for number, name in enumerate(
+        ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), start=1
+    )
+}
+
+# Порядок важен: первым совпадает самый частый ISO-формат.
+_DATE_PATTERNS = (
+    # 2031-08-13, 2031-08-13T04:00:00Z, 2031.08.13 13:00:00, 2031/08/13
+    ("ymd", re.compile(r"(\d{4})[-./](\d{1,2})[-./](\d{1,2})(?:[T ](\d{1,2}):(\d{2})(?::(\d{2}))?)?")),
+    # 20310813 (registro.br)
+    ("ymd", re.compile(r"(\d{4})(\d{2})(\d{2})\b")),
+    # 13-Aug-2031, 13 August 2031
+    ("d_mon_y", re.compile(r"(\d{1,2})[-./ ]([A-Za-z]{3})[A-Za-z]*\.?[-./ ](\d{4})")),
+    # August 13, 2031
+    ("mon_d_y", re.compile(r"([A-Za-z]{3})[A-Za-z]*\.? (\d{1,2}),? (\d{4})")),
+    # 13.08.2031 (день первым)
+    ("dmy", re.compile(r"(\d{1,2})[./](\d{1,2})[./](\d{4})")),
+)
+
+
+def parse_whois_date(value):
+    """Приводит дату из ответа WHOIS/RDAP к naive datetime (UTC); None, если формат неизвестен."""
+    value = value.strip()
+    for kind, pattern in _DATE_PATTERNS:
+        match = pattern.match(value)
+        if not match:
+            continue
+        groups = match.groups()
+        try:
+            if kind == "ymd":
+                return datetime(*(int(part) for part in groups if part))
+            if kind == "d_mon_y":
+                return datetime(int(groups[2]), _MONTHS[groups[1].lower()], int(groups[0]))
+            if kind == "mon_d_y":
+                return datetime(int(groups[2]), _MONTHS[groups[0].lower()], int(groups[1]))
+            return datetime(int(groups[2]), int(groups[1]), int(groups[0]))
+        except (KeyError, ValueError):
+            return None
+    return None
+
+
+def _line(*keys):
+    """Шаблон строки `ключ: значение` для любого из ключей."""
+    names = "|".join(re.escape(key) for key in keys)
+    return rf"^[ \t]*(?:{names})[ \t]*:[ \t]*(\S[^\r\n]*?)[ \t]*\r?$"
+
+
+def _compile(patterns):
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{pattern})" for pattern in patterns), re.IGNORECASE | re.MULTILINE)
+
+
+class RegistryFormat:
+    """Скомпилированные шаблоны полей одного формата ответа."""
+
+    def __init__(self, name, expiry, registrar, contact):
+        self.name = name
+        # Все шаблоны поля собраны в одно регулярное выражение и скомпилированы при импорте.
+        self.fields = tuple(
+            (field, _compile(patterns))
+            for field, patterns in (("expiry", expiry), ("registrar", registrar), ("contact", contact))
+        )
+
+    def parse(self, text):
+        """Один проход поиска на поле; берётся первое вхождение в тексте."""
+        values = {}
+        for field, pattern in self.fields:
+            match = pattern.search(text) if pattern else None
+            values[field] = next((group for group in match.groups() if group), None) if match else None
+        expiry = values["expiry"]
+        return WhoisRecord(
+            parse_whois_date(expiry) if expiry else None,
+            values["registrar"],
+            values["contact"],
+        )
+
+
+ICANN_EXPIRY = (_line("Registry Expiry Date", "Registrar Registration Expiration Date", "Expiration Date"),)
+ICANN_REGISTRAR = (_line("Registrar"),)
+ICANN_CONTACT = (_line("Registrar URL"),)
+TCINET_EXPIRY = (_line("paid-till"),)
+TCINET_CONTACT = (_line("admin-contact"),)
+# Nominet пишет значение на следующей строке после «Registrar:».
+NOMINET_REGISTRAR = (r"^[ \t]*Registrar:[ \t]*\r?\n[ \t]*(\S[^\r\n]*?)[ \t]*\r?$",)
+NOMINET_CONTACT = (r"^[ \t]*Registrar:[ \t]*\r?\n[^\r\n]*\r?\n[ \t]*URL:[ \t]*(\S+)",)
+JPRS_EXPIRY = (r"^\[(?:有効期限|Expires on)\][ \t]*(\S[^\r\n]*?)[ \t]*\r?$",)
+
+FORMATS = {
+    "icann": RegistryFormat("icann", ICANN_EXPIRY, ICANN_REGISTRAR, ICANN_CONTACT),
+    "tcinet": RegistryFormat("tcinet", TCINET_EXPIRY, ICANN_REGISTRAR, TCINET_CONTACT),
+    "nominet": RegistryFormat("nominet", (_line("Expiry date"),), NOMINET_REGISTRAR, NOMINET_CONTACT),
+    "jprs": RegistryFormat("jprs", JPRS_EXPIRY, (), ()),
+    "registro_br": RegistryFormat("registro_br", (_line("expires"),), (), ()),
+    "afnic": RegistryFormat("afnic", (_line("Expiry Date"),), ICANN_REGISTRAR, (_line("website"),)),
+}
+
+# Для серверов без записи в REGISTRY_FORMATS и для ответов, не совпавших со своим форматом.
+GENERIC_FORMAT = RegistryFormat(
+    "generic",
+    expiry=ICANN_EXPIRY + TCINET_EXPIRY + JPRS_EXPIRY + (
+        _line("Expiry date", "expires", "expire", "Expire Date", "renewal date", "Valid Until"),
+    ),
+    registrar=NOMINET_REGISTRAR + ICANN_REGISTRAR + (_line("Sponsoring Registrar"),),
+    contact=ICANN_CONTACT + TCINET_CONTACT + (_line("website"),),
+)
+
+REGISTRY_FORMATS = {
+    "whois.verisign-grs.com": "icann",
+    "whois.publicinterestregistry.org": "icann",
+    "whois.pir.org": "icann",
+    "whois.nic.io": "icann",
+    "whois.nic.me": "icann",
+    "whois.nic.info": "icann",
+    "whois.markmonitor.com": "icann",
+    "whois.godaddy.com": "icann",
+    "whois.namecheap.com": "icann",
+    "whois.tcinet.ru": "tcinet",
+    "whois.nic.uk": "nominet",
+    "whois.jprs.jp": "jprs",
+    "whois.registro.br": "registro_br",
+    "whois.nic.fr": "afnic",
+}
+
+
+def format_for(server):
+    """Формат ответа по имени WHOIS-сервера (`host`, `host:port` или `whois://host`)."""
+    if not server:
+        return GENERIC_FORMAT
+    host = server.split("://", 1)[-1].split(":", 1)[0].lower()
+    name = REGISTRY_FORMATS.get(host)
+    return FORMATS[name] if name else GENERIC_FORMAT
+
+
+def parse_whois(text, server=None):
+    """Разбирает ответ WHOIS форматом его сервера; для неизвестных серверов — общим форматом."""
+    fmt = format_for(server)
+    record = fmt.parse(text)
+    if record.expires_at is None and fmt is not GENERIC_FORMAT:
+        # Реестр сменил формат: разбираем тот же текст общими шаблонами, без повторного запроса.
+        generic = GENERIC_FORMAT.parse(text)
+        record = WhoisRecord(
+            generic.expires_at,
+            record.registrar or generic.registrar,
+            record.contact_url or generic.contact_url,
+        )
+    return record
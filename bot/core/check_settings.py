@@ -0,0 +1,73 @@
+"""Per-site and per-user check interval and priority tiers."""
+import os
+
+PRIORITY_LOW = 0
+PRIORITY_NORMAL = 1
+PRIORITY_HIGH = 2
+
+PRIORITY_NAMES = {
+    "low": PRIORITY_LOW,
+    "низкий": PRIORITY_LOW,
+    "normal": PRIORITY_NORMAL,
+    "обычный": PRIORITY_NORMAL,
+    "high": PRIORITY_HIGH,
+    "высокий": PRIORITY_HIGH,
+}
+PRIORITY_LABELS = {
+    PRIORITY_LOW: "низкий",
+    PRIORITY_NORMAL: "обычный",
+    PRIORITY_HIGH: "высокий",
+}
+# Слова, которыми настройку сбрасывают к значению пользователя или общему.
+RESET_WORDS = {"default", "reset", "сброс", "по-умолчанию"}
+
+MIN_CHECK_INTERVAL_MINUTES = int(os.getenv("MIN_CHECK_INTERVAL_MINUTES", "1"))
+MAX_CHECK_INTERVAL_MINUTES = 24 * 60
+
+
+class CheckSettingsError(ValueError):
+    pass
+
+
+def parse_interval(text):
+    """Минуты из «15», «15m», «2h» или «2ч»; None — сбросить настройку."""
+    value = text.strip().lower()
+    if value in RESET_WORDS:
+        return None
+    multiplier = 1
+    if value[-1:] in ("h", "ч"):
+        value, multiplier = value[:-1], 60
+    elif value[-1:] in ("m", "м"):
+        value = value[:-1]
+    if not value.isdigit():
+        raise CheckSettingsError(f"не понял интервал «{text}»: укажите минуты, например 15 или 2h")
+    minutes = int(value) * multiplier
+    if not MIN_CHECK_INTERVAL_MINUTES <= minutes <= MAX_CHECK_INTERVAL_MINUTES:
+        raise CheckSettingsError(
+            f"интервал должен быть от {MIN_CHECK_INTERVAL_MINUTES} до {MAX_CHECK_INTERVAL_MINUTES} минут"
+        )
+    return minutes
+
+
+def parse_priority(text):
+    """Уровень приоритета по имени (high/normal/low или по-русски); None — сбросить настройку."""
+    value = text.strip().lower()
+    if value in RESET_WORDS:
+        return None
+    if value not in PRIORITY_NAMES:
+        raise CheckSettingsError(f"не понял приоритет «{text}»: high, normal или low")
+    return PRIORITY_NAMES[value]
+
+
+def format_interval(minutes):
+    if minutes is None:
+        return "по умолчанию"
+    if minutes % 60 == 0:
+        return f"{minutes // 60} ч"
+    return f"{minutes} мин"
+
+
+def format_priority(priority):
+    if priority is None:
+        return "по умолчанию"
+    return PRIORITY_LABELS.get(priority, str(priority))
@@ -0,0 +1,49 @@
+"""Asyncio queue whose items become available after a delay."""
+import asyncio
+import heapq
+import itertools
+import time
+
+
+class DelayedQueue:
+    """Очередь с отложенной выдачей: get() возвращает элемент, срок которого наступил.
+
+    Среди готовых элементов первым выдаётся элемент с наибольшим priority, при равном —
+    с самым ранним сроком. Пока очередь успевает, порядок не важен; когда копится
+    отставание, высокий приоритет и самые давние элементы проходят вперёд.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._heap = []
+        self._ready = []
+        self._counter = itertools.count()
+        self._changed = asyncio.Event()
+
+    def put(self, item, delay=0.0, priority=0, due=None):
+        """due — срок по часам очереди вместо now + delay; может быть в прошлом, тогда элемент старше."""
+        if due is None:
+            due = self._clock() + max(0.0, delay)
+        heapq.heappush(self._heap, (due, next(self._counter), priority, item))
+        self._changed.set()
+
+    def _promote(self):
+        now = self._clock()
+        while self._heap and self._heap[0][0] <= now:
+            due, order, priority, item = heapq.heappop(self._heap)
+            heapq.heappush(self._ready, (-priority, due, order, item))
+
+    async def get(self):
+        while True:
+            self._promote()
+            if self._ready:
+                return heapq.heappop(self._ready)[3]
+            timeout = self._heap[0][0] - self._clock() if self._heap else None
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def __len__(self):
+        return len(self._heap) + len(self._ready)
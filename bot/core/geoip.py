@@ -0,0 +1,187 @@
+"""Offline IP → country/ASN lookup over a memory-mapped range database.
+
+The file is built by `python -m bot.tools.update_geoip` from the ip2asn TSV
+dump (range_start, range_end, AS number, country code, AS description).
+Layout, little-endian:
+
+    header   8s magic, I IPv4 ranges, I IPv6 ranges, I names
+    IPv4     I range starts (sorted) | records <II2sI: end, asn, country, name index
+    IPv6     16s range starts (sorted, big-endian) | records <16sI2sI
+    names    I offsets[names + 1] | UTF-8 blob
+"""
+import bisect
+import ipaddress
+import mmap
+import os
+import struct
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+GEOIP_DB_PATH = os.getenv(
+    "GEOIP_DB_PATH",
+    str(Path(__file__).resolve().parents[1] / "data" / "ip2asn.bin"),
+)
+GEOIP_RELOAD_CHECK_SECONDS = 60.0
+
+MAGIC = b"IP2ASN01"
+_HEADER = struct.Struct("<8sIII")
+_V4_RECORD = struct.Struct("<II2sI")
+_V6_RECORD = struct.Struct("<16sI2sI")
+
+
+class GeoInfo(NamedTuple):
+    country: str | None
+    asn: int
+    as_name: str | None
+
+
+class GeoIpDatabaseError(Exception):
+    pass
+
+
+def write_database(path, ranges):
+    """Записывает файл базы из итерируемых (start, end, asn, country, as_name); start/end — ip_address."""
+    v4, v6 = [], []
+    names = {}
+    for start, end, asn, country, as_name in ranges:
+        index = names.setdefault(as_name or "", len(names))
+        country = (country or "").upper().encode("ascii", errors="ignore")[:2].ljust(2, b"\0")
+        (v4 if start.version == 4 else v6).append((int(start), int(end), asn, country, index))
+    v4.sort()
+    v6.sort()
+
+    blob = bytearray()
+    offsets = []
+    for name in names:
+        offsets.append(len(blob))
+        blob += name.encode("utf-8")
+    offsets.append(len(blob))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(v4), len(v6), len(names)))
+        f.write(struct.pack(f"<{len(v4)}I", *(row[0] for row in v4)))
+        for _, end, asn, country, index in v4:
+            f.write(_V4_RECORD.pack(end, asn, country, index))
+        for row in v6:
+            f.write(row[0].to_bytes(16, "big"))
+        for _, end, asn, country, index in v6:
+            f.write(_V6_RECORD.pack(end.to_bytes(16, "big"), asn, country, index))
+        f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        f.write(blob)
+    # Читатели держат старый файл через mmap; новый подменяем атомарно.
+    os.replace(tmp_path, path)
+    return len(v4), len(v6)
+
+
+class GeoIpDatabase:
+    """Поиск диапазона бинарным поиском прямо по отображённому в память файлу."""
+
+    def __init__(self, path=GEOIP_DB_PATH):
+        self.path = str(path)
+        with open(self.path, "rb") as f:
+            self.mtime = os.fstat(f.fileno()).st_mtime
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.v4_count, self.v6_count, names_count = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise GeoIpDatabaseError(f"{self.path}: неизвестный формат файла")
+
+        view = memoryview(self._map)
+        offset = _HEADER.size
+        self._v4_starts = view[offset:offset + 4 * self.v4_count].cast("I")
+        offset += 4 * self.v4_count
+        self._v4_records = offset
+        offset += _V4_RECORD.size * self.v4_count
+        self._v6_starts = offset
+        offset += 16 * self.v6_count
+        self._v6_records = offset
+        offset += _V6_RECORD.size * self.v6_count
+        self._name_offsets = view[offset:offset + 4 * (names_count + 1)].cast("I")
+        self._names = offset + 4 * (names_count + 1)
+
+    def __len__(self):
+        return self.v4_count + self.v6_count
+
+    def _name(self, index):
+        start = self._names + self._name_offsets[index]
+        end = self._names + self._name_offsets[index + 1]
+        return self._map[start:end].decode("utf-8") or None
+
+    def _info(self, asn, country, name_index):
+        country = country.rstrip(b"\0").decode("ascii")
+        return GeoInfo(country or None, asn, self._name(name_index))
+
+    def _lookup_v4(self, value):
+        index = bisect.bisect_right(self._v4_starts, value) - 1
+        if index < 0:
+            return None
+        end, asn, country, name_index = _V4_RECORD.unpack_from(self._map, self._v4_records + index * _V4_RECORD.size)
+        if value > end:
+            return None
+        return self._info(asn, country, name_index)
+
+    def _lookup_v6(self, value):
+        key = value.to_bytes(16, "big")
+        data = self._map
+        lo, hi = 0, self.v6_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = self._v6_starts + mid * 16
+            if data[start:start + 16] <= key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == 0:
+            return None
+        end, asn, country, name_index = _V6_RECORD.unpack_from(data, self._v6_records + (lo - 1) * _V6_RECORD.size)
+        if key > end:
+            return None
+        return self._info(asn, country, name_index)
+
+    def lookup(self, ip):
+        """GeoInfo для адреса или None, если адрес не входит ни в один диапазон."""
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if address.version == 4:
+            return self._lookup_v4(int(address))
+        return self._lookup_v6(int(address))
+
+    def close(self):
+        self._v4_starts.release()
+        self._name_offsets.release()
+        self._map.close()
+
+
+_database = None
+_checked_at = 0.0
+
+
+def get_geoip_database(path=None):
+    """Открытая база или None, если файла нет; раз в минуту проверяет, не обновился ли файл."""
+    global _database, _checked_at
+    path = str(path or GEOIP_DB_PATH)
+    now = time.monotonic()
+    if _database is not None and _database.path == path and now - _checked_at < GEOIP_RELOAD_CHECK_SECONDS:
+        return _database
+    _checked_at = now
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return _database if _database is not None and _database.path == path else None
+    if _database is None or _database.path != path or _database.mtime != mtime:
+        try:
+            _database = GeoIpDatabase(path)
+        except (OSError, ValueError, struct.error, GeoIpDatabaseError) as e:
+            print(f"GeoIP database error: {type(e).__name__}: {e}")
+    return _database
+
+
+def lookup_ip(ip):
+    database = get_geoip_database()
+    return database.lookup(ip) if database is not None else None
@@ -0,0 +1,75 @@
+"""Incremental parser for a top-level JSON array of small items."""
+import codecs
+import json
+
+MAX_ITEM_CHARS = 1024 * 1024
+
+
+class JsonStreamError(ValueError):
+    pass
+
+
+class JsonArrayStream:
+    """Разбирает `[item, item, ...]` по кускам: в памяти держится только недочитанный элемент.
+
+    Каждый элемент разбирается json.JSONDecoder.raw_decode, как только он получен целиком.
+    """
+
+    def __init__(self, max_item_chars=MAX_ITEM_CHARS):
+        self.max_item_chars = max_item_chars
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._buffer = ""
+        self._started = False
+        self.finished = False
+
+    def feed(self, chunk):
+        """Принимает очередной кусок байтов и возвращает элементы, которые в нём завершились."""
+        if self.finished:
+            return []
+        self._buffer += self._text.decode(chunk)
+        return self._drain(final=False)
+
+    def close(self):
+        """Разбирает остаток; ошибка, если массив оборван."""
+        self._buffer += self._text.decode(b"", final=True)
+        items = self._drain(final=True)
+        if not self.finished:
+            raise JsonStreamError("JSON-массив оборван")
+        return items
+
+    def _drain(self, final):
+        buffer = self._buffer
+        length = len(buffer)
+        pos = 0
+        items = []
+        while True:
+            while pos < length and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= length:
+                break
+            if not self._started:
+                if buffer[pos] != "[":
+                    raise JsonStreamError("ожидался JSON-массив")
+                self._started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                self.finished = True
+                pos = length
+                break
+            try:
+                item, end = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                # Недочитанный элемент не отличить от ошибки, пока не кончились данные
+                # или элемент не превысил лимит размера.
+                if final or length - pos > self.max_item_chars:
+                    raise JsonStreamError(f"ошибка JSON: {e.msg}") from e
+                break
+            if end == length and not final and isinstance(item, (int, float)):
+                # Число на границе куска может продолжиться в следующем.
+                break
+            items.append(item)
+            pos = end
+        self._buffer = buffer[pos:]
+        return items
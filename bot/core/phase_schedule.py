@@ -0,0 +1,96 @@
+"""Recurring schedule where every key runs at its own stable phase of the interval."""
+import hashlib
+import heapq
+import itertools
+import math
+import time
+
+
+def stable_phase(key, interval):
+    """Смещение ключа внутри интервала: не меняется между перезапусками и равномерно по ключам."""
+    # crc32 последовательных id ложится неравномерно, поэтому берём криптографический хэш.
+    digest = hashlib.blake2b(str(key).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2 ** 64 * interval
+
+
+def next_slot(after, interval, phase):
+    """Ближайший момент вида phase + k * interval строго позже after."""
+    return phase + (math.floor((after - phase) / interval) + 1) * interval
+
+
+class PhaseSchedule:
+    """Куча сроков: каждый ключ приходит раз в свой интервал, в одну и ту же фазу.
+
+    Сроки считаются от эпохи, поэтому после перезапуска ключ попадает в тот же слот,
+    а ключи равномерно распределены по интервалу вместо одновременного старта.
+    Удалённые и перенесённые ключи вычищаются из кучи лениво.
+    """
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._heap = []
+        self._counter = itertools.count()
+        # key -> (due, interval, phase)
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def _push(self, key, due, interval, phase):
+        self._entries[key] = (due, interval, phase)
+        heapq.heappush(self._heap, (due, next(self._counter), key))
+
+    def sync(self, intervals):
+        """Сверяет расписание с {key: интервал в секундах}.
+
+        Новые ключи и ключи со сменившимся интервалом встают в ближайший слот своей фазы,
+        отсутствующие в intervals забываются.
+        """
+        now = self._clock()
+        for key in self._entries.keys() - intervals.keys():
+            del self._entries[key]
+        for key, interval in intervals.items():
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == interval:
+                continue
+            phase = stable_phase(key, interval)
+            self._push(key, next_slot(now, interval, phase), interval, phase)
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [(due, next(self._counter), key) for key, (due, _, _) in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    def _prune(self):
+        while self._heap:
+            due, _, key = self._heap[0]
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == due:
+                return
+            heapq.heappop(self._heap)
+
+    def next_due(self):
+        self._prune()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now=None):
+        """(key, срок) для наступивших сроков, от самого раннего; ключ сразу переносится в следующий слот.
+
+        Если опоздали больше чем на интервал, пропущенные слоты не выдаются: ключ приходит
+        один раз со своим самым старым сроком, а следующий слот считается от now.
+        """
+        now = self._clock() if now is None else now
+        due = []
+        while True:
+            self._prune()
+            if not self._heap or self._heap[0][0] > now:
+                return due
+            when, _, key = heapq.heappop(self._heap)
+            _, interval, phase = self._entries[key]
+            due.append((key, when))
+            self._push(key, next_slot(now, interval, phase), interval, phase)
+
+    def interval(self, key):
+        entry = self._entries.get(key)
+        return entry[1] if entry is not None else None
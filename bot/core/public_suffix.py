@@ -0,0 +1,109 @@
+"""Registrable-domain lookup backed by the bundled Public Suffix List."""
+import ipaddress
+import os
+from pathlib import Path
+
+PUBLIC_SUFFIX_LIST_PATH = os.getenv(
+    "PUBLIC_SUFFIX_LIST_PATH",
+    str(Path(__file__).resolve().parents[1] / "data" / "public_suffix_list.dat"),
+)
+
+
+class _Node:
+    __slots__ = ("children", "kind")
+
+    def __init__(self):
+        self.children = {}
+        # None — промежуточный узел, иначе "icann" или "private": здесь заканчивается правило.
+        self.kind = None
+
+
+def _to_ascii(label):
+    if label.isascii():
+        return label
+    try:
+        return label.encode("idna").decode("ascii")
+    except UnicodeError:
+        return label
+
+
+class PublicSuffixList:
+    """Префиксное дерево правил PSL по перевёрнутым меткам: поиск за O(число меток)."""
+
+    def __init__(self, lines):
+        self._root = _Node()
+        kind = "icann"
+        for line in lines:
+            line = line.strip()
+            if line.startswith("// ===BEGIN PRIVATE DOMAINS==="):
+                kind = "private"
+            if not line or line.startswith("//"):
+                continue
+            self._add(line.split()[0].lower(), kind)
+
+    @classmethod
+    def load(cls, path=PUBLIC_SUFFIX_LIST_PATH):
+        with open(path, encoding="utf-8") as f:
+            return cls(f)
+
+    def _add(self, rule, kind):
+        exception = rule.startswith("!")
+        labels = rule.lstrip("!").split(".")
+        node = self._root
+        for label in reversed(labels[1:] if exception else labels):
+            node = node.children.setdefault(_to_ascii(label), _Node())
+        if exception:
+            node = node.children.setdefault("!" + _to_ascii(labels[0]), _Node())
+        node.kind = kind
+
+    def suffix_length(self, labels, include_private=True):
+        """Число меток публичного суффикса для имени, заданного списком меток."""
+        node = self._root
+        # Правило по умолчанию "*": TLD — публичный суффикс.
+        length = 1
+        for depth, label in enumerate(reversed(labels)):
+            if ("!" + label) in node.children:
+                return depth
+            child = node.children.get(label) or node.children.get("*")
+            if child is None:
+                break
+            node = child
+            if node.kind == "icann" or (include_private and node.kind == "private"):
+                length = depth + 1
+        return length
+
+    def registrable_domain(self, hostname, include_private=True):
+        """eTLD+1 для имени хоста; None для IP-адресов и самих публичных суффиксов."""
+        labels = _split_hostname(hostname)
+        if not labels:
+            return None
+        length = self.suffix_length(labels, include_private)
+        if len(labels) <= length:
+            return None
+        return ".".join(labels[-length - 1:])
+
+
+def _split_hostname(hostname):
+    hostname = (hostname or "").strip().rstrip(".").lower()
+    if not hostname:
+        return []
+    try:
+        ipaddress.ip_address(hostname)
+        return []
+    except ValueError:
+        pass
+    return [_to_ascii(label) for label in hostname.split(".") if label]
+
+
+_default_list = None
+
+
+def get_public_suffix_list():
+    global _default_list
+    if _default_list is None:
+        _default_list = PublicSuffixList.load()
+    return _default_list
+
+
+def registrable_domain(hostname, include_private=True):
+    return get_public_suffix_list().registrable_domain(hostname, include_private)
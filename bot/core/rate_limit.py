@@ -0,0 +1,52 @@
+"""Token bucket rate limiter for asyncio code."""
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Корзина токенов: не больше `rate` запросов в секунду в среднем и `burst` подряд.
+
+    Ожидающие получают токены по очереди (FIFO), на паузу backoff() выдача останавливается.
+    """
+
+    def __init__(self, rate, burst=1, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self):
+        """Сколько секунд ждать следующего токена без учёта очереди."""
+        now = self._clock()
+        self._refill(now)
+        pause = max(0.0, self._paused_until - now)
+        if self._tokens >= 1:
+            return pause
+        return max(pause, (1 - self._tokens) / self.rate)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                delay = self.wait_time()
+                if delay <= 0:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep(delay)
+
+    def backoff(self, seconds):
+        """Останавливает выдачу токенов на `seconds` секунд и обнуляет запас."""
+        now = self._clock()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 0.0
+        self._updated = now
+
+    @property
+    def paused_for(self):
+        return max(0.0, self._paused_until - self._clock())
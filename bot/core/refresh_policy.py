@@ -0,0 +1,60 @@
+"""When to re-fetch domain registration and certificate data."""
+from datetime import timedelta
+
+# (осталось дней не больше N, интервал до следующей проверки); дальше — максимум.
+DOMAIN_REFRESH_STEPS = (
+    (7, timedelta(hours=6)),
+    (30, timedelta(days=1)),
+    (90, timedelta(days=3)),
+)
+DOMAIN_REFRESH_MAX = timedelta(days=7)
+DOMAIN_UNKNOWN_DELAY = timedelta(days=1)
+DOMAIN_FAILURE_DELAY = timedelta(hours=1)
+
+CERTIFICATE_REFRESH_STEPS = (
+    (3, timedelta(hours=1)),
+    (14, timedelta(hours=6)),
+    (30, timedelta(hours=12)),
+)
+CERTIFICATE_REFRESH_MAX = timedelta(days=1)
+CERTIFICATE_CHANGED_DELAY = timedelta(minutes=15)
+CERTIFICATE_FAILURE_DELAY = timedelta(minutes=5)
+
+FAILURE_MAX_DELAY = timedelta(hours=12)
+
+
+def _by_days_left(days_left, steps, maximum):
+    for limit, delay in steps:
+        if days_left <= limit:
+            return delay
+    return maximum
+
+
+def failure_delay(failures, base, maximum=FAILURE_MAX_DELAY):
+    """Экспоненциальная пауза после `failures` неудач подряд."""
+    # Показатель ограничен, чтобы длинная серия неудач не переполняла timedelta.
+    return min(maximum, base * 2 ** min(max(0, failures - 1), 20))
+
+
+def domain_refresh_delay(days_left, failures=0):
+    """Чем ближе окончание регистрации, тем чаще проверяем продление."""
+    if failures:
+        return failure_delay(failures, DOMAIN_FAILURE_DELAY)
+    if days_left is None or days_left < 0:
+        return DOMAIN_UNKNOWN_DELAY
+    return _by_days_left(days_left, DOMAIN_REFRESH_STEPS, DOMAIN_REFRESH_MAX)
+
+
+def certificate_refresh_delay(days_left, failures=0, changed=False):
+    """Интервал до следующего чтения сертификата.
+
+    Новый отпечаток или новый IP проверяем вскоре ещё раз: за балансировщиком
+    выкладка сертификата может быть не завершена.
+    """
+    if failures:
+        return failure_delay(failures, CERTIFICATE_FAILURE_DELAY)
+    if changed:
+        return CERTIFICATE_CHANGED_DELAY
+    if days_left is None or days_left < 0:
+        return CERTIFICATE_REFRESH_STEPS[0][1]
+    return _by_days_left(days_left, CERTIFICATE_REFRESH_STEPS, CERTIFICATE_REFRESH_MAX)
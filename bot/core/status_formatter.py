@@ -50,15 +50,22 @@ def format_http_line(http_details):
     return f"HTTP: DOWN | причина: {error}{attempts_text}"
 
 
-def format_ssl_line(ssl_days):
+def format_ssl_line(ssl_days, ssl_details=None):
+    handshake_ms = (ssl_details or {}).get("handshake_ms")
+    handshake_text = f" | TLS {handshake_ms} ms" if handshake_ms is not None else ""
     if ssl_days >= 0:
-        return f"SSL: {ssl_days} дней до истечения"
+        return f"SSL: {ssl_days} дней до истечения{handshake_text}"
+    error = (ssl_details or {}).get("error")
+    if error:
+        return f"SSL: не проверен | {error}"
     return "SSL: не проверен"
 
 
 def format_domain_line(domain_days, registrar=None, contact_url=None):
     if domain_days == -2:
         return "Домен: проверка недоступна для поддоменов"
+    if domain_days == -3:
+        return "Домен: WHOIS-сервер ограничил запросы, проверим позже"
     if domain_days >= 0:
         line = f"Домен: {domain_days} дней до окончания"
     else:
@@ -70,23 +77,49 @@ def format_domain_line(domain_days, registrar=None, contact_url=None):
     return line
 
 
-def format_status_text(http_details, ssl_days, domain_days, registrar=None, contact_url=None):
+def country_flag(country):
+    if not country or len(country) != 2 or not country.isalpha():
+        return ""
+    return "".join(chr(0x1F1E6 + ord(letter) - ord("A")) for letter in country.upper())
+
+
+def format_geo_info(ip, info):
+    """Строка GeoIP/ASN для адреса; info — GeoInfo из локальной базы."""
+    country = f"{country_flag(info.country)} {info.country}".strip() if info.country else "неизвестно"
+    asn = f"AS{info.asn} ({info.as_name})" if info.as_name else f"AS{info.asn}"
+    return f"🌐 IP: {ip}\n📍 Страна: {country}\n🛰️  ASN: {asn}"
+
+
+def format_status_text(http_details, ssl_days, domain_days, registrar=None, contact_url=None, ssl_details=None):
     return "\n".join([
         format_http_line(http_details),
-        format_ssl_line(ssl_days),
+        format_ssl_line(ssl_days, ssl_details),
         format_domain_line(domain_days, registrar, contact_url),
     ])
 
 
-def format_user_status_message(url, http_details, ssl_days, domain_days, registrar=None, contact_url=None):
+def format_user_status_message(
+    url,
+    http_details,
+    ssl_days,
+    domain_days,
+    registrar=None,
+    contact_url=None,
+    ssl_details=None,
+):
     availability = "✅ Сайт доступен" if http_details.get("ok") else "❌ Сайт недоступен"
     return (
         f"🔗 {url}\n"
         f"{availability}\n"
-        f"{format_status_text(http_details, ssl_days, domain_days, registrar, contact_url)}"
+        f"{format_status_text(http_details, ssl_days, domain_days, registrar, contact_url, ssl_details)}"
     )
 
 
+def format_timed_out_parts(parts):
+    names = {"http": "HTTP", "ssl": "SSL", "domain": "домен"}
+    return "⏱ Не уложились в лимит времени: " + ", ".join(names.get(part, part) for part in parts)
+
+
 def format_down_alert(
     url,
     http_details,
@@ -219,3 +252,69 @@ def split_message(text, max_len=3500):
     if current:
         chunks.append(current)
     return chunks or [""]
+
+
+def format_subdomain_progress(domain, progress):
+    megabytes = progress.bytes_read / (1024 * 1024)
+    return (
+        f"🔍 Ищу поддомены для {domain}...\n"
+        f"crt.sh: обработано {progress.entries} записей ({megabytes:.1f} МБ), "
+        f"уникальных поддоменов: {progress.unique}"
+    )
+
+
+def format_subdomain_sources(sources):
+    """Строка с итогом по каждому источнику: число имён, время или ошибка."""
+    parts = []
+    for source in sources:
+        if source.timed_out:
+            parts.append(f"{source.name}: не уложился в {source.elapsed:.0f} с")
+        elif source.error:
+            parts.append(f"{source.name}: ошибка")
+        else:
+            parts.append(f"{source.name}: {len(source.subdomains)} за {source.elapsed:.1f} с")
+    return "Источники: " + "; ".join(parts)
+
+
+def format_subdomain_scan(scan):
+    """Откуда результат: из кэша, дополненный или полный поиск по источникам."""
+    if scan.from_cache:
+        return f"Из кэша от {scan.scanned_at:%d.%m.%Y %H:%M} UTC"
+    line = format_subdomain_sources(scan.sources)
+    if scan.last_crtsh_id is not None and scan.added < len(scan.subdomains):
+        line += f"\nНовых с прошлого поиска: {scan.added}"
+    return line
+
+
+def format_subdomain_validation(probes, probe_http):
+    resolved = sum(1 for probe in probes if probe.ip)
+    line = f"Резолвятся: {resolved} из {len(probes)}"
+    if probe_http:
+        line += f", отвечают по HTTP: {sum(1 for probe in probes if probe.status.isdigit())}"
+    return line
+
+
+def format_subdomain_probe(probe):
+    if probe.ip is None:
+        return f"• `{probe.name}` — {probe.status}"
+    return f"• `{probe.name}` — {probe.ip}, {probe.status}, {probe.latency_ms} мс"
+
+
+def format_subdomain_partial(domain, subdomains, sources, preview=10):
+    lines = [
+        f"🔍 {domain}: уже найдено {len(subdomains)} поддоменов, жду остальные источники...",
+        format_subdomain_sources(sources),
+    ]
+    lines.extend(f"• {name}" for name in subdomains[:preview])
+    if len(subdomains) > preview:
+        lines.append(f"… и ещё {len(subdomains) - preview}")
+    return "\n".join(lines)
+
+
+def format_subdomain_truncated(progress):
+    reasons = {
+        "bytes": "по объёму ответа",
+        "entries": "по числу записей",
+        "subdomains": "по числу поддоменов",
+    }
+    return f"⚠️ Ответ crt.sh прочитан не полностью: достигнут лимит {reasons.get(progress.truncated, progress.truncated)}"
@@ -5,6 +5,28 @@ def normalize_url(url: str) -> str:
     url = url.strip().lower()
     if not url.startswith(("http://", "https://")):
         url = "https://" + url
-    url = url.replace("www.", "")
-    parsed = urlparse(url)
-    return f"https://{parsed.hostname}" if parsed.hostname else url
+    hostname = urlparse(url).hostname
+    if not hostname:
+        return url
+    # Убираем только ведущую метку www, а не подстроку: awww.ru остаётся awww.ru.
+    return f"https://{hostname.removeprefix('www.')}"
+
+
+def canonical_url(url: str) -> str:
+    """Ключ проверяемого ресурса: одинаковые по смыслу URL разных пользователей дают один ключ."""
+    url = url.strip()
+    parsed = urlparse(url if "://" in url else "https://" + url)
+    scheme = (parsed.scheme or "https").lower()
+    host = (parsed.hostname or "").rstrip(".")
+    try:
+        port = parsed.port
+    except ValueError:
+        port = None
+    if port in (None, {"http": 80, "https": 443}.get(scheme)):
+        netloc = host
+    else:
+        netloc = f"{host}:{port}"
+    key = f"{scheme}://{netloc}{parsed.path.rstrip('/')}"
+    if parsed.query:
+        key += f"?{parsed.query}"
+    return key
@@ -3,16 +3,29 @@ import os
 from datetime import datetime, timedelta
 import csv
 
+from bot.core.url_utils import canonical_url
+
 UNSET = object()
 
-conn = psycopg2.connect(
-    dbname=os.getenv("DB_NAME", "devcheck"),
-    user=os.getenv("DB_USER", "user"),
-    password=os.getenv("DB_PASS", "password"),
-    host=os.getenv("DB_HOST", "localhost"),
-    port=os.getenv("DB_PORT", "5432")
-)
+def _connect():
+    return psycopg2.connect(
+        dbname=os.getenv("DB_NAME", "devcheck"),
+        user=os.getenv("DB_USER", "user"),
+        password=os.getenv("DB_PASS", "password"),
+        host=os.getenv("DB_HOST", "localhost"),
+        port=os.getenv("DB_PORT", "5432")
+    )
+
+conn = _connect()
 c = conn.cursor()
+# Отдельное соединение для чтения наступивших проверок, открывается при первом чтении.
+_stream_conn = None
+
+def _stream_connection():
+    global _stream_conn
+    if _stream_conn is None or _stream_conn.closed:
+        _stream_conn = _connect()
+    return _stream_conn
 
 # Таблицы
 c.execute('''CREATE TABLE IF NOT EXISTS sites (
@@ -24,6 +37,88 @@ c.execute('''CREATE TABLE IF NOT EXISTS sites (
     last_checked TIMESTAMP
 )''')
 
+# Проверяемый ресурс: одна строка на канонический URL, общее состояние проверок.
+c.execute('''CREATE TABLE IF NOT EXISTS targets (
+    id SERIAL PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    last_status TEXT,
+    last_checked TIMESTAMP,
+    http_fail_count INTEGER DEFAULT 0,
+    incident_started_at TIMESTAMP,
+    last_success_at TIMESTAMP,
+    last_success_http_status INTEGER,
+    last_success_latency_ms INTEGER,
+    last_resolved_ip TEXT,
+    ssl_expires_at TIMESTAMP,
+    ssl_fingerprint TEXT,
+    ssl_checked_at TIMESTAMP,
+    ssl_failures INTEGER DEFAULT 0,
+    ssl_next_refresh_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc'),
+    last_asn INTEGER,
+    last_country TEXT
+)''')
+
+# Подписка пользователя на ресурс: пауза и флаги отправленных уведомлений.
+# id подписки — это site_id, который используется в callback-кнопках.
+c.execute('''CREATE TABLE IF NOT EXISTS subscriptions (
+    id SERIAL PRIMARY KEY,
+    target_id INTEGER NOT NULL REFERENCES targets(id),
+    user_id BIGINT,
+    username TEXT,
+    url TEXT,
+    is_paused BOOLEAN DEFAULT FALSE,
+    paused_until TIMESTAMP,
+    notified_http BOOLEAN DEFAULT FALSE,
+    notified_http_ts TIMESTAMP,
+    notified_ssl BOOLEAN DEFAULT FALSE,
+    notified_ssl_ts TIMESTAMP,
+    notified_domain BOOLEAN DEFAULT FALSE,
+    notified_domain_ts TIMESTAMP,
+    check_interval_minutes INTEGER,
+    priority SMALLINT
+)''')
+
+# Настройки проверок пользователя; действуют на подписки без собственных значений.
+c.execute('''CREATE TABLE IF NOT EXISTS user_settings (
+    user_id BIGINT PRIMARY KEY,
+    check_interval_minutes INTEGER,
+    priority SMALLINT
+)''')
+
+# Данные регистрации по регистрируемому домену (eTLD+1), общие для всех ресурсов.
+c.execute('''CREATE TABLE IF NOT EXISTS domain_registrations (
+    domain TEXT PRIMARY KEY,
+    expires_at TIMESTAMP,
+    registrar TEXT,
+    contact_url TEXT,
+    checked_at TIMESTAMP NOT NULL,
+    next_refresh_at TIMESTAMP,
+    failures INTEGER DEFAULT 0,
+    status TEXT
+)''')
+
+# Результат GeoIP/ASN по IP-адресу; asn NULL — адрес не найден в базе диапазонов.
+c.execute('''CREATE TABLE IF NOT EXISTS ip_geo (
+    ip TEXT PRIMARY KEY,
+    country TEXT,
+    asn INTEGER,
+    as_name TEXT,
+    checked_at TIMESTAMP NOT NULL
+)''')
+
+# Последний поиск поддоменов по домену; last_crtsh_id — с какого id crt.sh продолжать.
+c.execute('''CREATE TABLE IF NOT EXISTS subdomain_scans (
+    domain TEXT PRIMARY KEY,
+    subdomains TEXT[] NOT NULL DEFAULT '{}',
+    scanned_at TIMESTAMP NOT NULL,
+    last_crtsh_id BIGINT
+)''')
+
+c.execute('''CREATE TABLE IF NOT EXISTS schema_migrations (
+    name TEXT PRIMARY KEY,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)''')
+
 c.execute('''CREATE TABLE IF NOT EXISTS events (
     id SERIAL PRIMARY KEY,
     url TEXT,
@@ -51,60 +146,100 @@ c.execute('''CREATE TABLE IF NOT EXISTS bot_messages (
 conn.commit()
 
 # Методы
+SITE_COLUMNS = "s.id, s.user_id, s.username, s.url, t.last_status, t.last_checked"
+SITES_FROM = "subscriptions s JOIN targets t ON t.id = s.target_id"
+ACTIVE_SUBSCRIPTION = (
+    "COALESCE(s.is_paused, FALSE) = FALSE AND (s.paused_until IS NULL OR s.paused_until <= %s)"
+)
+SITE_TARGET_ID = "(SELECT target_id FROM subscriptions WHERE id = %s)"
+
+def _get_or_create_target(url):
+    c.execute(
+        """
+        INSERT INTO targets (url) VALUES (%s)
+        ON CONFLICT (url) DO UPDATE SET url = EXCLUDED.url
+        RETURNING id
+        """,
+        (canonical_url(url),)
+    )
+    return c.fetchone()[0]
+
+def _delete_orphan_targets():
+    c.execute("""
+        DELETE FROM targets t
+        WHERE NOT EXISTS (SELECT 1 FROM subscriptions s WHERE s.target_id = t.id)
+    """)
+
 def add_site(user_id, url, username=None):
-    c.execute("INSERT INTO sites (user_id, username, url) VALUES (%s, %s, %s) RETURNING id", (user_id, username, url))
+    target_id = _get_or_create_target(url)
+    c.execute(
+        "INSERT INTO subscriptions (target_id, user_id, username, url) VALUES (%s, %s, %s, %s) RETURNING id",
+        (target_id, user_id, username, url)
+    )
     site_id = c.fetchone()[0]
     conn.commit()
     return site_id
 
 def get_sites(user_id):
-    c.execute("SELECT * FROM sites WHERE user_id = %s", (user_id,))
+    c.execute(f"SELECT {SITE_COLUMNS} FROM {SITES_FROM} WHERE s.user_id = %s ORDER BY s.id", (user_id,))
     return c.fetchall()
 
 def get_sites_with_pause(user_id):
     c.execute(
-        """
-        SELECT id, user_id, username, url, last_status, last_checked,
-               (COALESCE(is_paused, FALSE) OR (paused_until IS NOT NULL AND paused_until > %s)) AS is_paused_now
-        FROM sites
-        WHERE user_id = %s
-        ORDER BY id
+        f"""
+        SELECT {SITE_COLUMNS},
+               (COALESCE(s.is_paused, FALSE) OR (s.paused_until IS NOT NULL AND s.paused_until > %s)) AS is_paused_now
+        FROM {SITES_FROM}
+        WHERE s.user_id = %s
+        ORDER BY s.id
         """,
         (datetime.utcnow(), user_id)
     )
     return c.fetchall()
 
 def get_site_by_id(site_id):
-    c.execute("SELECT * FROM sites WHERE id = %s", (site_id,))
+    c.execute(f"SELECT {SITE_COLUMNS} FROM {SITES_FROM} WHERE s.id = %s", (site_id,))
     return c.fetchone()
 
 def get_site_for_user(site_id, user_id):
-    c.execute("SELECT * FROM sites WHERE id = %s AND user_id = %s", (site_id, user_id))
+    c.execute(f"SELECT {SITE_COLUMNS} FROM {SITES_FROM} WHERE s.id = %s AND s.user_id = %s", (site_id, user_id))
     return c.fetchone()
 
 def get_site_by_url_for_user(user_id, url):
-    c.execute("SELECT * FROM sites WHERE user_id = %s AND url = %s", (user_id, url))
+    c.execute(f"SELECT {SITE_COLUMNS} FROM {SITES_FROM} WHERE s.user_id = %s AND s.url = %s", (user_id, url))
+    return c.fetchone()
+
+def get_site_by_target_for_user(user_id, url):
+    """Ищет подписку пользователя на тот же ресурс, даже если URL записан иначе."""
+    c.execute(
+        f"SELECT {SITE_COLUMNS} FROM {SITES_FROM} WHERE s.user_id = %s AND t.url = %s",
+        (user_id, canonical_url(url))
+    )
     return c.fetchone()
 
 def delete_site(user_id, url):
-    c.execute("DELETE FROM sites WHERE user_id = %s AND url = %s", (user_id, url))
+    c.execute("DELETE FROM subscriptions WHERE user_id = %s AND url = %s", (user_id, url))
+    deleted = c.rowcount > 0
+    _delete_orphan_targets()
     conn.commit()
-    return c.rowcount > 0
+    return deleted
 
 def delete_site_by_id(site_id, user_id):
-    c.execute("DELETE FROM sites WHERE id = %s AND user_id = %s", (site_id, user_id))
+    c.execute("DELETE FROM subscriptions WHERE id = %s AND user_id = %s", (site_id, user_id))
+    deleted = c.rowcount > 0
+    _delete_orphan_targets()
     conn.commit()
-    return c.rowcount > 0
+    return deleted
 
 def set_site_paused_by_id(site_id, user_id, paused):
     if paused:
         c.execute(
-            "UPDATE sites SET is_paused = %s WHERE id = %s AND user_id = %s",
+            "UPDATE subscriptions SET is_paused = %s WHERE id = %s AND user_id = %s",
             (paused, site_id, user_id)
         )
     else:
         c.execute(
-            "UPDATE sites SET is_paused = %s, paused_until = NULL WHERE id = %s AND user_id = %s",
+            "UPDATE subscriptions SET is_paused = %s, paused_until = NULL WHERE id = %s AND user_id = %s",
             (paused, site_id, user_id)
         )
     conn.commit()
@@ -112,7 +247,7 @@ def set_site_paused_by_id(site_id, user_id, paused):
 
 def set_site_paused_until_by_id(site_id, user_id, paused_until):
     c.execute(
-        "UPDATE sites SET paused_until = %s WHERE id = %s AND user_id = %s",
+        "UPDATE subscriptions SET paused_until = %s WHERE id = %s AND user_id = %s",
         (paused_until, site_id, user_id)
     )
     conn.commit()
@@ -121,19 +256,19 @@ def set_site_paused_until_by_id(site_id, user_id, paused_until):
 def set_site_paused(user_id, url, paused):
     if paused:
         c.execute(
-            "UPDATE sites SET is_paused = %s WHERE user_id = %s AND url = %s",
+            "UPDATE subscriptions SET is_paused = %s WHERE user_id = %s AND url = %s",
             (paused, user_id, url)
         )
     else:
         c.execute(
-            "UPDATE sites SET is_paused = %s, paused_until = NULL WHERE user_id = %s AND url = %s",
+            "UPDATE subscriptions SET is_paused = %s, paused_until = NULL WHERE user_id = %s AND url = %s",
             (paused, user_id, url)
         )
     conn.commit()
     return c.rowcount > 0
 
 def get_site_pause_status(site_id):
-    c.execute("SELECT is_paused, paused_until FROM sites WHERE id = %s", (site_id,))
+    c.execute("SELECT is_paused, paused_until FROM subscriptions WHERE id = %s", (site_id,))
     row = c.fetchone()
     if not row:
         return False
@@ -141,21 +276,25 @@ def get_site_pause_status(site_id):
     return bool(row[0]) or (paused_until is not None and paused_until > datetime.utcnow())
 
 def admin_delete_site_by_id(site_id):
-    c.execute("DELETE FROM sites WHERE id = %s", (site_id,))
+    c.execute("DELETE FROM subscriptions WHERE id = %s", (site_id,))
+    deleted = c.rowcount > 0
+    _delete_orphan_targets()
     conn.commit()
-    return c.rowcount > 0
+    return deleted
 
 def delete_user_sites(user_id):
     """Удаляет только сайты пользователя, без очистки логов."""
-    c.execute("DELETE FROM sites WHERE user_id = %s", (user_id,))
+    c.execute("DELETE FROM subscriptions WHERE user_id = %s", (user_id,))
     deleted = c.rowcount
+    _delete_orphan_targets()
     conn.commit()
     return deleted
 
 def delete_user_data(user_id):
     """Полностью удаляет пользователя: сайты и его действия в логах."""
-    c.execute("DELETE FROM sites WHERE user_id = %s", (user_id,))
+    c.execute("DELETE FROM subscriptions WHERE user_id = %s", (user_id,))
     sites_deleted = c.rowcount
+    _delete_orphan_targets()
     c.execute("DELETE FROM user_logs WHERE user_id = %s", (user_id,))
     logs_deleted = c.rowcount
     c.execute("DELETE FROM bot_messages WHERE user_id = %s", (user_id,))
@@ -165,9 +304,9 @@ def delete_user_data(user_id):
 
 def get_all_sites(full=False):
     if full:
-        c.execute("SELECT user_id, url, username FROM sites ORDER BY user_id, id")
+        c.execute("SELECT user_id, url, username FROM subscriptions ORDER BY user_id, id")
     else:
-        c.execute("SELECT DISTINCT user_id, url FROM sites ORDER BY user_id, url")
+        c.execute("SELECT DISTINCT user_id, url FROM subscriptions ORDER BY user_id, url")
     return c.fetchall()
 
 def get_admin_users():
@@ -179,8 +318,8 @@ def get_admin_users():
             MAX(last_checked) AS last_checked,
             MAX(last_action_at) AS last_action_at
         FROM (
-            SELECT user_id, username, 'site' AS source, last_checked, NULL::timestamp AS last_action_at
-            FROM sites
+            SELECT s.user_id, s.username, 'site' AS source, t.last_checked, NULL::timestamp AS last_action_at
+            FROM subscriptions s JOIN targets t ON t.id = s.target_id
             UNION ALL
             SELECT user_id, username, 'log' AS source, NULL::timestamp AS last_checked, created_at AS last_action_at
             FROM user_logs
@@ -208,9 +347,9 @@ def get_admin_user(user_id):
             MAX(last_checked) AS last_checked,
             MAX(last_action_at) AS last_action_at
         FROM (
-            SELECT user_id, username, 'site' AS source, last_checked, NULL::timestamp AS last_action_at
-            FROM sites
-            WHERE user_id = %s
+            SELECT s.user_id, s.username, 'site' AS source, t.last_checked, NULL::timestamp AS last_action_at
+            FROM subscriptions s JOIN targets t ON t.id = s.target_id
+            WHERE s.user_id = %s
             UNION ALL
             SELECT user_id, username, 'log' AS source, NULL::timestamp AS last_checked, created_at AS last_action_at
             FROM user_logs
@@ -236,8 +375,8 @@ def get_admin_user(user_id):
     }
 
 def get_admin_stats():
-    c.execute("SELECT COUNT(DISTINCT user_id), COUNT(*) FROM sites")
-    users_with_sites, site_count = c.fetchone()
+    c.execute("SELECT COUNT(DISTINCT user_id), COUNT(*), COUNT(DISTINCT target_id) FROM subscriptions")
+    users_with_sites, site_count, target_count = c.fetchone()
     c.execute("SELECT COUNT(DISTINCT user_id), COUNT(*) FROM user_logs WHERE created_at > %s", (datetime.utcnow() - timedelta(days=14),))
     active_users_14d, logs_14d = c.fetchone()
     c.execute("""
@@ -250,7 +389,7 @@ def get_admin_stats():
                 WHERE COALESCE(is_paused, FALSE) = TRUE
                    OR (paused_until IS NOT NULL AND paused_until > %s)
             )
-        FROM sites
+        FROM subscriptions
     """, (datetime.utcnow(), datetime.utcnow()))
     active_sites, paused_sites = c.fetchone()
     c.execute("SELECT COUNT(*) FROM events WHERE created_at > %s", (datetime.utcnow() - timedelta(days=14),))
@@ -266,6 +405,7 @@ def get_admin_stats():
     return {
         "users_with_sites": users_with_sites or 0,
         "site_count": site_count or 0,
+        "target_count": target_count or 0,
         "active_sites": active_sites or 0,
         "paused_sites": paused_sites or 0,
         "active_users_14d": active_users_14d or 0,
@@ -359,14 +499,17 @@ def get_admin_sites(user_id=None):
     params = [datetime.utcnow()]
     where = ""
     if user_id is not None:
-        where = "WHERE user_id = %s"
+        where = "WHERE s.user_id = %s"
         params.append(user_id)
     c.execute(f"""
-        SELECT id, user_id, username, url, last_status, last_checked,
-               (COALESCE(is_paused, FALSE) OR (paused_until IS NOT NULL AND paused_until > %s)) AS is_paused_now
-        FROM sites
+        SELECT {SITE_COLUMNS},
+               (COALESCE(s.is_paused, FALSE) OR (s.paused_until IS NOT NULL AND s.paused_until > %s)) AS is_paused_now,
+               t.last_resolved_ip, g.country, g.asn, g.as_name,
+               s.check_interval_minutes, s.priority
+        FROM {SITES_FROM}
+        LEFT JOIN ip_geo g ON g.ip = t.last_resolved_ip
         {where}
-        ORDER BY user_id, id
+        ORDER BY s.user_id, s.id
     """, tuple(params))
     return [
         {
@@ -377,33 +520,129 @@ def get_admin_sites(user_id=None):
             "last_status": row[4],
             "last_checked": row[5],
             "is_paused": row[6],
+            "ip": row[7],
+            "country": row[8],
+            "asn": row[9],
+            "as_name": row[10],
+            "check_interval": row[11],
+            "priority": row[12],
         }
         for row in c.fetchall()
     ]
 
-def get_all_site_checks():
-    c.execute("""
-        SELECT id, user_id, url, incident_started_at, last_success_at,
-               last_success_http_status, last_success_latency_ms, last_resolved_ip
-        FROM sites
-        WHERE COALESCE(is_paused, FALSE) = FALSE
-          AND (paused_until IS NULL OR paused_until <= %s)
-        ORDER BY id
-    """, (datetime.utcnow(),))
-    return c.fetchall()
+def iter_site_check_batches(target_ids, batch_size=200):
+    """Активные подписки ресурсов target_ids вместе с состоянием ресурса, пачками.
+
+    Отдаёт (id ресурсов пачки, строки) по batch_size ресурсов: каждая пачка читается
+    одним запросом на отдельном соединении, и его транзакция закрывается до того, как
+    пачка отдана, поэтому ожидание на стороне вызывающего не держит её открытой, а в
+    памяти лежит одна пачка. Ресурсы идут в порядке target_ids, подписки одного
+    ресурса — подряд.
+
+    Дальше в строке: target_id, URL ресурса, сохранённые данные сертификата, ASN
+    и признак, что refresh_policy уже пора перечитать сертификат, а с позиции
+    SITE_CHECK_FLAGS_AT — флаги уведомлений и счётчик провалов (FLAG_COLUMNS),
+    их разбирает site_check_flags().
+    """
+    target_ids = list(target_ids)
+    for start in range(0, len(target_ids), batch_size):
+        batch = target_ids[start:start + batch_size]
+        yield batch, _site_check_rows(batch)
+
+def _site_check_rows(target_ids):
+    global _stream_conn
+    now = datetime.utcnow()
+    stream = _stream_connection()
+    try:
+        with stream.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT s.id, s.user_id, s.url, t.incident_started_at, t.last_success_at,
+                       t.last_success_http_status, t.last_success_latency_ms, t.last_resolved_ip,
+                       t.id, t.url, t.ssl_expires_at, t.ssl_fingerprint, t.ssl_failures, t.last_asn,
+                       COALESCE(t.ssl_next_refresh_at <= %s, FALSE), {FLAG_COLUMNS}
+                FROM {SITES_FROM}
+                JOIN unnest(%s::integer[]) WITH ORDINALITY AS due(target_id, position) ON due.target_id = t.id
+                WHERE {ACTIVE_SUBSCRIPTION}
+                ORDER BY due.position, s.id
+            """, (now, target_ids, now))
+            rows = cursor.fetchall()
+        stream.rollback()
+        return rows
+    except psycopg2.Error:
+        # Соединение могло оборваться: следующее чтение откроет новое.
+        stream.close()
+        _stream_conn = None
+        raise
+
+def get_active_target_schedule(default_interval, default_priority):
+    """{target_id: (интервал в минутах, приоритет)} по активным подпискам.
+
+    Значение подписки важнее значения пользователя, то — общего; у ресурса с
+    несколькими подписчиками берётся самый частый интервал и самый высокий приоритет.
+    """
+    c.execute(f"""
+        SELECT t.id,
+               MIN(COALESCE(s.check_interval_minutes, us.check_interval_minutes, %s)),
+               MAX(COALESCE(s.priority, us.priority, %s))
+        FROM {SITES_FROM}
+        LEFT JOIN user_settings us ON us.user_id = s.user_id
+        WHERE {ACTIVE_SUBSCRIPTION}
+        GROUP BY t.id
+    """, (default_interval, default_priority, datetime.utcnow()))
+    return {row[0]: (row[1], row[2]) for row in c.fetchall()}
+
+def set_site_check_settings_by_id(site_id, user_id, interval=UNSET, priority=UNSET):
+    """Интервал (минуты) и приоритет подписки; None сбрасывает к настройкам пользователя."""
+    updates, values = [], []
+    if interval is not UNSET:
+        updates.append("check_interval_minutes = %s")
+        values.append(interval)
+    if priority is not UNSET:
+        updates.append("priority = %s")
+        values.append(priority)
+    if not updates:
+        return False
+    c.execute(
+        f"UPDATE subscriptions SET {', '.join(updates)} WHERE id = %s AND user_id = %s",
+        (*values, site_id, user_id)
+    )
+    conn.commit()
+    return c.rowcount > 0
+
+def get_user_check_settings(user_id):
+    c.execute("SELECT check_interval_minutes, priority FROM user_settings WHERE user_id = %s", (user_id,))
+    row = c.fetchone()
+    return {"interval": row[0] if row else None, "priority": row[1] if row else None}
+
+def set_user_check_settings(user_id, interval=UNSET, priority=UNSET):
+    """Интервал и приоритет по умолчанию для всех подписок пользователя; None — общие значения."""
+    current = get_user_check_settings(user_id)
+    if interval is not UNSET:
+        current["interval"] = interval
+    if priority is not UNSET:
+        current["priority"] = priority
+    c.execute(
+        """
+        INSERT INTO user_settings (user_id, check_interval_minutes, priority) VALUES (%s, %s, %s)
+        ON CONFLICT (user_id) DO UPDATE
+        SET check_interval_minutes = EXCLUDED.check_interval_minutes, priority = EXCLUDED.priority
+        """,
+        (user_id, current["interval"], current["priority"])
+    )
+    conn.commit()
 
 def get_report_sites(user_id=None):
     params = [datetime.utcnow()]
     where = ""
     if user_id is not None:
-        where = "WHERE user_id = %s"
+        where = "WHERE s.user_id = %s"
         params.append(user_id)
     c.execute(f"""
-        SELECT id, user_id, username, url, last_status, last_checked,
-               (COALESCE(is_paused, FALSE) OR (paused_until IS NOT NULL AND paused_until > %s)) AS is_paused_now
-        FROM sites
+        SELECT {SITE_COLUMNS},
+               (COALESCE(s.is_paused, FALSE) OR (s.paused_until IS NOT NULL AND s.paused_until > %s)) AS is_paused_now
+        FROM {SITES_FROM}
         {where}
-        ORDER BY user_id, id
+        ORDER BY s.user_id, s.id
     """, tuple(params))
     rows = c.fetchall()
     return [
@@ -420,53 +659,190 @@ def get_report_sites(user_id=None):
     ]
 
 def update_site_status(url, status):
-    c.execute("UPDATE sites SET last_status = %s, last_checked = %s WHERE url = %s", (status, datetime.utcnow(), url))
+    c.execute(
+        "UPDATE targets SET last_status = %s, last_checked = %s WHERE url = %s",
+        (status, datetime.utcnow(), canonical_url(url))
+    )
     conn.commit()
 
 def update_site_status_by_id(site_id, status):
     c.execute(
-        "UPDATE sites SET last_status = %s, last_checked = %s WHERE id = %s",
+        f"UPDATE targets SET last_status = %s, last_checked = %s WHERE id = {SITE_TARGET_ID}",
         (status, datetime.utcnow(), site_id)
     )
     conn.commit()
 
-def update_site_success(site_id, http_status=None, latency_ms=None, resolved_ip=None):
+def update_target_status(target_id, status):
+    c.execute(
+        "UPDATE targets SET last_status = %s, last_checked = %s WHERE id = %s",
+        (status, datetime.utcnow(), target_id)
+    )
+    conn.commit()
+
+def update_target_success(target_id, http_status=None, latency_ms=None, resolved_ip=None):
     c.execute(
         """
-        UPDATE sites
+        UPDATE targets
         SET last_success_at = %s,
             last_success_http_status = %s,
             last_success_latency_ms = %s,
             last_resolved_ip = COALESCE(%s, last_resolved_ip)
         WHERE id = %s
         """,
-        (datetime.utcnow(), http_status, latency_ms, resolved_ip, site_id)
+        (datetime.utcnow(), http_status, latency_ms, resolved_ip, target_id)
     )
     conn.commit()
 
-def start_site_incident(site_id, started_at, resolved_ip=None):
+def start_target_incident(target_id, started_at, resolved_ip=None):
     c.execute(
         """
-        UPDATE sites
+        UPDATE targets
         SET incident_started_at = COALESCE(incident_started_at, %s),
             last_resolved_ip = COALESCE(%s, last_resolved_ip)
         WHERE id = %s
         RETURNING incident_started_at
         """,
-        (started_at, resolved_ip, site_id)
+        (started_at, resolved_ip, target_id)
     )
     row = c.fetchone()
     conn.commit()
     return row[0] if row else started_at
 
-def clear_site_incident(site_id):
-    c.execute("UPDATE sites SET incident_started_at = NULL WHERE id = %s", (site_id,))
+def clear_target_incident(target_id):
+    c.execute("UPDATE targets SET incident_started_at = NULL WHERE id = %s", (target_id,))
     conn.commit()
 
 def get_site_statuses():
-    c.execute("SELECT url, last_status FROM sites")
+    c.execute(f"SELECT s.url, t.last_status FROM {SITES_FROM} ORDER BY s.id")
     return c.fetchall()
 
+def get_domain_registration(domain):
+    c.execute(
+        """
+        SELECT expires_at, registrar, contact_url, checked_at, next_refresh_at, failures, status
+        FROM domain_registrations
+        WHERE domain = %s
+        """,
+        (domain,)
+    )
+    row = c.fetchone()
+    if not row:
+        return None
+    return {
+        "expires_at": row[0],
+        "registrar": row[1],
+        "contact_url": row[2],
+        "checked_at": row[3],
+        "next_refresh_at": row[4],
+        "failures": row[5] or 0,
+        "status": row[6],
+    }
+
+def save_domain_registration(
+    domain,
+    expires_at=None,
+    registrar=None,
+    contact_url=None,
+    checked_at=None,
+    next_refresh_at=None,
+    failures=0,
+    status=None,
+):
+    c.execute(
+        """
+        INSERT INTO domain_registrations (
+            domain, expires_at, registrar, contact_url, checked_at, next_refresh_at, failures, status
+        )
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (domain) DO UPDATE
+        SET expires_at = EXCLUDED.expires_at,
+            registrar = EXCLUDED.registrar,
+            contact_url = EXCLUDED.contact_url,
+            checked_at = EXCLUDED.checked_at,
+            next_refresh_at = EXCLUDED.next_refresh_at,
+            failures = EXCLUDED.failures,
+            status = EXCLUDED.status
+        """,
+        (domain, expires_at, registrar, contact_url, checked_at or datetime.utcnow(), next_refresh_at, failures, status)
+    )
+    conn.commit()
+
+def get_ip_geo_many(ips):
+    """Сохранённые результаты GeoIP: {ip: dict} для найденных адресов."""
+    if not ips:
+        return {}
+    c.execute(
+        "SELECT ip, country, asn, as_name, checked_at FROM ip_geo WHERE ip = ANY(%s)",
+        (list(ips),)
+    )
+    return {
+        row[0]: {"country": row[1], "asn": row[2], "as_name": row[3], "checked_at": row[4]}
+        for row in c.fetchall()
+    }
+
+def save_ip_geo_many(rows):
+    """rows: [(ip, country, asn, as_name, checked_at)]."""
+    if not rows:
+        return
+    c.executemany(
+        """
+        INSERT INTO ip_geo (ip, country, asn, as_name, checked_at)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (ip) DO UPDATE
+        SET country = EXCLUDED.country,
+            asn = EXCLUDED.asn,
+            as_name = EXCLUDED.as_name,
+            checked_at = EXCLUDED.checked_at
+        """,
+        rows
+    )
+    conn.commit()
+
+def update_target_network(target_id, asn, country):
+    c.execute(
+        "UPDATE targets SET last_asn = %s, last_country = %s WHERE id = %s",
+        (asn, country, target_id)
+    )
+    conn.commit()
+
+def get_subdomain_scan(domain):
+    c.execute(
+        "SELECT subdomains, scanned_at, last_crtsh_id FROM subdomain_scans WHERE domain = %s",
+        (domain,)
+    )
+    row = c.fetchone()
+    if not row:
+        return None
+    return {"subdomains": row[0] or [], "scanned_at": row[1], "last_crtsh_id": row[2]}
+
+def save_subdomain_scan(domain, subdomains, scanned_at, last_crtsh_id=None):
+    c.execute(
+        """
+        INSERT INTO subdomain_scans (domain, subdomains, scanned_at, last_crtsh_id)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (domain) DO UPDATE
+        SET subdomains = EXCLUDED.subdomains,
+            scanned_at = EXCLUDED.scanned_at,
+            last_crtsh_id = EXCLUDED.last_crtsh_id
+        """,
+        (domain, list(subdomains), scanned_at, last_crtsh_id)
+    )
+    conn.commit()
+
+def update_target_certificate(target_id, next_refresh_at, failures=0, expires_at=UNSET, fingerprint=UNSET):
+    """Назначает следующее чтение сертификата; expires_at и fingerprint — только после успешного чтения."""
+    updates = ["ssl_next_refresh_at = %s", "ssl_failures = %s"]
+    values = [next_refresh_at, failures]
+    if expires_at is not UNSET:
+        updates += ["ssl_expires_at = %s", "ssl_checked_at = %s"]
+        values += [expires_at, datetime.utcnow()]
+    if fingerprint is not UNSET:
+        updates.append("ssl_fingerprint = %s")
+        values.append(fingerprint)
+    values.append(target_id)
+    c.execute(f"UPDATE targets SET {', '.join(updates)} WHERE id = %s", tuple(values))
+    conn.commit()
+
 def log_event(url, message):
     c.execute("INSERT INTO events (url, message) VALUES (%s, %s)", (url, message))
     conn.commit()
@@ -479,8 +855,8 @@ def get_event_logs():
 def get_event_logs_for_url(url):
     since = datetime.utcnow() - timedelta(days=14)
     c.execute(
-        "SELECT created_at, url, message FROM events WHERE created_at > %s AND url = %s ORDER BY created_at DESC",
-        (since, url)
+        "SELECT created_at, url, message FROM events WHERE created_at > %s AND url IN (%s, %s) ORDER BY created_at DESC",
+        (since, url, canonical_url(url))
     )
     return c.fetchall()
 
@@ -489,7 +865,8 @@ def get_event_logs_for_url(url):
 #    conn.commit()
 
 def admin_delete_site(user_id, url):
-    c.execute("DELETE FROM sites WHERE user_id = %s AND url = %s", (user_id, url))
+    c.execute("DELETE FROM subscriptions WHERE user_id = %s AND url = %s", (user_id, url))
+    _delete_orphan_targets()
     conn.commit()
 
 
@@ -521,7 +898,7 @@ def export_user_logs_csv():
 
 def export_sites_csv():
     path = "/tmp/sites.csv"
-    c.execute("SELECT user_id, username, url, last_status FROM sites")
+    c.execute(f"SELECT s.user_id, s.username, s.url, t.last_status FROM {SITES_FROM} ORDER BY s.id")
     data = c.fetchall()
     with open(path, "w", newline="") as csvfile:
         writer = csv.writer(csvfile)
@@ -556,17 +933,27 @@ def export_sites_csv():
 #        c.execute(query, tuple(values))
 #        conn.commit()
 
-def get_site_flags(url):
-    c.execute("""
-        SELECT notified_http, notified_http_ts,
-               notified_ssl, notified_domain, 
-               notified_ssl_ts, notified_domain_ts,
-               domain_last_checked, domain_last_days,
-               domain_last_registrar, domain_last_contact_url,
-               http_fail_count
-        FROM sites WHERE url = %s
-    """, (url,))
-    row = c.fetchone()
+SUBSCRIPTION_FLAG_COLUMNS = {
+    "http": "notified_http",
+    "http_ts": "notified_http_ts",
+    "ssl": "notified_ssl",
+    "domain": "notified_domain",
+    "ssl_ts": "notified_ssl_ts",
+    "domain_ts": "notified_domain_ts",
+}
+
+TARGET_FLAG_COLUMNS = {
+    "http_fail_count": "http_fail_count",
+}
+
+FLAG_COLUMNS = """
+    s.notified_http, s.notified_http_ts,
+    s.notified_ssl, s.notified_domain,
+    s.notified_ssl_ts, s.notified_domain_ts,
+    t.http_fail_count
+"""
+
+def _flags_from_row(row):
     if not row:
         return {}
     return {
@@ -576,39 +963,30 @@ def get_site_flags(url):
         "domain": bool(row[3]),
         "ssl_ts": row[4],
         "domain_ts": row[5],
-        "domain_check_ts": row[6],
-        "domain_days_cache": row[7],
-        "domain_registrar_cache": row[8],
-        "domain_contact_url_cache": row[9],
-        "http_fail_count": row[10] or 0,
+        "http_fail_count": row[6] or 0,
     }
 
+def _update_flag_columns(table, columns, values, where, params):
+    updates = [(columns[name], value) for name, value in values.items() if value is not UNSET]
+    if not updates:
+        return
+    query = f"UPDATE {table} SET {', '.join(f'{column} = %s' for column, _ in updates)} WHERE {where}"
+    c.execute(query, tuple(value for _, value in updates) + tuple(params))
+
+def get_site_flags(url):
+    c.execute(f"SELECT {FLAG_COLUMNS} FROM {SITES_FROM} WHERE s.url = %s", (url,))
+    return _flags_from_row(c.fetchone())
+
+# Позиция первой колонки FLAG_COLUMNS в строках iter_site_check_batches.
+SITE_CHECK_FLAGS_AT = 15
+
+def site_check_flags(row):
+    """Флаги подписки из строки iter_site_check_batches — то же, что get_site_flags_by_id, без запроса."""
+    return _flags_from_row(row[SITE_CHECK_FLAGS_AT:])
+
 def get_site_flags_by_id(site_id):
-    c.execute("""
-        SELECT notified_http, notified_http_ts,
-               notified_ssl, notified_domain,
-               notified_ssl_ts, notified_domain_ts,
-               domain_last_checked, domain_last_days,
-               domain_last_registrar, domain_last_contact_url,
-               http_fail_count
-        FROM sites WHERE id = %s
-    """, (site_id,))
-    row = c.fetchone()
-    if not row:
-        return {}
-    return {
-        "http": bool(row[0]),
-        "http_ts": row[1],
-        "ssl": bool(row[2]),
-        "domain": bool(row[3]),
-        "ssl_ts": row[4],
-        "domain_ts": row[5],
-        "domain_check_ts": row[6],
-        "domain_days_cache": row[7],
-        "domain_registrar_cache": row[8],
-        "domain_contact_url_cache": row[9],
-        "http_fail_count": row[10] or 0,
-    }
+    c.execute(f"SELECT {FLAG_COLUMNS} FROM {SITES_FROM} WHERE s.id = %s", (site_id,))
+    return _flags_from_row(c.fetchone())
 
 def set_site_flags(
     url,
@@ -618,55 +996,22 @@ def set_site_flags(
     domain=UNSET,
     ssl_ts=UNSET,
     domain_ts=UNSET,
-    domain_check_ts=UNSET,
-    domain_days_cache=UNSET,
-    domain_registrar_cache=UNSET,
-    domain_contact_url_cache=UNSET,
     http_fail_count=UNSET,
 ):
-    updates = []
-    values = []
-
-    if http is not UNSET:
-        updates.append("notified_http = %s")
-        values.append(http)
-    if http_ts is not UNSET:
-        updates.append("notified_http_ts = %s")
-        values.append(http_ts)
-    if ssl is not UNSET:
-        updates.append("notified_ssl = %s")
-        values.append(ssl)
-    if domain is not UNSET:
-        updates.append("notified_domain = %s")
-        values.append(domain)
-    if ssl_ts is not UNSET:
-        updates.append("notified_ssl_ts = %s")
-        values.append(ssl_ts)
-    if domain_ts is not UNSET:
-        updates.append("notified_domain_ts = %s")
-        values.append(domain_ts)
-    if domain_check_ts is not UNSET:
-        updates.append("domain_last_checked = %s")
-        values.append(domain_check_ts)
-    if domain_days_cache is not UNSET:
-        updates.append("domain_last_days = %s")
-        values.append(domain_days_cache)
-    if domain_registrar_cache is not UNSET:
-        updates.append("domain_last_registrar = %s")
-        values.append(domain_registrar_cache)
-    if domain_contact_url_cache is not UNSET:
-        updates.append("domain_last_contact_url = %s")
-        values.append(domain_contact_url_cache)
-    if http_fail_count is not UNSET:
-        updates.append("http_fail_count = %s")
-        values.append(http_fail_count)
-
-    if not updates:
-        return
-
-    values.append(url)
-    query = f"UPDATE sites SET {', '.join(updates)} WHERE url = %s"
-    c.execute(query, tuple(values))
+    _update_flag_columns(
+        "subscriptions",
+        SUBSCRIPTION_FLAG_COLUMNS,
+        {"http": http, "http_ts": http_ts, "ssl": ssl, "domain": domain, "ssl_ts": ssl_ts, "domain_ts": domain_ts},
+        "url = %s",
+        (url,)
+    )
+    _update_flag_columns(
+        "targets",
+        TARGET_FLAG_COLUMNS,
+        {"http_fail_count": http_fail_count},
+        "url = %s",
+        (canonical_url(url),)
+    )
     conn.commit()
 
 def set_site_flags_by_id(
@@ -677,57 +1022,37 @@ def set_site_flags_by_id(
     domain=UNSET,
     ssl_ts=UNSET,
     domain_ts=UNSET,
-    domain_check_ts=UNSET,
-    domain_days_cache=UNSET,
-    domain_registrar_cache=UNSET,
-    domain_contact_url_cache=UNSET,
     http_fail_count=UNSET,
 ):
-    updates = []
-    values = []
-
-    if http is not UNSET:
-        updates.append("notified_http = %s")
-        values.append(http)
-    if http_ts is not UNSET:
-        updates.append("notified_http_ts = %s")
-        values.append(http_ts)
-    if ssl is not UNSET:
-        updates.append("notified_ssl = %s")
-        values.append(ssl)
-    if domain is not UNSET:
-        updates.append("notified_domain = %s")
-        values.append(domain)
-    if ssl_ts is not UNSET:
-        updates.append("notified_ssl_ts = %s")
-        values.append(ssl_ts)
-    if domain_ts is not UNSET:
-        updates.append("notified_domain_ts = %s")
-        values.append(domain_ts)
-    if domain_check_ts is not UNSET:
-        updates.append("domain_last_checked = %s")
-        values.append(domain_check_ts)
-    if domain_days_cache is not UNSET:
-        updates.append("domain_last_days = %s")
-        values.append(domain_days_cache)
-    if domain_registrar_cache is not UNSET:
-        updates.append("domain_last_registrar = %s")
-        values.append(domain_registrar_cache)
-    if domain_contact_url_cache is not UNSET:
-        updates.append("domain_last_contact_url = %s")
-        values.append(domain_contact_url_cache)
-    if http_fail_count is not UNSET:
-        updates.append("http_fail_count = %s")
-        values.append(http_fail_count)
-
-    if not updates:
-        return
-
-    values.append(site_id)
-    query = f"UPDATE sites SET {', '.join(updates)} WHERE id = %s"
-    c.execute(query, tuple(values))
+    """Флаги уведомлений пишутся в подписку, счётчик провалов — в её ресурс."""
+    _update_flag_columns(
+        "subscriptions",
+        SUBSCRIPTION_FLAG_COLUMNS,
+        {"http": http, "http_ts": http_ts, "ssl": ssl, "domain": domain, "ssl_ts": ssl_ts, "domain_ts": domain_ts},
+        "id = %s",
+        (site_id,)
+    )
+    _update_flag_columns(
+        "targets",
+        TARGET_FLAG_COLUMNS,
+        {"http_fail_count": http_fail_count},
+        f"id = {SITE_TARGET_ID}",
+        (site_id,)
+    )
     conn.commit()
 
+def set_target_flags(
+    target_id,
+    http_fail_count=UNSET,
+):
+    _update_flag_columns(
+        "targets",
+        TARGET_FLAG_COLUMNS,
+        {"http_fail_count": http_fail_count},
+        "id = %s",
+        (target_id,)
+    )
+    conn.commit()
 
 #def migrate_add_notification_flags():
 #    c.execute("""
@@ -847,9 +1172,91 @@ def migrate_add_notification_flags():
     """)
     c.execute("CREATE INDEX IF NOT EXISTS idx_sites_user_id ON sites(user_id)")
     c.execute("CREATE INDEX IF NOT EXISTS idx_sites_url ON sites(url)")
+    c.execute("ALTER TABLE domain_registrations ADD COLUMN IF NOT EXISTS next_refresh_at TIMESTAMP")
+    c.execute("ALTER TABLE domain_registrations ADD COLUMN IF NOT EXISTS failures INTEGER DEFAULT 0")
+    c.execute("ALTER TABLE domain_registrations ADD COLUMN IF NOT EXISTS status TEXT")
+    c.execute("ALTER TABLE targets ADD COLUMN IF NOT EXISTS ssl_expires_at TIMESTAMP")
+    c.execute("ALTER TABLE targets ADD COLUMN IF NOT EXISTS ssl_fingerprint TEXT")
+    c.execute("ALTER TABLE targets ADD COLUMN IF NOT EXISTS ssl_checked_at TIMESTAMP")
+    c.execute("ALTER TABLE targets ADD COLUMN IF NOT EXISTS ssl_failures INTEGER DEFAULT 0")
+    c.execute(
+        "ALTER TABLE targets ADD COLUMN IF NOT EXISTS ssl_next_refresh_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc')"
+    )
+    c.execute("ALTER TABLE targets ADD COLUMN IF NOT EXISTS last_asn INTEGER")
+    c.execute("ALTER TABLE targets ADD COLUMN IF NOT EXISTS last_country TEXT")
+    # Срок регистрации хранится в domain_registrations по зарегистрированному домену,
+    # прежний кэш в каждом ресурсе больше не читается.
+    for column in ("domain_last_checked", "domain_last_days", "domain_last_registrar", "domain_last_contact_url"):
+        c.execute(f"ALTER TABLE targets DROP COLUMN IF EXISTS {column}")
+    c.execute("ALTER TABLE subscriptions ADD COLUMN IF NOT EXISTS check_interval_minutes INTEGER")
+    c.execute("ALTER TABLE subscriptions ADD COLUMN IF NOT EXISTS priority SMALLINT")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_subscriptions_user_id ON subscriptions(user_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_subscriptions_target_id ON subscriptions(target_id)")
+    # Срок чтения сертификата сверяется в строках наступивших ресурсов, а не поиском
+    # по всей таблице, так что индекс по ssl_next_refresh_at не используется.
+    c.execute("DROP INDEX IF EXISTS idx_targets_ssl_next_refresh_at")
     c.execute("CREATE INDEX IF NOT EXISTS idx_events_created_at ON events(created_at)")
     c.execute("CREATE INDEX IF NOT EXISTS idx_user_logs_created_at ON user_logs(created_at)")
     c.execute("CREATE INDEX IF NOT EXISTS idx_bot_messages_created_at ON bot_messages(created_at)")
     c.execute("CREATE INDEX IF NOT EXISTS idx_bot_messages_user_id ON bot_messages(user_id)")
 
     conn.commit()
+
+def migrate_split_sites():
+    """Один раз переносит строки sites в targets и subscriptions.
+
+    Подписки сохраняют id исходных строк, поэтому старые callback-кнопки остаются рабочими.
+    Состояние ресурса берётся из самой свежей проверенной строки с тем же каноническим URL.
+    Таблица sites не удаляется и остаётся резервной копией.
+    """
+    c.execute("SELECT 1 FROM schema_migrations WHERE name = %s", ("split_sites",))
+    if c.fetchone():
+        return
+
+    c.execute("""
+        SELECT id, user_id, username, url, is_paused, paused_until,
+               notified_http, notified_http_ts, notified_ssl, notified_ssl_ts,
+               notified_domain, notified_domain_ts,
+               last_status, last_checked,
+               http_fail_count, incident_started_at, last_success_at,
+               last_success_http_status, last_success_latency_ms, last_resolved_ip
+        FROM sites
+        ORDER BY last_checked DESC NULLS LAST, id
+    """)
+    target_ids = {}
+    for row in c.fetchall():
+        key = canonical_url(row[3])
+        if key not in target_ids:
+            c.execute(
+                """
+                INSERT INTO targets (
+                    url, last_status, last_checked,
+                    http_fail_count, incident_started_at, last_success_at,
+                    last_success_http_status, last_success_latency_ms, last_resolved_ip
+                )
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (url) DO UPDATE SET url = EXCLUDED.url
+                RETURNING id
+                """,
+                (key, *row[12:])
+            )
+            target_ids[key] = c.fetchone()[0]
+        c.execute(
+            """
+            INSERT INTO subscriptions (
+                id, target_id, user_id, username, url, is_paused, paused_until,
+                notified_http, notified_http_ts, notified_ssl, notified_ssl_ts,
+                notified_domain, notified_domain_ts
+            )
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (id) DO NOTHING
+            """,
+            (row[0], target_ids[key], *row[1:12])
+        )
+
+    c.execute("""
+        SELECT setval(pg_get_serial_sequence('subscriptions', 'id'), COALESCE(MAX(id), 0) + 1, false)
+        FROM subscriptions
+    """)
+    c.execute("INSERT INTO schema_migrations (name) VALUES (%s)", ("split_sites",))
+    conn.commit()
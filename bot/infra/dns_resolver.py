@@ -0,0 +1,135 @@
+"""Non-blocking DNS resolution with a shared TTL cache."""
+import asyncio
+import os
+import socket
+
+from bot.core.cache import MISSING, TtlLruCache
+
+DNS_CACHE_TTL = float(os.getenv("DNS_CACHE_TTL", "300"))
+DNS_NEGATIVE_TTL = float(os.getenv("DNS_NEGATIVE_TTL", "60"))
+DNS_CACHE_SIZE = int(os.getenv("DNS_CACHE_SIZE", "10000"))
+DNS_TIMEOUT = float(os.getenv("DNS_TIMEOUT", "5"))
+
+
+async def _getaddrinfo_ipv4(hostname):
+    loop = asyncio.get_running_loop()
+    infos = await loop.getaddrinfo(hostname, None, family=socket.AF_INET, type=socket.SOCK_STREAM)
+    return infos[0][4][0] if infos else None
+
+
+class DnsResolver:
+    """Резолвит имена через getaddrinfo в пуле потоков, не блокируя event loop.
+
+    Успешные ответы живут `ttl` секунд, неудачные — `negative_ttl`; таймаут не кэшируется,
+    это не ответ «имени нет». Одновременные запросы одного имени объединяются в один lookup.
+
+    concurrency ограничивает число lookup в работе, например размером пула потоков: таймаут
+    отсчитывается с момента, когда lookup получил слот, а не пока он ждёт свободный поток.
+    """
+
+    def __init__(
+        self,
+        ttl=DNS_CACHE_TTL,
+        negative_ttl=DNS_NEGATIVE_TTL,
+        max_entries=DNS_CACHE_SIZE,
+        timeout=DNS_TIMEOUT,
+        lookup=_getaddrinfo_ipv4,
+        concurrency=None,
+    ):
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self._lookup = lookup
+        self._slots = asyncio.Semaphore(concurrency) if concurrency else None
+        self._cache = TtlLruCache(max_entries=max_entries, ttl=ttl)
+        self._inflight = {}
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.joined = 0
+
+    async def resolve(self, hostname):
+        if not hostname:
+            return None
+        hostname = hostname.strip().rstrip(".").lower()
+        cached = self._cache.get(hostname)
+        if cached is not MISSING:
+            if cached is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return cached
+
+        future = self._inflight.get(hostname)
+        if future is not None:
+            self.joined += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Отменили lookup-лидера, а не нас — повторяем резолв сами.
+                if future.cancelled():
+                    return await self.resolve(hostname)
+                raise
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[hostname] = future
+        timed_out = False
+        try:
+            ip = await self._run_lookup(hostname)
+        except asyncio.TimeoutError:
+            ip = None
+            timed_out = True
+            self.errors += 1
+            self.timeouts += 1
+        except (OSError, UnicodeError):
+            ip = None
+            self.errors += 1
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            self._inflight.pop(hostname, None)
+
+        if ip is None:
+            if not timed_out:
+                self._cache.set(hostname, None, ttl=self.negative_ttl)
+        else:
+            self._cache.set(hostname, ip)
+        future.set_result(ip)
+        return ip
+
+    async def _run_lookup(self, hostname):
+        if self._slots is None:
+            return await asyncio.wait_for(self._lookup(hostname), timeout=self.timeout)
+        await self._slots.acquire()
+        task = asyncio.ensure_future(self._lookup(hostname))
+        # Слот освобождается, когда lookup действительно закончился: поток getaddrinfo
+        # после таймаута продолжает работать, и новый lookup встал бы за ним в очередь пула.
+        task.add_done_callback(self._release_slot)
+        return await asyncio.wait_for(asyncio.shield(task), timeout=self.timeout)
+
+    def _release_slot(self, task):
+        self._slots.release()
+        if not task.cancelled():
+            # Результат опоздавшего lookup не нужен, но исключение надо забрать.
+            task.exception()
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "joined": self.joined,
+            "cached": len(self._cache),
+        }
+
+
+resolver = DnsResolver()
+
+
+async def resolve_host(hostname):
+    return await resolver.resolve(hostname)
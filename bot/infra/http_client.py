@@ -0,0 +1,92 @@
+"""Shared aiohttp client session for resource checks."""
+import asyncio
+import os
+import ssl
+import time
+from contextlib import asynccontextmanager
+
+import aiohttp
+
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "200"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "4"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "60"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_MAX_FIELD_SIZE = 65536
+
+# Отдельный объект контекста: aiohttp различает соединения в пуле по параметру ssl.
+VERIFIED_SSL_CONTEXT = ssl.create_default_context()
+
+
+def _connection_trace_config():
+    """Замеряет время создания нового соединения (TCP + TLS) для запросов с trace_request_ctx."""
+
+    async def on_create_start(session, context, params):
+        context.connect_started = time.monotonic()
+
+    async def on_create_end(session, context, params):
+        trace = context.trace_request_ctx
+        started = getattr(context, "connect_started", None)
+        if trace is not None and started is not None:
+            trace.connect_ms = int((time.monotonic() - started) * 1000)
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_connection_create_start.append(on_create_start)
+    trace_config.on_connection_create_end.append(on_create_end)
+    return trace_config
+
+
+class PeerCertificateResponse(aiohttp.ClientResponse):
+    """Ответ, который запоминает сертификат сервера (DER) из своего соединения.
+
+    Читается в start(), пока соединение ещё у ответа: если тело уже получено целиком
+    (HEAD, короткий ответ), aiohttp возвращает соединение в пул до того, как ответ
+    отдан вызывающему коду.
+    """
+
+    peer_certificate = None
+
+    async def start(self, connection):
+        transport = connection.transport
+        ssl_object = transport.get_extra_info("ssl_object") if transport else None
+        if ssl_object is not None:
+            self.peer_certificate = ssl_object.getpeercert(True)
+        return await super().start(connection)
+
+
+def create_http_session(limit=None, limit_per_host=None) -> aiohttp.ClientSession:
+    """Создаёт сессию с общим пулом соединений: keep-alive, лимиты и DNS-кэш коннектора."""
+    connector = aiohttp.TCPConnector(
+        ssl=False,
+        limit=HTTP_POOL_LIMIT if limit is None else limit,
+        limit_per_host=HTTP_POOL_LIMIT_PER_HOST if limit_per_host is None else limit_per_host,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+        use_dns_cache=True,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        max_field_size=HTTP_MAX_FIELD_SIZE,
+        trace_configs=[_connection_trace_config()],
+        response_class=PeerCertificateResponse,
+    )
+
+
+async def close_http_session(session):
+    if session is None or session.closed:
+        return
+    await session.close()
+    # aiohttp закрывает SSL-транспорты асинхронно; даём им завершиться до остановки цикла.
+    await asyncio.sleep(0.25)
+
+
+@asynccontextmanager
+async def http_session_scope(session=None, limit=10):
+    """Отдаёт общую сессию, а если её нет — временную на limit соединений, которая закрывается на выходе."""
+    if session is not None:
+        yield session
+        return
+    session = create_http_session(limit=limit, limit_per_host=0)
+    try:
+        yield session
+    finally:
+        await close_http_session(session)
@@ -4,7 +4,14 @@ from aiogram import Dispatcher
 from dotenv import load_dotenv
 import os
 
-from bot.infra.db import migrate_add_notification_flags
+from bot.checks.domain_cache import domain_registrations
+from bot.checks.geoip_cache import geoip_cache
+from bot.checks.subdomain_cache import subdomain_scans
+from bot.infra.db import (
+    get_domain_registration, get_ip_geo_many, get_subdomain_scan, migrate_add_notification_flags,
+    migrate_split_sites, save_domain_registration, save_ip_geo_many, save_subdomain_scan
+)
+from bot.infra.http_client import close_http_session, create_http_session
 from bot.admin_console.server import start_admin_console
 from bot.telegram.handlers import register_handlers
 from bot.telegram.scheduler import start_scheduler
@@ -15,17 +22,23 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")
 
 async def main():
     migrate_add_notification_flags()
+    migrate_split_sites()
+    domain_registrations.use_store(get_domain_registration, save_domain_registration)
+    geoip_cache.use_store(get_ip_geo_many, save_ip_geo_many)
+    subdomain_scans.use_store(get_subdomain_scan, save_subdomain_scan)
 
     bot = TrackedBot(token=BOT_TOKEN)
+    http_session = create_http_session()
     dp = Dispatcher()
-    register_handlers(dp, bot)
-    await start_scheduler(bot)
-    admin_runner = await start_admin_console(bot)
+    register_handlers(dp, bot, http_session=http_session)
+    monitor_engine = await start_scheduler(bot, http_session=http_session)
+    admin_runner = await start_admin_console(bot, monitor_engine=monitor_engine)
     try:
         await dp.start_polling(bot)
     finally:
         if admin_runner:
             await admin_runner.cleanup()
+        await close_http_session(http_session)
 
 if __name__ == '__main__':
     asyncio.run(main())
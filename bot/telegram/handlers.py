@@ -8,26 +8,34 @@ from bot.infra.db import (
     export_user_logs_csv as export_logs_file,
     export_sites_csv as export_sites_file,
     update_site_status, update_site_status_by_id, delete_user_data,
-    get_site_for_user, get_site_by_id, delete_site_by_id,
+    get_site_for_user, get_site_by_id, get_site_by_target_for_user, delete_site_by_id,
     admin_delete_site_by_id, set_site_paused_by_id, set_site_paused,
-    set_site_paused_until_by_id, get_site_pause_status
+    set_site_paused_until_by_id, get_site_pause_status,
+    get_user_check_settings, set_site_check_settings_by_id, set_user_check_settings
 )
 from bot.checks.monitor import get_geo_info
 from bot.checks.service import check_resource
-from bot.checks.subfinder import find_subdomains, export_subdomains_csv
+from bot.checks.subdomain_cache import subdomain_scans
+from bot.checks.subdomain_probe import validate_subdomains
+from bot.checks.subfinder import SUBDOMAIN_SOURCES, export_subdomains_csv
 from bot.telegram.callback_data import (
     admin_delete_callback, site_delete_callback, site_pause_callback,
     site_resume_callback, site_status_callback, site_check_now_callback,
     site_history_callback, site_pause_1h_callback
 )
 from bot.core.status_formatter import (
-    format_status_text, format_user_status_message, format_weekly_user_report,
-    split_message
+    format_status_text, format_subdomain_partial, format_subdomain_probe, format_subdomain_progress,
+    format_subdomain_scan, format_subdomain_truncated, format_subdomain_validation, format_timed_out_parts,
+    format_user_status_message, format_weekly_user_report, split_message
+)
+from bot.core.check_settings import (
+    CheckSettingsError, format_interval, format_priority, parse_interval, parse_priority
 )
 from bot.core.url_utils import normalize_url
+from bot.infra.dns_resolver import resolve_host
 import os
 import asyncio
-import socket
+import time
 from datetime import datetime, timedelta
 from urllib.parse import urlparse
 
@@ -47,12 +55,8 @@ ADMIN_COMMANDS_TEXT = (
     "/remove_user <user_id> — удалить сайты и логи пользователя"
 )
 
-def is_domain_resolvable(domain: str) -> bool:
-    try:
-        socket.gethostbyname(domain)
-        return True
-    except socket.error:
-        return False
+async def is_domain_resolvable(domain: str) -> bool:
+    return await resolve_host(domain) is not None
 
 def build_site_keyboard(url, site_id=None, paused=False):
     kb = InlineKeyboardBuilder()
@@ -87,7 +91,7 @@ def build_incident_keyboard(site_id):
     kb.adjust(1)
     return kb.as_markup()
 
-async def process_site_input(user_id, username, url, bot):
+async def process_site_input(user_id, username, url, bot, http_session=None):
     url = normalize_url(url)
     
     if url in ["https://127.0.0.1", "https://localhost"]:
@@ -96,12 +100,11 @@ async def process_site_input(user_id, username, url, bot):
     
     domain = urlparse(url).hostname
 
-    if not is_domain_resolvable(domain):
+    if not await is_domain_resolvable(domain):
         await bot.send_message(user_id, f"❌ Домен `{domain}` не резолвится. Проверьте правильность имени.", parse_mode="Markdown")
         return
 
-    sites = get_sites(user_id)
-    if any(s[3] == url for s in sites):
+    if get_site_by_target_for_user(user_id, url):
         await bot.send_message(user_id, "⚠️ Этот сайт уже добавлен.")
         return
 
@@ -112,7 +115,7 @@ async def process_site_input(user_id, username, url, bot):
     await bot.send_message(user_id, geo_info)
     
     await bot.send_message(user_id, f"✅ Добавлен сайт: {url}\nПроверяю...")
-    await send_status_report(user_id, url, bot, site_id=site_id)
+    await send_status_report(user_id, url, bot, site_id=site_id, http_session=http_session)
 
 @router.message(F.text == "/start")
 async def cmd_start(message: types.Message):
@@ -126,10 +129,12 @@ async def cmd_start(message: types.Message):
         "/delete <URL> — Удалить сайт\n"
         "/pause <URL> — Поставить мониторинг на паузу\n"
         "/resume <URL> — Возобновить мониторинг\n"
+        "/interval [URL] <минуты> — Как часто проверять (без URL — все сайты)\n"
+        "/priority [URL] <high|normal|low> — Приоритет проверки\n"
         "/statusme — Сводный отчёт по вашим ресурсам\n"
         "/statusme <URL> — Статус одного сайта\n"
         "/weekly — То же, что /statusme\n"
-        "/subdomains <домен> — Поиск поддоменов\n\n"
+        "/subdomains <домен> [--check|--http] — Поиск поддоменов\n\n"
         "🔐 SSL и 🌐 домен также проверяются.\n"
         "_Поддомены не проходят проверку домена._\n\n"
         "🔔 Я пришлю уведомление, если:\n"
@@ -150,10 +155,13 @@ async def cmd_help(message: types.Message):
         "/delete &lt;URL&gt; — Удалить сайт из мониторинга\n"
         "/pause &lt;URL&gt; — Поставить мониторинг сайта на паузу\n"
         "/resume &lt;URL&gt; — Возобновить мониторинг сайта\n"
+        "/interval [URL] &lt;минуты&gt; — Интервал проверки сайта или всех ваших сайтов\n"
+        "/priority [URL] &lt;high|normal|low&gt; — Приоритет проверки\n"
         "/statusme — Сводный отчёт по вашим ресурсам\n"
         "/statusme &lt;URL&gt; — Проверить статус конкретного сайта\n"
         "/weekly — То же, что /statusme\n"
-        "/subdomains &lt;домен&gt; — Найти поддомены \n\n"
+        "/subdomains &lt;домен&gt; — Найти поддомены \n"
+        "/subdomains &lt;домен&gt; --check — То же с проверкой DNS, --http — и HTTP-ответа\n\n"
         "🔐 <b>Я проверяю:</b>\n"
         "— доступность сайта (HTTP)\n"
         "— срок действия SSL-сертификата\n"
@@ -217,6 +225,45 @@ async def resume_website(message: types.Message):
     else:
         await message.answer("❌ Сайт не найден среди ваших.")
 
+CHECK_SETTINGS = {
+    "interval": ("Интервал проверки", parse_interval, format_interval, "/interval [URL] <минуты|2h|default>"),
+    "priority": ("Приоритет", parse_priority, format_priority, "/priority [URL] <high|normal|low|default>"),
+}
+
+async def update_check_settings(message: types.Message, field):
+    """Без URL настройка действует на все сайты пользователя, с URL — на один сайт."""
+    user_id = message.from_user.id
+    label, parse, fmt, usage = CHECK_SETTINGS[field]
+    args = message.text.split()[1:]
+    if not args or len(args) > 2:
+        current = get_user_check_settings(user_id)[field]
+        return await message.answer(f"Используйте: {usage}\n{label} для ваших сайтов: {fmt(current)}")
+    try:
+        value = parse(args[-1])
+    except CheckSettingsError as e:
+        return await message.answer(f"❌ {e}")
+
+    if len(args) == 1:
+        set_user_check_settings(user_id, **{field: value})
+        log_user_action(user_id, f"{label} для всех сайтов: {fmt(value)}", message.from_user.username)
+        return await message.answer(f"⚙️ {label} для всех ваших сайтов: {fmt(value)}")
+
+    url = normalize_url(args[0])
+    site = get_site_by_url_for_user(user_id, url)
+    if not site:
+        return await message.answer("❌ Сайт не найден среди ваших.")
+    set_site_check_settings_by_id(site[0], user_id, **{field: value})
+    log_user_action(user_id, f"{label} для {url}: {fmt(value)}", message.from_user.username)
+    await message.answer(f"⚙️ {label} для {url}: {fmt(value)}")
+
+@router.message(F.text.startswith("/interval"))
+async def set_check_interval(message: types.Message):
+    await update_check_settings(message, "interval")
+
+@router.message(F.text.startswith("/priority"))
+async def set_check_priority(message: types.Message):
+    await update_check_settings(message, "priority")
+
 @router.message(F.text == "/list")
 async def list_websites(message: types.Message):
     user_id = message.from_user.id
@@ -314,7 +361,7 @@ async def inline_resume_by_id(query: types.CallbackQuery):
     await query.answer("Возобновлено")
 
 @router.callback_query(F.data.startswith("chk:"))
-async def inline_check_now(query: types.CallbackQuery):
+async def inline_check_now(query: types.CallbackQuery, http_session=None):
     try:
         site_id = int(query.data.split(":", 1)[1])
     except (ValueError, IndexError):
@@ -326,7 +373,13 @@ async def inline_check_now(query: types.CallbackQuery):
 
     await query.answer("Проверяю в фоне...")
     await query.message.answer(f"🔄 Запустил живую проверку: {site[3]}")
-    asyncio.create_task(send_status_report(query.from_user.id, site[3], query.message.bot, site_id=site_id))
+    asyncio.create_task(send_status_report(
+        query.from_user.id,
+        site[3],
+        query.message.bot,
+        site_id=site_id,
+        http_session=http_session,
+    ))
 
 @router.callback_query(F.data.startswith("p1h:"))
 async def inline_pause_one_hour(query: types.CallbackQuery):
@@ -472,14 +525,15 @@ async def admin_user_details(query: types.CallbackQuery):
     await query.answer("Отправлено")
 
 
-async def send_status_report(user_id, url, bot, site_id=None):
-    result = await check_resource(url)
+async def send_status_report(user_id, url, bot, site_id=None, http_session=None):
+    result = await check_resource(url, session=http_session)
     status_str = format_status_text(
         result.http,
         result.ssl_days,
         result.domain_days,
         result.registrar,
         result.contact_url,
+        result.ssl,
     )
     if site_id:
         update_site_status_by_id(site_id, status_str)
@@ -493,7 +547,10 @@ async def send_status_report(user_id, url, bot, site_id=None):
         result.domain_days,
         result.registrar,
         result.contact_url,
+        result.ssl,
     )
+    if result.timed_out:
+        text += "\n" + format_timed_out_parts(result.timed_out)
     await bot.send_message(user_id, text)
 
 @router.message(F.text.startswith("/statusme"))
@@ -757,28 +814,93 @@ async def export_sites_csv(message: types.Message):
 #    preview = "\n".join(f"• `{s}`" for s in subdomains[:30])
 #    text = f"Найдено {len(subdomains)} поддоменов:\n{preview}"
 #    await message.answer(text, parse_mode="Markdown")
+SUBDOMAINS_PROGRESS_INTERVAL = 3.0
+SUBDOMAINS_OPTIONS = {"--check", "--http"}
+SUBDOMAINS_USAGE = (
+    "Используйте: /subdomains example.com\n"
+    "--check — проверить, какие поддомены резолвятся\n"
+    "--http — дополнительно запросить их по HTTP"
+)
+
+
 @router.message(F.text.startswith("/subdomains"))
-async def cmd_subdomains(message: types.Message):
+async def cmd_subdomains(message: types.Message, http_session=None):
     log_user_action(message.from_user.id, "/subdomains", message.from_user.username)
-    parts = message.text.split(" ", 1)
-    if len(parts) != 2:
-        return await message.answer("Используйте: /subdomains example.com")
+    parts = message.text.split()
+    options = set(parts[2:])
+    if len(parts) < 2 or not options <= SUBDOMAINS_OPTIONS:
+        return await message.answer(SUBDOMAINS_USAGE)
 
     domain = parts[1].strip().lower()
-    await message.answer(f"🔍 Ищу поддомены для `{domain}`...", parse_mode="Markdown")
-
-    subdomains = await find_subdomains(domain)
+    probe_http = "--http" in options
+    validate = probe_http or "--check" in options
+    status_message = await message.answer(f"🔍 Ищу поддомены для `{domain}`...", parse_mode="Markdown")
+    last_progress = {"at": time.monotonic(), "sources": []}
+
+    async def update_status(text):
+        try:
+            await status_message.edit_text(text)
+        except Exception as e:
+            print(f"[subdomains] progress update failed: {type(e).__name__}: {e}")
+
+    async def on_progress(progress):
+        now = time.monotonic()
+        # Telegram ограничивает частоту правок, поэтому показываем прогресс раз в несколько секунд.
+        if progress.done or now - last_progress["at"] < SUBDOMAINS_PROGRESS_INTERVAL:
+            return
+        last_progress["at"] = now
+        await update_status(format_subdomain_progress(domain, progress))
+
+    async def on_source_done(result, merged):
+        last_progress["sources"].append(result)
+        if len(last_progress["sources"]) < len(SUBDOMAIN_SOURCES) and merged:
+            # Первые результаты показываем сразу, не дожидаясь медленных источников.
+            last_progress["at"] = time.monotonic()
+            await update_status(format_subdomain_partial(domain, sorted(merged), last_progress["sources"]))
+
+    async def on_validate_progress(done, total):
+        now = time.monotonic()
+        if done == total or now - last_progress["at"] < SUBDOMAINS_PROGRESS_INTERVAL:
+            return
+        last_progress["at"] = now
+        await update_status(f"🔍 {domain}: проверено {done} из {total} поддоменов...")
+
+    scan = await subdomain_scans.scan(
+        domain, session=http_session, on_progress=on_progress, on_source_done=on_source_done
+    )
+    subdomains = scan.subdomains
 
     if not subdomains:
-        return await message.answer("❌ Поддомены не найдены или произошла ошибка.")
+        return await message.answer(
+            "❌ Поддомены не найдены или произошла ошибка.\n" + format_subdomain_scan(scan)
+        )
+
+    summary = format_subdomain_scan(scan)
+    probes = None
+    if validate:
+        await update_status(f"🔍 {domain}: проверяю {len(subdomains)} поддоменов...")
+        probes = await validate_subdomains(
+            subdomains, probe_http=probe_http, on_progress=on_validate_progress
+        )
+        summary += f"\n{format_subdomain_validation(probes, probe_http)}"
 
+    caption = f"📄 Найдено {len(subdomains)} поддоменов для {domain}\n{summary}"
+    progress = scan.crtsh
+    if progress is not None and progress.truncated:
+        caption += f"\n{format_subdomain_truncated(progress)}"
     if len(subdomains) > 10:
-        path = await export_subdomains_csv(subdomains, domain)
-        await message.answer_document(types.FSInputFile(path), caption=f"📄 Найдено {len(subdomains)} поддоменов для {domain}")
+        path = await export_subdomains_csv(subdomains, domain, probes)
+        await message.answer_document(types.FSInputFile(path), caption=caption)
         os.remove(path)
     else:
-        preview = "\n".join(f"• `{s}`" for s in subdomains)
-        await message.answer(f"🔍 Найдено {len(subdomains)} поддоменов:\n{preview}", parse_mode="Markdown")
+        if probes is None:
+            preview = "\n".join(f"• `{s}`" for s in subdomains)
+        else:
+            preview = "\n".join(format_subdomain_probe(probe) for probe in probes)
+        await message.answer(
+            f"🔍 Найдено {len(subdomains)} поддоменов:\n{preview}\n{summary}",
+            parse_mode="Markdown",
+        )
 
 
 # Обработчик, не мешающий командам
@@ -799,7 +921,7 @@ async def cmd_subdomains(message: types.Message):
 #    dp.include_router(router)
 
 @router.message(F.text)
-async def universal_add(message: types.Message):
+async def universal_add(message: types.Message, http_session=None):
     text = message.text.strip()
 
     # Игнорируем команды (обрабатываются выше)
@@ -815,7 +937,8 @@ async def universal_add(message: types.Message):
             message.from_user.id,
             message.from_user.username,
             text,
-            message.bot
+            message.bot,
+            http_session=http_session,
         )
 
     # Всё остальное — как непонятный текст
@@ -827,5 +950,7 @@ async def universal_add(message: types.Message):
     )
 
 
-def register_handlers(dp, bot):
+def register_handlers(dp, bot, http_session=None):
+    # aiogram передаёт значения из workflow_data в хендлеры по имени аргумента.
+    dp["http_session"] = http_session
     dp.include_router(router)
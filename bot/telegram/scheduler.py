@@ -1,44 +1,339 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from bot.infra.db import (
-    get_all_site_checks, get_report_sites, update_site_status_by_id,
-    log_event, delete_user_sites, log_user_action, update_site_success,
-    start_site_incident, clear_site_incident
+    get_active_target_schedule, iter_site_check_batches, get_report_sites, update_target_status,
+    log_event, delete_user_sites, log_user_action, update_target_success,
+    start_target_incident, clear_target_incident, update_target_network
 )
-from bot.infra.db import get_site_flags_by_id, set_site_flags_by_id
-from bot.checks.monitor import check_domain_expiry
+from bot.infra.db import set_site_flags_by_id, set_target_flags, site_check_flags
+from bot.infra.db import update_target_certificate
+from bot.checks.geoip_cache import enrich_ips
+from bot.checks.monitor import check_domain_expiry, check_ssl_details
 from bot.checks.service import check_resource
+from bot.core.check_settings import PRIORITY_NORMAL
+from bot.core.delayed_queue import DelayedQueue
+from bot.core.phase_schedule import PhaseSchedule
+from bot.core.refresh_policy import certificate_refresh_delay
 from bot.core.status_formatter import (
     format_domain_expiry_alert, format_down_alert, format_recovery_alert,
     format_ssl_expiry_alert, format_status_text, format_weekly_user_report,
     group_rows_by_user, split_message
 )
 from bot.telegram.callback_data import site_check_now_callback, site_history_callback, site_pause_1h_callback
+from collections import deque
+from dataclasses import dataclass, replace
 from datetime import datetime
+from itertools import groupby
 from aiogram.exceptions import TelegramForbiddenError
 import os
 import asyncio
+import time
 
 BOT_OWNER_ID = int(os.getenv("BOT_OWNER_ID", "0"))
 MAX_CONCURRENT_CHECKS = int(os.getenv("MAX_CONCURRENT_CHECKS", "30"))
 HTTP_FAILURE_THRESHOLD = int(os.getenv("HTTP_FAILURE_THRESHOLD", "2"))
+HTTP_RETRY_ATTEMPTS = int(os.getenv("HTTP_RETRY_ATTEMPTS", "3"))
+HTTP_RETRY_DELAY_SECONDS = int(os.getenv("HTTP_RETRY_DELAY_SECONDS", "5"))
 CHECK_INTERVAL_MINUTES = int(os.getenv("CHECK_INTERVAL_MINUTES", "5"))
+# Раз в тик наступившие ресурсы читаются из БД и отдаются воркерам.
+SCHEDULER_TICK_SECONDS = float(os.getenv("SCHEDULER_TICK_SECONDS", "1"))
+# Как часто расписание сверяется со списком активных ресурсов.
+SCHEDULE_SYNC_SECONDS = float(os.getenv("SCHEDULE_SYNC_SECONDS", "60"))
+# Сколько наступивших ресурсов читается из БД одним запросом.
+CHECK_STREAM_BATCH_SIZE = int(os.getenv("CHECK_STREAM_BATCH_SIZE", "200"))
+# Отставание самой давней ждущей проверки, после которого планировщик пишет предупреждение.
+SCHEDULER_LAG_WARNING_SECONDS = float(os.getenv("SCHEDULER_LAG_WARNING_SECONDS", "60"))
+SCHEDULER_REPORT_SECONDS = 60.0
+# Пауза перед повторным чтением наступивших ресурсов после ошибки БД.
+LOAD_RETRY_SECONDS = 5.0
+# Сколько последних проверок учитывается в среднем и p95 отставания.
+LAG_SAMPLES = 1000
 WEEKLY_REPORT_DAY = os.getenv("WEEKLY_REPORT_DAY", "mon")
 WEEKLY_REPORT_HOUR = int(os.getenv("WEEKLY_REPORT_HOUR", "9"))
 WEEKLY_REPORT_MINUTE = int(os.getenv("WEEKLY_REPORT_MINUTE", "0"))
 SCHEDULER_TIMEZONE = os.getenv("SCHEDULER_TIMEZONE", "Europe/Moscow")
 
-async def monitor(bot):
-    sites = get_all_site_checks()
-    semaphore = asyncio.Semaphore(MAX_CONCURRENT_CHECKS)
-    tasks = []
-    for row in sites:
-        tasks.append(process_site_limited(bot, semaphore, row))
-    await asyncio.gather(*tasks)
+@dataclass
+class TargetCheck:
+    target_id: int
+    url: str
+    # Строки iter_site_check_batches по подпискам ресурса: состояние ресурса и флаги уведомлений.
+    rows: list
+    attempt: int = 1
+    probe_ssl: bool = True
+    ip: str | None = None
+    priority: int = PRIORITY_NORMAL
+    # Срок по расписанию и фактическое начало проверки (time.time()).
+    due_at: float = 0.0
+    started_at: float | None = None
+    # Результат сетевой части проверки для стадии записи.
+    probe: "TargetProbe | None" = None
 
-async def process_site_limited(bot, semaphore, site_row):
-    async with semaphore:
-        await process_site(bot, site_row)
+
+@dataclass
+class TargetProbe:
+    """Что проверка ресурса узнала по сети; в БД это пишет стадия записи."""
+    result: object = None
+    status: str = ""
+    domain_days: int = -1
+    registrar: str | None = None
+    contact_url: str | None = None
+    # Сертификат прочитан заново, а не взят из сохранённых данных ресурса.
+    certificate_read: bool = False
+    error: Exception | None = None
+
+
+@dataclass
+class TargetOutcome:
+    """Состояние ресурса после проверки, общее для всех его подписчиков."""
+    http_fail_count: int
+    incident_started_at: datetime | None
+
+class MonitorEngine:
+    """Непрерывный мониторинг вместо прогона всех сайтов раз в CHECK_INTERVAL_MINUTES.
+
+    Каждый ресурс проверяется раз в свой интервал в постоянную фазу (PhaseSchedule),
+    поэтому проверки идут ровным потоком. Интервал и приоритет берутся из настроек
+    подписки или пользователя, иначе общие.
+
+    Проверка идёт конвейером: тик только отмечает наступившие ресурсы, загрузчик читает
+    их строки пачками и кладёт проверки в ограниченную очередь, пул воркеров делает
+    сетевую часть, а одна стадия записи сохраняет результаты в БД и рассылает
+    уведомления. Очереди ограничены числом воркеров, так что память зависит от него
+    и размера пачки, а не от числа сайтов. Загрузчик отдаёт ресурсы с высоким приоритетом первыми,
+    а среди равных — самые давние.
+
+    Срок, наступивший, пока прошлая проверка ресурса ещё идёт, не теряется: он ждёт
+    в backlog и уходит в работу сразу после неё. Отставание начала проверки от срока
+    и такие перекрытия считаются в stats() и раз в SCHEDULER_REPORT_SECONDS пишутся в лог.
+    """
+
+    def __init__(
+        self, bot, http_session=None, interval_minutes=CHECK_INTERVAL_MINUTES, workers=MAX_CONCURRENT_CHECKS,
+        clock=time.time,
+    ):
+        self.bot = bot
+        self.http_session = http_session
+        self.interval_minutes = interval_minutes
+        self.workers = workers
+        self.schedule = PhaseSchedule(clock)
+        self.queue = asyncio.Queue(maxsize=workers)
+        self.results = asyncio.Queue(maxsize=workers)
+        # Повторы ждут своей задержки здесь и возвращаются в self.queue.
+        self.retries = DelayedQueue(clock)
+        self._clock = clock
+        self._synced_at = None
+        self._reported_at = clock()
+        self._priorities = {}
+        # target_id -> срок: наступили, но строки ещё не загружены.
+        self._pending = {}
+        self._pending_changed = asyncio.Event()
+        # target_id -> TargetCheck: в очереди, в работе, ждёт повтора или записи.
+        self._in_flight = {}
+        # target_id -> самый старый срок, наступивший во время прошлой проверки.
+        self._backlog = {}
+        self._completed = []
+        self._lags = deque(maxlen=LAG_SAMPLES)
+        self._durations = deque(maxlen=LAG_SAMPLES)
+        self.busy = 0
+        self.checks = 0
+        self.overlaps = 0
+        self.late = 0
+        self._task = None
+
+    def sync(self):
+        settings = get_active_target_schedule(self.interval_minutes, PRIORITY_NORMAL)
+        self.schedule.sync({target_id: minutes * 60 for target_id, (minutes, _) in settings.items()})
+        self._priorities = {target_id: priority for target_id, (_, priority) in settings.items()}
+        self._synced_at = self._clock()
+
+    def _active(self, target_id):
+        return target_id in self._pending or target_id in self._in_flight
+
+    def tick(self):
+        now = self._clock()
+        if self._synced_at is None or now - self._synced_at >= SCHEDULE_SYNC_SECONDS:
+            self.sync()
+        due = {}
+        for target_id, due_at in self.schedule.pop_due(now):
+            if self._active(target_id):
+                # Прошлая проверка не закончилась к новому сроку: откладываем, а не пропускаем.
+                self.overlaps += 1
+                self._backlog.setdefault(target_id, due_at)
+            else:
+                due[target_id] = due_at
+        for target_id in [target_id for target_id in self._backlog if not self._active(target_id)]:
+            due[target_id] = self._backlog.pop(target_id)
+        if due:
+            self._pending.update(due)
+            self._pending_changed.set()
+        if self._completed:
+            completed, self._completed = self._completed, []
+            record_network_changes(completed)
+        if now - self._reported_at >= SCHEDULER_REPORT_SECONDS:
+            self._reported_at = now
+            self.report()
+
+    async def _load(self):
+        """Загрузчик: читает строки наступивших ресурсов и кладёт проверки в очередь воркеров.
+
+        Один и тот же ресурс у разных пользователей проверяем один раз. Строки читаются
+        пачками по CHECK_STREAM_BATCH_SIZE ресурсов; следующая пачка читается, только
+        когда предыдущая ушла в очередь воркеров, поэтому в памяти не больше пачки.
+        Если чтение не удалось, незагруженные ресурсы остаются в ожидании и через
+        LOAD_RETRY_SECONDS читаются снова.
+        """
+        while True:
+            await self._pending_changed.wait()
+            self._pending_changed.clear()
+            target_ids = sorted(
+                self._pending, key=lambda target_id: (-self._priorities.get(target_id, PRIORITY_NORMAL), self._pending[target_id])
+            )
+            try:
+                for batch, rows in iter_site_check_batches(target_ids, CHECK_STREAM_BATCH_SIZE):
+                    checks = [
+                        self._new_check(target_id, list(target_rows))
+                        for target_id, target_rows in groupby(rows, key=lambda row: row[8])
+                    ]
+                    # Ресурсы без строк за это время поставили на паузу или удалили.
+                    for target_id in batch:
+                        self._pending.pop(target_id, None)
+                    for check in checks:
+                        self._in_flight[check.target_id] = check
+                    for check in checks:
+                        await self.queue.put(check)
+            except Exception as e:
+                print(f"Ошибка загрузки проверок: {type(e).__name__}: {e}")
+                await asyncio.sleep(LOAD_RETRY_SECONDS)
+                self._pending_changed.set()
+
+    def _new_check(self, target_id, rows):
+        # Сертификат читаем только у ресурсов, которым это назначила refresh_policy.
+        return TargetCheck(
+            target_id, rows[0][9], rows, probe_ssl=rows[0][14],
+            priority=self._priorities.get(target_id, PRIORITY_NORMAL), due_at=self._pending[target_id],
+        )
+
+    async def _retry(self):
+        while True:
+            check = await self.retries.get()
+            await self.queue.put(check)
+
+    async def _worker(self):
+        while True:
+            check = await self.queue.get()
+            if check.attempt == 1:
+                check.started_at = self._clock()
+                self._record_start(check)
+            self.busy += 1
+            try:
+                retry_delay = await probe_target(check, self.http_session)
+            except Exception as e:
+                print(f"Ошибка обработки сайта {check.url}: {type(e).__name__}: {e}")
+                retry_delay = None
+            finally:
+                self.busy -= 1
+            if retry_delay is not None:
+                # Повтор ждёт отдельно, а воркер сразу берёт следующий сайт.
+                check.attempt += 1
+                self.retries.put(check, retry_delay, priority=check.priority)
+                continue
+            self._durations.append(self._clock() - check.started_at)
+            await self.results.put(check)
+
+    async def _write(self):
+        """Стадия записи: результаты сохраняются в БД по одному, через общее соединение."""
+        while True:
+            check = await self.results.get()
+            try:
+                if check.probe is not None:
+                    await persist_target(self.bot, check)
+            except Exception as e:
+                print(f"Ошибка сохранения результата {check.url}: {type(e).__name__}: {e}")
+            self.checks += 1
+            del self._in_flight[check.target_id]
+            self._completed.append(check)
+
+    def _record_start(self, check):
+        lag = check.started_at - check.due_at
+        self._lags.append(lag)
+        interval = self.schedule.interval(check.target_id)
+        if interval is not None and lag >= interval:
+            # Проверка началась позже следующего слота: на этот ресурс не хватает мощности.
+            self.late += 1
+
+    def stats(self):
+        now = self._clock()
+        waiting = [now - due_at for due_at in self._pending.values()]
+        waiting += [now - check.due_at for check in self._in_flight.values() if check.started_at is None]
+        lags = sorted(self._lags)
+        oldest_wait = max(waiting, default=0.0)
+        return {
+            "targets": len(self.schedule),
+            "queued": len(waiting),
+            "busy": self.busy,
+            "workers": self.workers,
+            "writing": self.results.qsize(),
+            "backlog": len(self._backlog),
+            "oldest_wait": oldest_wait,
+            "lag_avg": sum(lags) / len(lags) if lags else 0.0,
+            "lag_p95": lags[int(len(lags) * 0.95)] if lags else 0.0,
+            "check_avg": sum(self._durations) / len(self._durations) if self._durations else 0.0,
+            "checks": self.checks,
+            "overlaps": self.overlaps,
+            "late": self.late,
+            "overloaded": oldest_wait >= SCHEDULER_LAG_WARNING_SECONDS or bool(self._backlog),
+        }
+
+    def report(self):
+        stats = self.stats()
+        if not stats["overloaded"]:
+            return
+        print(
+            f"Проверки не успевают: в очереди {stats['queued']}, отложено {stats['backlog']}, "
+            f"ждёт дольше всех {stats['oldest_wait']:.0f} с, отставание p95 {stats['lag_p95']:.0f} с, "
+            f"занято воркеров {stats['busy']}/{stats['workers']}, ждут записи {stats['writing']}, "
+            f"перекрытий {stats['overlaps']}, опозданий на слот {stats['late']}"
+        )
+
+    async def run(self):
+        stages = [
+            self._load(), self._retry(), self._write(), *(self._worker() for _ in range(self.workers))
+        ]
+        tasks = [asyncio.create_task(stage) for stage in stages]
+        try:
+            while True:
+                try:
+                    self.tick()
+                except Exception as e:
+                    print(f"Ошибка планировщика проверок: {type(e).__name__}: {e}")
+                await asyncio.sleep(SCHEDULER_TICK_SECONDS)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+        return self._task
+
+def record_network_changes(checks):
+    """Сверяет ASN адресов, полученных с прошлого тика, с сохранёнными и пишет смену сети в события.
+
+    GeoIP берётся одним пакетом из кэша по IP; в БД пишутся только изменившиеся ресурсы.
+    """
+    networks = enrich_ips(check.ip for check in checks)
+    for check in checks:
+        info = networks.get(check.ip)
+        if info is None:
+            continue
+        last_asn = check.rows[0][13]
+        if info.asn == last_asn:
+            continue
+        update_target_network(check.target_id, info.asn, info.country)
+        if last_asn is not None:
+            name = f" ({info.as_name})" if info.as_name else ""
+            log_event(check.url, f"Сеть сменилась: AS{last_asn} → AS{info.asn}{name}, IP {check.ip}")
 
 def build_incident_keyboard(site_id):
     kb = InlineKeyboardBuilder()
@@ -48,85 +343,175 @@ def build_incident_keyboard(site_id):
     kb.adjust(1)
     return kb.as_markup()
 
-async def process_site(bot, site_row):
+async def probe_target(check, http_session=None):
+    """Сетевая часть проверки ресурса: HTTP, сертификат и срок домена, без записи в БД.
+
+    Если HTTP не ответил и попытки ещё остались, возвращает задержку до повторной
+    проверки. Иначе кладёт результат или ошибку в check.probe для стадии записи.
+    """
+    url = check.url
+    try:
+        result = await check_resource(
+            url, include_domain=False, include_ssl=check.probe_ssl, session=http_session, http_retries=1
+        )
+        if not result.http["ok"] and check.attempt < HTTP_RETRY_ATTEMPTS:
+            return HTTP_RETRY_DELAY_SECONDS * check.attempt
+        check.ip = result.http.get("ip")
+        result = await refresh_certificate(check, result)
+        certificate_read = result.ssl is not None
+        if not certificate_read:
+            result = stored_certificate(check, result)
+        # Кэш регистраций общий для всех ресурсов одного зарегистрированного домена.
+        domain_days, registrar, contact_url = await check_domain_expiry(url, session=http_session)
+        status = format_status_text(result.http, result.ssl_days, domain_days, registrar, contact_url, result.ssl)
+    except Exception as e:
+        check.probe = TargetProbe(error=e)
+        return None
+    check.probe = TargetProbe(result, status, domain_days, registrar, contact_url, certificate_read)
+    return None
+
+async def persist_target(bot, check):
+    """Применяет результат проверки ресурса ко всем подписчикам.
+
+    Состояние ресурса (статус, инцидент, сертификат) пишется один раз на ресурс,
+    флаги уведомлений — в каждую подписку.
+    """
+    probe = check.probe
+    try:
+        if probe.error is not None:
+            raise probe.error
+        if probe.certificate_read:
+            save_certificate(check, probe.result)
+        # Флаги прочитаны загрузчиком вместе со строками: писать их может только эта стадия.
+        flags_by_id = {row[0]: site_check_flags(row) for row in check.rows}
+        target_flags = next(iter(flags_by_id.values()))
+        outcome = apply_target_result(check, target_flags, probe.result, probe.status)
+    except Exception as e:
+        for row in check.rows:
+            await notify_check_error(bot, row[1], row[2], e)
+        return
+
+    for row in check.rows:
+        await apply_site_result(
+            bot, row, flags_by_id[row[0]], probe.result, outcome, probe.domain_days, probe.registrar, probe.contact_url
+        )
+
+def _ip_changed(check, result):
+    ip, last_ip = result.http.get("ip"), check.rows[0][7]
+    return bool(ip and last_ip and ip != last_ip)
+
+async def refresh_certificate(check, result):
+    """Перечитывает сертификат вне очереди, если сменился IP ресурса."""
+    if result.ssl is None and _ip_changed(check, result):
+        ssl = await check_ssl_details(check.url)
+        result = replace(result, ssl=ssl, ssl_days=ssl["days"])
+    return result
+
+def stored_certificate(check, result):
+    """Срок действия сертификата из сохранённых данных ресурса, когда его не читали."""
+    expires_at = check.rows[0][10]
+    days = (expires_at - datetime.utcnow()).days if expires_at else -1
+    return replace(result, ssl_days=days, ssl={"ok": expires_at is not None, "days": days, "error": None})
+
+def save_certificate(check, result):
+    """Сохраняет прочитанный сертификат и назначает следующее чтение."""
+    row = check.rows[0]
+    now = datetime.utcnow()
+    ssl = result.ssl
+    if ssl.get("expires_at"):
+        fingerprint = ssl.get("fingerprint")
+        changed = _ip_changed(check, result) or (row[11] is not None and fingerprint != row[11])
+        update_target_certificate(
+            check.target_id,
+            now + certificate_refresh_delay(ssl["days"], changed=changed),
+            expires_at=ssl["expires_at"].replace(tzinfo=None),
+            fingerprint=fingerprint,
+        )
+    else:
+        failures = (row[12] or 0) + 1
+        update_target_certificate(
+            check.target_id,
+            now + certificate_refresh_delay(None, failures=failures),
+            failures=failures,
+        )
+
+def apply_target_result(check, flags, result, status):
+    """Обновляет статус, счётчик провалов и инцидент ресурса."""
+    http_details = result.http
+    http_fail_count = flags.get("http_fail_count", 0)
+    # Строки подписок одного ресурса несут одинаковое состояние ресурса.
+    incident_started_at = check.rows[0][3]
+    now = datetime.utcnow()
+
+    update_target_status(check.target_id, status)
+    if not http_details["ok"]:
+        http_fail_count += 1
+        incident_started_at = start_target_incident(check.target_id, now, http_details.get("ip"))
+        set_target_flags(check.target_id, http_fail_count=http_fail_count)
+        return TargetOutcome(http_fail_count, incident_started_at)
+
+    if incident_started_at:
+        clear_target_incident(check.target_id)
+        if http_fail_count >= HTTP_FAILURE_THRESHOLD:
+            # Один раз на ресурс, а не на каждого подписчика.
+            log_event(check.url, "Сайт восстановился")
+    update_target_success(
+        check.target_id,
+        http_status=http_details.get("status_code"),
+        latency_ms=http_details.get("latency_ms"),
+        resolved_ip=http_details.get("ip")
+    )
+    if http_fail_count:
+        set_target_flags(check.target_id, http_fail_count=0)
+    return TargetOutcome(0, incident_started_at)
+
+async def notify_check_error(bot, user_id, url, error):
+    try:
+        await bot.send_message(user_id, f"{url} — ошибка проверки: {error}")
+    except TelegramForbiddenError:
+        await notify_block(bot, user_id, url)
+
+async def apply_site_result(bot, site_row, flags, result, outcome, domain_days, registrar, contact_url):
+    """Отправляет подписчику уведомления по результату проверки его ресурса."""
     site_id = site_row[0]
     user_id = site_row[1]
     url = site_row[2]
-    incident_started_at = site_row[3]
     last_success_at = site_row[4]
+    incident_started_at = outcome.incident_started_at
+    http_details = result.http
+    http_ok = http_details["ok"]
+    ssl_days = result.ssl_days
     try:
-        result = await check_resource(url, include_domain=False)
-        http_details = result.http
-        http_ok = http_details["ok"]
-        ssl_days = result.ssl_days
-
-        flags = get_site_flags_by_id(site_id)
         notified_http = flags.get("http", False)
         notified_ssl = flags.get("ssl", False)
         notified_domain = flags.get("domain", False)
-        http_fail_count = flags.get("http_fail_count", 0)
         last_ssl_ts = flags.get("ssl_ts")
         last_domain_ts = flags.get("domain_ts")
-        last_domain_check_ts = flags.get("domain_check_ts")
-        cached_domain_days = flags.get("domain_days_cache")
-        cached_registrar = flags.get("domain_registrar_cache")
-        cached_contact_url = flags.get("domain_contact_url_cache")
         now = datetime.utcnow()
 
-        should_refresh_domain = (
-            last_domain_check_ts is None or
-            (now - last_domain_check_ts).total_seconds() >= 24 * 60 * 60 or
-            cached_domain_days is None or
-            cached_domain_days == -2
-        )
-
-        if should_refresh_domain:
-            domain_days, registrar, contact_url = await check_domain_expiry(url)
-            set_site_flags_by_id(
-                site_id,
-                domain_check_ts=now,
-                domain_days_cache=domain_days,
-                domain_registrar_cache=registrar,
-                domain_contact_url_cache=contact_url
-            )
-        else:
-            domain_days = cached_domain_days
-            registrar = cached_registrar
-            contact_url = cached_contact_url
-
-        status = format_status_text(http_details, ssl_days, domain_days, registrar, contact_url)
-        update_site_status_by_id(site_id, status)
-
         issues = []
         notification_flags = {}
 
         # HTTP
         if not http_ok:
-            new_fail_count = http_fail_count + 1
-            incident_started_at = start_site_incident(site_id, now, http_details.get("ip"))
             should_notify_http = (
-                new_fail_count >= HTTP_FAILURE_THRESHOLD and
+                outcome.http_fail_count >= HTTP_FAILURE_THRESHOLD and
                 not notified_http
             )
             if should_notify_http:
                 issues.append(format_down_alert(
                     url,
                     http_details,
-                    new_fail_count,
+                    outcome.http_fail_count,
                     incident_started_at=incident_started_at,
                     last_success_at=last_success_at,
                 ))
                 reason = http_details.get("error") or "нет успешного ответа"
-                log_event(url, f"Сайт недоступен ({new_fail_count} подряд провалов): {reason}")
-                set_site_flags_by_id(site_id, http_fail_count=new_fail_count)
+                log_event(url, f"Сайт недоступен ({outcome.http_fail_count} подряд провалов): {reason}")
                 notification_flags["http"] = True
                 notification_flags["http_ts"] = now
-            else:
-                set_site_flags_by_id(site_id, http_fail_count=new_fail_count)
-        elif http_ok and (
-            notified_http or
-            (incident_started_at and http_fail_count >= HTTP_FAILURE_THRESHOLD)
-        ):
+        elif notified_http:
+            # Восстановление сообщаем только тем, кому отправляли сообщение о падении.
             try:
                 await bot.send_message(
                     user_id,
@@ -135,26 +520,7 @@ async def process_site(bot, site_row):
             except TelegramForbiddenError:
                 await notify_block(bot, user_id, url)
                 return
-            log_event(url, "Сайт восстановился")
-            clear_site_incident(site_id)
-            update_site_success(
-                site_id,
-                http_status=http_details.get("status_code"),
-                latency_ms=http_details.get("latency_ms"),
-                resolved_ip=http_details.get("ip")
-            )
-            set_site_flags_by_id(site_id, http=False, http_ts=None, http_fail_count=0)
-        else:
-            if incident_started_at:
-                clear_site_incident(site_id)
-            update_site_success(
-                site_id,
-                http_status=http_details.get("status_code"),
-                latency_ms=http_details.get("latency_ms"),
-                resolved_ip=http_details.get("ip")
-            )
-            if http_fail_count:
-                set_site_flags_by_id(site_id, http_fail_count=0)
+            set_site_flags_by_id(site_id, http=False, http_ts=None)
 
         # SSL
         if 0 <= ssl_days <= 14:
@@ -163,7 +529,8 @@ async def process_site(bot, site_row):
                 log_event(url, f"Сертификат истекает через {ssl_days} дней")
                 notification_flags["ssl"] = True
                 notification_flags["ssl_ts"] = now
-        else:
+        elif ssl_days > 14:
+            # Неизвестный срок сертификата (-1) не означает продления.
             if notified_ssl:
                 try:
                     await bot.send_message(user_id, f"✅ SSL продлён для {url} (осталось {ssl_days} дней)")
@@ -180,7 +547,8 @@ async def process_site(bot, site_row):
                 log_event(url, f"Домен истекает через {domain_days} дней")
                 notification_flags["domain"] = True
                 notification_flags["domain_ts"] = now
-        else:
+        elif domain_days > 14:
+            # Неизвестная дата или ограничение WHOIS (-1, -3) не означает продления.
             if notified_domain:
                 try:
                     await bot.send_message(user_id, f"✅ Домен продлён для {url} (осталось {domain_days} дней)")
@@ -206,10 +574,7 @@ async def process_site(bot, site_row):
     except TelegramForbiddenError:
         await notify_block(bot, user_id, url)
     except Exception as e:
-        try:
-            await bot.send_message(user_id, f"{url} — ошибка проверки: {e}")
-        except TelegramForbiddenError:
-            await notify_block(bot, user_id, url)
+        await notify_check_error(bot, user_id, url, e)
 
 async def notify_block(bot, user_id, url):
     """Обработка блокировки: очистка сайтов пользователя и уведомление администратора."""
@@ -252,9 +617,13 @@ async def send_weekly_reports(bot):
         except Exception as e:
             log_event("weekly_report", f"Не удалось отправить админ-отчёт: {e}")
 
-async def start_scheduler(bot):
+monitor_engine = None
+
+async def start_scheduler(bot, http_session=None):
+    global monitor_engine
+    monitor_engine = MonitorEngine(bot, http_session)
+    monitor_engine.start()
     scheduler = AsyncIOScheduler(timezone=SCHEDULER_TIMEZONE)
-    scheduler.add_job(monitor, "interval", minutes=CHECK_INTERVAL_MINUTES, args=[bot])
     scheduler.add_job(
         send_weekly_reports,
         "cron",
@@ -264,3 +633,4 @@ async def start_scheduler(bot):
         args=[bot],
     )
     scheduler.start()
+    return monitor_engine
@@ -0,0 +1 @@
+"""Maintenance commands: python -m bot.tools.<command>."""
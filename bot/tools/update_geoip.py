@@ -0,0 +1,87 @@
+"""Download the ip2asn dump and rebuild the local GeoIP/ASN database.
+
+    python -m bot.tools.update_geoip                 # скачать GEOIP_SOURCE_URL
+    python -m bot.tools.update_geoip --file dump.tsv.gz
+"""
+import argparse
+import gzip
+import io
+import ipaddress
+import os
+import shutil
+import tempfile
+import time
+import urllib.request
+
+from bot.core.geoip import GEOIP_DB_PATH, GeoIpDatabase, write_database
+
+GEOIP_SOURCE_URL = os.getenv("GEOIP_SOURCE_URL", "https://iptoasn.com/data/ip2asn-combined.tsv.gz")
+GEOIP_DOWNLOAD_TIMEOUT = 120
+
+
+def parse_ip2asn(lines):
+    """Строки ip2asn: начало, конец, AS, код страны, описание AS. Немаршрутизируемые (AS0) пропускаются."""
+    for line in lines:
+        parts = line.rstrip("\r\n").split("\t")
+        if len(parts) < 5 or not parts[2].isdigit():
+            continue
+        asn = int(parts[2])
+        if asn == 0:
+            continue
+        try:
+            start = ipaddress.ip_address(parts[0])
+            end = ipaddress.ip_address(parts[1])
+        except ValueError:
+            continue
+        country = parts[3] if parts[3] not in ("None", "Unknown") else None
+        yield start, end, asn, country, parts[4] if parts[4] != "Not routed" else None
+
+
+def _open_text(path):
+    raw = open(path, "rb")
+    if raw.read(2) == b"\x1f\x8b":
+        raw.seek(0)
+        return io.TextIOWrapper(gzip.GzipFile(fileobj=raw), encoding="utf-8", errors="replace")
+    raw.seek(0)
+    return io.TextIOWrapper(raw, encoding="utf-8", errors="replace")
+
+
+def download(url, target, timeout=GEOIP_DOWNLOAD_TIMEOUT):
+    request = urllib.request.Request(url, headers={"User-Agent": "DevCheckBot/1.0 geoip-update"})
+    with urllib.request.urlopen(request, timeout=timeout) as resp, open(target, "wb") as f:
+        shutil.copyfileobj(resp, f, length=1024 * 1024)
+
+
+def update_database(source_path, db_path=GEOIP_DB_PATH):
+    with _open_text(source_path) as lines:
+        v4_count, v6_count = write_database(db_path, parse_ip2asn(lines))
+    # Проверяем, что новый файл открывается, прежде чем сообщить об успехе.
+    GeoIpDatabase(db_path).close()
+    return v4_count, v6_count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Обновить локальную базу GeoIP/ASN")
+    parser.add_argument("--file", help="локальный файл ip2asn (.tsv или .tsv.gz) вместо скачивания")
+    parser.add_argument("--url", default=GEOIP_SOURCE_URL, help="адрес дампа ip2asn")
+    parser.add_argument("--output", default=GEOIP_DB_PATH, help="куда записать базу")
+    args = parser.parse_args(argv)
+
+    started = time.monotonic()
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    if args.file:
+        v4_count, v6_count = update_database(args.file, args.output)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "ip2asn.tsv.gz")
+            print(f"Скачиваю {args.url}")
+            download(args.url, source)
+            v4_count, v6_count = update_database(source, args.output)
+    print(
+        f"GeoIP: {v4_count} диапазонов IPv4, {v6_count} IPv6 → {args.output} "
+        f"за {time.monotonic() - started:.1f} с"
+    )
+
+
+if __name__ == "__main__":
+    main()
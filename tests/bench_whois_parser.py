@@ -0,0 +1,31 @@
+"""Замер разбора корпуса WHOIS-ответов: python tests/bench_whois_parser.py [повторов]."""
+import sys
+import time
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from bot.checks.whois_parser import parse_whois
+
+CORPUS = ROOT / "tests" / "whois_corpus"
+
+
+def main(rounds=2000):
+    samples = [
+        (path.stem.split("__", 1)[0], path.read_text(encoding="utf-8"))
+        for path in sorted(CORPUS.glob("*.txt"))
+    ]
+    for label, server_of in (("по серверу", lambda server: server), ("общий формат", lambda server: None)):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for server, text in samples:
+                parse_whois(text, server_of(server))
+        elapsed = time.perf_counter() - started
+        total = rounds * len(samples)
+        print(f"{label:>14}: {total} ответов за {elapsed:.3f} с, {elapsed / total * 1e6:.1f} мкс на ответ")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,40 @@
+import sys
+import unittest
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from bot.core.check_settings import (
+    PRIORITY_HIGH, PRIORITY_LOW, CheckSettingsError, format_interval, parse_interval, parse_priority
+)
+
+
+class CheckSettingsTest(unittest.TestCase):
+    def test_parse_interval(self):
+        self.assertEqual(parse_interval("15"), 15)
+        self.assertEqual(parse_interval("15m"), 15)
+        self.assertEqual(parse_interval("2h"), 120)
+        self.assertEqual(parse_interval("2ч"), 120)
+        self.assertIsNone(parse_interval("default"))
+        for bad in ("0", "abc", "-5", "3000", ""):
+            with self.subTest(bad=bad):
+                with self.assertRaises(CheckSettingsError):
+                    parse_interval(bad)
+
+    def test_parse_priority(self):
+        self.assertEqual(parse_priority("HIGH"), PRIORITY_HIGH)
+        self.assertEqual(parse_priority("низкий"), PRIORITY_LOW)
+        self.assertIsNone(parse_priority("сброс"))
+        with self.assertRaises(CheckSettingsError):
+            parse_priority("urgent")
+
+    def test_format_interval(self):
+        self.assertEqual(format_interval(90), "90 мин")
+        self.assertEqual(format_interval(120), "2 ч")
+        self.assertEqual(format_interval(None), "по умолчанию")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from bot.core.cache import MISSING, TtlLruCache
+from bot.infra.dns_resolver import DnsResolver
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TtlLruCacheTest(unittest.TestCase):
+    def test_entries_expire_after_ttl(self):
+        clock = FakeClock()
+        cache = TtlLruCache(ttl=10, clock=clock)
+        cache.set("a", 1)
+
+        clock.now = 9
+        self.assertEqual(cache.get("a"), 1)
+        clock.now = 10
+        self.assertIs(cache.get("a"), MISSING)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = TtlLruCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIs(cache.get("b"), MISSING)
+        self.assertEqual(cache.get("c"), 3)
+
+
+class DnsResolverTest(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_lookups_share_one_query(self):
+        calls = []
+
+        async def lookup(hostname):
+            calls.append(hostname)
+            await asyncio.sleep(0.01)
+            return "203.0.113.10"
+
+        resolver = DnsResolver(lookup=lookup)
+        results = await asyncio.gather(*(resolver.resolve("Example.com") for _ in range(5)))
+        cached = await resolver.resolve("example.com.")
+
+        self.assertEqual(set(results), {"203.0.113.10"})
+        self.assertEqual(cached, "203.0.113.10")
+        self.assertEqual(calls, ["example.com"])
+        self.assertEqual(resolver.stats()["misses"], 1)
+        self.assertEqual(resolver.stats()["joined"], 4)
+        self.assertEqual(resolver.stats()["hits"], 1)
+
+    async def test_failures_are_cached_negatively(self):
+        calls = []
+
+        async def lookup(hostname):
+            calls.append(hostname)
+            raise OSError("Name or service not known")
+
+        resolver = DnsResolver(lookup=lookup)
+
+        self.assertIsNone(await resolver.resolve("missing.example"))
+        self.assertIsNone(await resolver.resolve("missing.example"))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(resolver.stats()["negative_hits"], 1)
+        self.assertEqual(resolver.stats()["errors"], 1)
+
+    async def test_slow_lookup_times_out_without_negative_cache(self):
+        calls = []
+
+        async def lookup(hostname):
+            calls.append(hostname)
+            await asyncio.sleep(1)
+            return "203.0.113.10"
+
+        resolver = DnsResolver(lookup=lookup, timeout=0.01)
+
+        self.assertIsNone(await resolver.resolve("slow.example"))
+        self.assertIsNone(await resolver.resolve("slow.example"))
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(resolver.stats()["timeouts"], 2)
+
+    async def test_concurrency_limit_does_not_count_queue_time(self):
+        running = []
+        peak = 0
+
+        async def lookup(hostname):
+            nonlocal peak
+            running.append(hostname)
+            peak = max(peak, len(running))
+            await asyncio.sleep(0.05)
+            running.remove(hostname)
+            return "203.0.113.10"
+
+        resolver = DnsResolver(lookup=lookup, timeout=0.5, concurrency=2)
+        results = await asyncio.gather(*(resolver.resolve(f"host{i}.example") for i in range(30)))
+
+        # Последние имена ждут слот 0.7 с, дольше таймаута, но сам lookup укладывается с запасом.
+        self.assertEqual(results, ["203.0.113.10"] * 30)
+        self.assertEqual(peak, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import asyncio
+import sys
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from bot.checks.domain_cache import STATUS_OK, STATUS_THROTTLED, STATUS_UNKNOWN, DomainRegistrationCache
+from bot.checks.whois_client import WhoisThrottled
+
+
+EXPIRES_AT = datetime.utcnow() + timedelta(days=100, hours=1)
+
+
+class DomainRegistrationCacheTest(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_subdomain_checks_share_one_lookup(self):
+        calls = []
+
+        async def lookup(domain, session=None):
+            calls.append(domain)
+            await asyncio.sleep(0.01)
+            return EXPIRES_AT, "Registrar", None
+
+        cache = DomainRegistrationCache(lookup=lookup)
+        records = await asyncio.gather(*(cache.get("example.com") for _ in range(50)))
+
+        self.assertEqual(calls, ["example.com"])
+        self.assertEqual({record.days_left() for record in records}, {100})
+        self.assertEqual(cache.stats()["joined"], 49)
+
+    async def test_fresh_store_row_skips_lookup_and_stale_row_is_refreshed(self):
+        stored = {}
+        calls = []
+
+        async def lookup(domain, session=None):
+            calls.append(domain)
+            return EXPIRES_AT, "Fresh", None
+
+        def save(domain, **record):
+            stored[domain] = record
+
+        stored["fresh.com"] = {
+            "expires_at": EXPIRES_AT, "registrar": "Stored", "contact_url": None,
+            "checked_at": datetime.utcnow() - timedelta(days=2),
+            "next_refresh_at": datetime.utcnow() + timedelta(hours=1),
+        }
+        stored["stale.com"] = {
+            "expires_at": EXPIRES_AT, "registrar": "Stored", "contact_url": None,
+            "checked_at": datetime.utcnow() - timedelta(days=2),
+            "next_refresh_at": datetime.utcnow() - timedelta(minutes=1),
+        }
+        cache = DomainRegistrationCache(lookup=lookup, load=stored.get, save=save)
+
+        fresh = await cache.get("fresh.com")
+        stale = await cache.get("stale.com")
+
+        self.assertEqual(fresh.registrar, "Stored")
+        self.assertEqual(stale.registrar, "Fresh")
+        self.assertEqual(calls, ["stale.com"])
+        self.assertEqual(stored["stale.com"]["registrar"], "Fresh")
+        # 100 дней до окончания — следующая проверка не раньше чем через несколько дней.
+        self.assertGreater(stored["stale.com"]["next_refresh_at"], datetime.utcnow() + timedelta(days=2))
+
+    async def test_failed_lookup_backs_off_and_keeps_previous_data(self):
+        stored = {
+            "example.com": {
+                "expires_at": EXPIRES_AT, "registrar": "Stored", "contact_url": None,
+                "checked_at": datetime.utcnow() - timedelta(days=8),
+                "next_refresh_at": datetime.utcnow() - timedelta(minutes=1),
+                "failures": 1,
+            }
+        }
+
+        async def lookup(domain, session=None):
+            raise OSError("unreachable")
+
+        def save(domain, **record):
+            stored[domain] = record
+
+        cache = DomainRegistrationCache(lookup=lookup, load=stored.get, save=save)
+
+        first = await cache.get("example.com")
+        second = await cache.get("example.com")
+
+        self.assertIs(first, second)
+        self.assertEqual(first.registrar, "Stored")
+        self.assertEqual(first.days_left(), 100)
+        self.assertEqual(stored["example.com"]["failures"], 2)
+        self.assertEqual(cache.stats()["misses"], 1)
+        self.assertEqual(first.status, STATUS_OK)
+
+    async def test_throttled_lookup_is_not_unknown_and_waits_for_server_pause(self):
+        stored = {}
+
+        async def lookup(domain, session=None):
+            if domain == "throttled.ru":
+                raise WhoisThrottled("whois.tcinet.ru", retry_after=3600)
+            return None, None, None
+
+        def save(domain, **record):
+            stored[domain] = record
+
+        cache = DomainRegistrationCache(lookup=lookup, load=stored.get, save=save)
+
+        throttled = await cache.get("throttled.ru")
+        unknown = await cache.get("unknown.ru")
+
+        self.assertEqual(throttled.status, STATUS_THROTTLED)
+        self.assertEqual(throttled.failures, 0)
+        self.assertGreater(throttled.next_refresh_at, datetime.utcnow() + timedelta(minutes=59))
+        self.assertEqual(stored["throttled.ru"]["status"], STATUS_THROTTLED)
+        self.assertEqual(unknown.status, STATUS_UNKNOWN)
+        self.assertEqual(cache.stats()["throttled"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
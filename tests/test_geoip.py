@@ -0,0 +1,67 @@
+import gzip
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from bot.core.geoip import GeoInfo, GeoIpDatabase
+from bot.core.status_formatter import format_geo_info
+from bot.tools.update_geoip import main as update_geoip, parse_ip2asn
+
+IP2ASN_DUMP = (
+    "1.0.0.0\t1.0.0.255\t13335\tUS\tCLOUDFLARENET\n"
+    "1.0.1.0\t1.0.3.255\t0\tNone\tNot routed\n"
+    "5.255.255.0\t5.255.255.255\t13238\tRU\tYANDEX LLC\n"
+    "8.8.8.0\t8.8.8.255\t15169\tUS\tGOOGLE\n"
+    "2a00:1450::\t2a00:1450:ffff:ffff:ffff:ffff:ffff:ffff\t15169\tUS\tGOOGLE\n"
+    "2a02:6b8::\t2a02:6b8:ffff:ffff:ffff:ffff:ffff:ffff\t13238\tRU\tYANDEX LLC\n"
+)
+
+
+class GeoIpDatabaseTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        source = Path(self.tmp.name) / "ip2asn.tsv.gz"
+        source.write_bytes(gzip.compress(IP2ASN_DUMP.encode()))
+        self.path = Path(self.tmp.name) / "ip2asn.bin"
+        update_geoip(["--file", str(source), "--output", str(self.path)])
+        self.db = GeoIpDatabase(self.path)
+        self.addCleanup(self.db.close)
+
+    def test_ipv4_ranges_and_boundaries(self):
+        self.assertEqual(self.db.lookup("1.0.0.0"), GeoInfo("US", 13335, "CLOUDFLARENET"))
+        self.assertEqual(self.db.lookup("1.0.0.255").asn, 13335)
+        self.assertEqual(self.db.lookup("5.255.255.77"), GeoInfo("RU", 13238, "YANDEX LLC"))
+        self.assertEqual(self.db.lookup("8.8.8.8").as_name, "GOOGLE")
+
+    def test_gaps_unrouted_and_invalid_addresses(self):
+        for ip in ("0.0.0.1", "1.0.2.1", "8.8.9.0", "255.255.255.255", "not-an-ip"):
+            with self.subTest(ip=ip):
+                self.assertIsNone(self.db.lookup(ip))
+
+    def test_ipv6_and_mapped_ipv4(self):
+        self.assertEqual(self.db.lookup("2a00:1450:4001:82b::200e").asn, 15169)
+        self.assertEqual(self.db.lookup("2a02:6b8::2:242").country, "RU")
+        self.assertIsNone(self.db.lookup("2001:db8::1"))
+        self.assertEqual(self.db.lookup("::ffff:8.8.8.8").asn, 15169)
+
+    def test_format_geo_info(self):
+        text = format_geo_info("8.8.8.8", self.db.lookup("8.8.8.8"))
+
+        self.assertIn("🇺🇸 US", text)
+        self.assertIn("AS15169 (GOOGLE)", text)
+
+    def test_parse_ip2asn_skips_unrouted_and_malformed_lines(self):
+        rows = list(parse_ip2asn(IP2ASN_DUMP.splitlines() + ["garbage", "x\ty\t1\tUS\tBAD"]))
+
+        self.assertEqual(len(rows), 5)
+        self.assertNotIn(0, [row[2] for row in rows])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import sys
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from bot.checks.geoip_cache import GeoIpCache
+from bot.core.geoip import GeoInfo
+
+NETWORKS = {
+    "8.8.8.8": GeoInfo("US", 15169, "GOOGLE"),
+    "5.255.255.77": GeoInfo("RU", 13238, "YANDEX LLC"),
+}
+
+
+class GeoIpCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.lookups = []
+        self.stored = {}
+        self.loads = 0
+
+        def lookup(ip):
+            self.lookups.append(ip)
+            return NETWORKS.get(ip)
+
+        def load_many(ips):
+            self.loads += 1
+            return {ip: self.stored[ip] for ip in ips if ip in self.stored}
+
+        def save_many(rows):
+            for ip, country, asn, as_name, checked_at in rows:
+                self.stored[ip] = {"country": country, "asn": asn, "as_name": as_name, "checked_at": checked_at}
+
+        self.cache = GeoIpCache(lookup=lookup, load_many=load_many, save_many=save_many)
+
+    def test_batch_dedups_ips_and_caches_misses(self):
+        result = self.cache.enrich_ips(["8.8.8.8", "8.8.8.8", "10.0.0.1", None, "5.255.255.77"])
+        again = self.cache.enrich_ips(["8.8.8.8", "10.0.0.1"])
+
+        self.assertEqual(result["8.8.8.8"].asn, 15169)
+        self.assertIsNone(result["10.0.0.1"])
+        self.assertEqual(again, {"8.8.8.8": NETWORKS["8.8.8.8"], "10.0.0.1": None})
+        self.assertEqual(self.lookups, ["8.8.8.8", "10.0.0.1", "5.255.255.77"])
+        self.assertEqual(self.loads, 1)
+        self.assertIsNone(self.stored["10.0.0.1"]["asn"])
+
+    def test_fresh_store_rows_skip_lookup_and_stale_rows_are_refreshed(self):
+        self.stored["8.8.8.8"] = {"country": "US", "asn": 15169, "as_name": "GOOGLE", "checked_at": datetime.utcnow()}
+        self.stored["5.255.255.77"] = {
+            "country": "NL", "asn": 1, "as_name": "OLD", "checked_at": datetime.utcnow() - timedelta(days=2),
+        }
+
+        result = self.cache.enrich_ips(["8.8.8.8", "5.255.255.77"])
+
+        self.assertEqual(self.lookups, ["5.255.255.77"])
+        self.assertEqual(result["5.255.255.77"], NETWORKS["5.255.255.77"])
+        self.assertEqual(self.stored["5.255.255.77"]["asn"], 13238)
+        self.assertEqual(self.cache.stats()["store_hits"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
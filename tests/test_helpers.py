@@ -17,7 +17,7 @@ from callback_data import (
     site_resume_callback,
     site_status_callback,
 )
-from url_utils import normalize_url
+from url_utils import canonical_url, normalize_url
 from status_formatter import (
     format_domain_expiry_alert,
     format_down_alert,
@@ -39,9 +39,19 @@ class UrlUtilsTest(unittest.TestCase):
             "https://example.com",
         )
 
+    def test_normalize_strips_only_leading_www_label(self):
+        self.assertEqual(normalize_url("awww.ru"), "https://awww.ru")
+        self.assertEqual(normalize_url("www.www-shop.ru"), "https://www-shop.ru")
+
     def test_normalize_keeps_invalid_input_visible(self):
         self.assertEqual(normalize_url("not a url"), "https://not a url")
 
+    def test_canonical_url_merges_equivalent_targets(self):
+        self.assertEqual(canonical_url("HTTPS://Example.com:443/"), "https://example.com")
+        self.assertEqual(canonical_url("example.com"), "https://example.com")
+        self.assertEqual(canonical_url("http://example.com:8080/health/"), "http://example.com:8080/health")
+        self.assertNotEqual(canonical_url("http://example.com"), canonical_url("https://example.com"))
+
 
 class CallbackDataTest(unittest.TestCase):
     def test_site_callbacks_are_short_and_stable(self):
@@ -99,6 +109,13 @@ class StatusFormatterTest(unittest.TestCase):
         self.assertIn("Домен: 90 дней", status)
         self.assertIn("Example Registrar", status)
 
+    def test_status_shows_tls_handshake_time_and_ssl_error(self):
+        ok = format_status_text({"ok": True}, 30, 90, ssl_details={"handshake_ms": 412})
+        failed = format_status_text({"ok": True}, -1, 90, ssl_details={"error": "TLS: timeout"})
+
+        self.assertIn("SSL: 30 дней до истечения | TLS 412 ms", ok)
+        self.assertIn("SSL: не проверен | TLS: timeout", failed)
+
     def test_down_alert_contains_reason_and_fail_count(self):
         alert = format_down_alert(
             "https://example.com",
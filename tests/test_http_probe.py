@@ -0,0 +1,194 @@
+import asyncio
+import ssl
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from aiohttp import web
+from cryptography.hazmat.primitives import serialization
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "tests"))
+
+from bot.checks.monitor import check_http_details
+from bot.checks.service import check_resource
+from bot.infra.http_client import close_http_session, create_http_session
+from test_tls_probe import make_certificate
+
+
+class CombinedProbeTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        cert, key = make_certificate(days_valid=30)
+        self.tmp = tempfile.TemporaryDirectory()
+        cert_path = Path(self.tmp.name) / "cert.pem"
+        key_path = Path(self.tmp.name) / "key.pem"
+        cert_path.write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+        key_path.write_bytes(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ))
+        server_ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_ctx.load_cert_chain(cert_path, key_path)
+        self.trusting_ctx = ssl.create_default_context(cafile=str(cert_path))
+
+        async def index(request):
+            return web.Response(text="ok")
+
+        app = web.Application()
+        app.router.add_route("*", "/", index)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0, ssl_context=server_ctx)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.url = f"https://localhost:{port}"
+        self.session = create_http_session()
+
+    async def asyncTearDown(self):
+        await close_http_session(self.session)
+        await self.runner.cleanup()
+        self.tmp.cleanup()
+
+    async def test_certificate_is_read_from_the_http_connection(self):
+        with patch("bot.checks.monitor.VERIFIED_SSL_CONTEXT", self.trusting_ctx):
+            first = await check_http_details(self.url, retries=1, session=self.session, with_certificate=True)
+            second = await check_http_details(self.url, retries=1, session=self.session, with_certificate=True)
+
+        self.assertTrue(first["ok"])
+        self.assertEqual(first["url"], self.url)
+        self.assertEqual(first["certificate"]["days"], 30)
+        self.assertIsNotNone(first["certificate"]["connect_ms"])
+        self.assertIsNone(first["certificate"]["handshake_ms"])
+        self.assertFalse(first["certificate"]["reused"])
+        self.assertTrue(second["certificate"]["reused"])
+
+    async def test_untrusted_certificate_keeps_site_available(self):
+        details = await check_http_details(self.url, retries=1, session=self.session, with_certificate=True)
+
+        self.assertTrue(details["ok"])
+        self.assertEqual(details["url"], self.url)
+        self.assertFalse(details["certificate"]["ok"])
+        self.assertEqual(details["certificate"]["days"], -1)
+        self.assertTrue(details["certificate"]["error"].startswith("TLS:"))
+
+    async def test_certificate_is_not_collected_unless_requested(self):
+        details = await check_http_details(self.url, retries=1, session=self.session)
+
+        self.assertTrue(details["ok"])
+        self.assertNotIn("certificate", details)
+
+    async def test_resource_check_reuses_probe_certificate(self):
+        with patch("bot.checks.monitor.VERIFIED_SSL_CONTEXT", self.trusting_ctx), \
+                patch("bot.checks.service.check_ssl_details") as separate_probe:
+            result = await check_resource(self.url, include_domain=False, session=self.session)
+
+        separate_probe.assert_not_called()
+        self.assertEqual(result.ssl_days, 30)
+        self.assertNotIn("certificate", result.http)
+
+
+class ResourceDeadlineTest(unittest.IsolatedAsyncioTestCase):
+    async def test_slow_parts_are_cancelled_at_deadline(self):
+        async def fast_http(url, **kwargs):
+            return {"ok": True, "status_code": 200, "url": url}
+
+        async def slow_ssl(url):
+            await asyncio.sleep(5)
+
+        async def slow_domain(url, session=None):
+            await asyncio.sleep(5)
+
+        with patch("bot.checks.service.check_http_details", fast_http), \
+                patch("bot.checks.service.check_ssl_details", slow_ssl), \
+                patch("bot.checks.service.check_domain_expiry", slow_domain):
+            started = asyncio.get_running_loop().time()
+            result = await check_resource("http://example.com", deadline=0.05)
+            elapsed = asyncio.get_running_loop().time() - started
+
+        self.assertLess(elapsed, 1)
+        self.assertTrue(result.http["ok"])
+        self.assertEqual(result.completed, ("http",))
+        self.assertEqual(result.timed_out, ("ssl", "domain"))
+        self.assertEqual(result.ssl_days, -1)
+        self.assertEqual(result.domain_days, -1)
+
+    async def test_sub_checks_run_concurrently(self):
+        async def http(url, **kwargs):
+            await asyncio.sleep(0.2)
+            return {"ok": True, "url": url}
+
+        async def ssl_probe(url):
+            await asyncio.sleep(0.2)
+            return {"ok": True, "days": 10}
+
+        async def domain(url, session=None):
+            await asyncio.sleep(0.2)
+            return 100, "Registrar", None
+
+        with patch("bot.checks.service.check_http_details", http), \
+                patch("bot.checks.service.check_ssl_details", ssl_probe), \
+                patch("bot.checks.service.check_domain_expiry", domain):
+            started = asyncio.get_running_loop().time()
+            result = await check_resource("http://example.com")
+            elapsed = asyncio.get_running_loop().time() - started
+
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual(result.completed, ("http", "ssl", "domain"))
+        self.assertEqual(result.timed_out, ())
+        self.assertEqual((result.ssl_days, result.domain_days), (10, 100))
+
+    async def test_certificate_from_first_https_response_beats_slow_retries(self):
+        async def slow_http(url, on_certificate=None, **kwargs):
+            on_certificate({"ok": True, "days": 30})
+            await asyncio.sleep(5)
+
+        with patch("bot.checks.service.check_http_details", slow_http):
+            result = await check_resource("https://example.com", include_domain=False, deadline=0.1)
+
+        self.assertEqual(result.completed, ("ssl",))
+        self.assertEqual(result.timed_out, ("http",))
+        self.assertEqual(result.ssl_days, 30)
+
+    async def test_tls_probe_starts_when_first_https_request_has_no_certificate(self):
+        async def slow_http(url, on_certificate=None, **kwargs):
+            on_certificate(None)
+            await asyncio.sleep(5)
+
+        async def ssl_probe(url):
+            return {"ok": True, "days": 10}
+
+        with patch("bot.checks.service.check_http_details", slow_http), \
+                patch("bot.checks.service.check_ssl_details", ssl_probe):
+            result = await check_resource("https://example.com", include_domain=False, deadline=0.1)
+
+        self.assertEqual(result.completed, ("ssl",))
+        self.assertEqual(result.ssl_days, 10)
+
+    async def test_failed_part_keeps_finished_ones(self):
+        async def http(url, **kwargs):
+            return {"ok": True, "url": url}
+
+        async def ssl_probe(url):
+            return {"ok": True, "days": 10}
+
+        async def broken_domain(url, session=None):
+            raise RuntimeError("whois недоступен")
+
+        with patch("bot.checks.service.check_http_details", http), \
+                patch("bot.checks.service.check_ssl_details", ssl_probe), \
+                patch("bot.checks.service.check_domain_expiry", broken_domain):
+            result = await check_resource("http://example.com")
+
+        self.assertEqual(result.completed, ("http", "ssl"))
+        self.assertEqual(result.failed, ("domain",))
+        self.assertEqual(result.timed_out, ())
+        self.assertEqual((result.ssl_days, result.domain_days), (10, -1))
+
+
+if __name__ == "__main__":
+    unittest.main()
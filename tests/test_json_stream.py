@@ -0,0 +1,57 @@
+import json
+import sys
+import unittest
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from bot.core.json_stream import JsonArrayStream, JsonStreamError
+
+
+ITEMS = [
+    {"id": 1, "name_value": "a.example.com\nb.example.com"},
+    {"id": 22, "name_value": "пример.рф", "note": "quote \" and ] inside"},
+    {"id": 333, "nested": {"list": [1, 2, {"x": "}"}]}},
+    12345,
+]
+
+
+class JsonArrayStreamTest(unittest.TestCase):
+    def test_any_chunk_size_yields_same_items(self):
+        data = json.dumps(ITEMS, ensure_ascii=False, indent=1).encode()
+        for size in (1, 2, 3, 7, 64, len(data)):
+            with self.subTest(size=size):
+                stream = JsonArrayStream()
+                items = []
+                for offset in range(0, len(data), size):
+                    items.extend(stream.feed(data[offset:offset + size]))
+                items.extend(stream.close())
+                self.assertEqual(items, ITEMS)
+                self.assertTrue(stream.finished)
+
+    def test_only_unfinished_item_is_buffered(self):
+        stream = JsonArrayStream()
+
+        items = stream.feed(b'[{"a": 1}, {"b": 2}, {"c": "unfinis')
+
+        self.assertEqual(items, [{"a": 1}, {"b": 2}])
+        self.assertEqual(stream._buffer, '{"c": "unfinis')
+
+    def test_truncated_or_invalid_input_raises(self):
+        truncated = JsonArrayStream()
+        truncated.feed(b'[{"a": 1}, {"b"')
+        with self.assertRaises(JsonStreamError):
+            truncated.close()
+
+        with self.assertRaises(JsonStreamError):
+            JsonArrayStream().feed(b'{"not": "array"}')
+
+        oversized = JsonArrayStream(max_item_chars=16)
+        with self.assertRaises(JsonStreamError):
+            oversized.feed(b'[{"a": "' + b"x" * 32)
+
+
+if __name__ == "__main__":
+    unittest.main()
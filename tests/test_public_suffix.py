@@ -0,0 +1,64 @@
+import sys
+import unittest
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from bot.core.public_suffix import PublicSuffixList, registrable_domain
+
+
+RULES = """
+// ===BEGIN ICANN DOMAINS===
+com
+uk
+co.uk
+ck
+*.ck
+!www.ck
+рф
+// ===END ICANN DOMAINS===
+// ===BEGIN PRIVATE DOMAINS===
+github.io
+// ===END PRIVATE DOMAINS===
+""".splitlines()
+
+
+class PublicSuffixListTest(unittest.TestCase):
+    def setUp(self):
+        self.psl = PublicSuffixList(RULES)
+
+    def test_registrable_domain_strips_subdomains(self):
+        self.assertEqual(self.psl.registrable_domain("a.b.example.com"), "example.com")
+        self.assertEqual(self.psl.registrable_domain("www.example.co.uk"), "example.co.uk")
+        self.assertEqual(self.psl.registrable_domain("Example.COM."), "example.com")
+
+    def test_public_suffix_itself_has_no_registrable_domain(self):
+        self.assertIsNone(self.psl.registrable_domain("co.uk"))
+        self.assertIsNone(self.psl.registrable_domain("com"))
+        self.assertIsNone(self.psl.registrable_domain("192.0.2.1"))
+
+    def test_wildcard_and_exception_rules(self):
+        self.assertIsNone(self.psl.registrable_domain("foo.ck"))
+        self.assertEqual(self.psl.registrable_domain("a.foo.ck"), "a.foo.ck")
+        self.assertEqual(self.psl.registrable_domain("www.ck"), "www.ck")
+
+    def test_unlisted_tld_uses_default_rule(self):
+        self.assertEqual(self.psl.registrable_domain("a.example.test"), "example.test")
+
+    def test_private_rules_are_optional(self):
+        self.assertEqual(self.psl.registrable_domain("user.github.io"), "user.github.io")
+        self.assertEqual(self.psl.registrable_domain("user.github.io", include_private=False), "github.io")
+
+    def test_idn_rules_match_punycode_hostnames(self):
+        self.assertEqual(self.psl.registrable_domain("www.пример.рф"), "xn--e1afmkfd.xn--p1ai")
+        self.assertEqual(self.psl.registrable_domain("xn--e1afmkfd.xn--p1ai"), "xn--e1afmkfd.xn--p1ai")
+
+    def test_bundled_list(self):
+        self.assertEqual(registrable_domain("awww.ru"), "awww.ru")
+        self.assertEqual(registrable_domain("shop.example.com.au"), "example.com.au")
+
+
+if __name__ == "__main__":
+    unittest.main()
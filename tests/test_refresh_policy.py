@@ -0,0 +1,42 @@
+import sys
+import unittest
+from datetime import timedelta
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from bot.core.refresh_policy import (
+    FAILURE_MAX_DELAY,
+    certificate_refresh_delay,
+    domain_refresh_delay,
+)
+
+
+class RefreshPolicyTest(unittest.TestCase):
+    def test_domain_refresh_gets_more_frequent_near_expiry(self):
+        delays = [domain_refresh_delay(days) for days in (300, 60, 20, 3)]
+
+        self.assertEqual(delays, sorted(delays, reverse=True))
+        self.assertEqual(domain_refresh_delay(300), timedelta(days=7))
+        self.assertEqual(domain_refresh_delay(3), timedelta(hours=6))
+
+    def test_unknown_expiry_is_rechecked_daily(self):
+        self.assertEqual(domain_refresh_delay(-1), timedelta(days=1))
+        self.assertEqual(domain_refresh_delay(None), timedelta(days=1))
+
+    def test_failures_back_off_exponentially_up_to_limit(self):
+        delays = [domain_refresh_delay(None, failures=n) for n in (1, 2, 3)]
+
+        self.assertEqual(delays, [timedelta(hours=1), timedelta(hours=2), timedelta(hours=4)])
+        self.assertEqual(certificate_refresh_delay(None, failures=50), FAILURE_MAX_DELAY)
+
+    def test_changed_certificate_is_confirmed_soon(self):
+        self.assertEqual(certificate_refresh_delay(80), timedelta(days=1))
+        self.assertEqual(certificate_refresh_delay(80, changed=True), timedelta(minutes=15))
+        self.assertEqual(certificate_refresh_delay(2), timedelta(hours=1))
+
+
+if __name__ == "__main__":
+    unittest.main()
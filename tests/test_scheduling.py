@@ -0,0 +1,372 @@
+import asyncio
+import sys
+import types
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import AsyncMock, Mock, patch
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from bot.checks.service import ResourceCheckResult
+from bot.core.check_settings import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL
+from bot.core.delayed_queue import DelayedQueue
+from bot.core.phase_schedule import PhaseSchedule, next_slot, stable_phase
+
+
+def import_scheduler():
+    # bot.infra.db подключается к Postgres при импорте; движку в тестах БД не нужна.
+    fake_db = types.ModuleType("bot.infra.db")
+    fake_db.__getattr__ = lambda name: Mock(name=name)
+    sys.modules["bot.infra.db"] = fake_db
+    try:
+        from bot.telegram import scheduler
+    finally:
+        del sys.modules["bot.infra.db"]
+    return scheduler
+
+
+scheduler = import_scheduler()
+
+
+class DelayedQueueTest(unittest.IsolatedAsyncioTestCase):
+    async def test_items_come_out_in_due_order(self):
+        queue = DelayedQueue()
+        queue.put("later", 0.05)
+        queue.put("now")
+        queue.put("soon", 0.01)
+
+        self.assertEqual([await queue.get() for _ in range(3)], ["now", "soon", "later"])
+
+    async def test_get_waits_for_item_added_later(self):
+        queue = DelayedQueue()
+        getter = asyncio.create_task(queue.get())
+        await asyncio.sleep(0.01)
+        self.assertFalse(getter.done())
+
+        queue.put("retry", 0.02)
+
+        self.assertEqual(await asyncio.wait_for(getter, 1), "retry")
+
+    async def test_delayed_item_does_not_block_ready_ones(self):
+        queue = DelayedQueue()
+        queue.put("retry", 10)
+        queue.put("fresh")
+
+        self.assertEqual(await asyncio.wait_for(queue.get(), 1), "fresh")
+        self.assertEqual(len(queue), 1)
+
+    async def test_backlog_is_served_by_priority_then_due_time(self):
+        queue = DelayedQueue()
+        queue.put("low", priority=0)
+        queue.put("normal-1", priority=1)
+        queue.put("high", priority=2)
+        queue.put("normal-2", priority=1)
+        queue.put("high-later", 0.05, priority=2)
+
+        self.assertEqual([await queue.get() for _ in range(4)], ["high", "normal-1", "normal-2", "low"])
+        self.assertEqual(await asyncio.wait_for(queue.get(), 1), "high-later")
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class PhaseScheduleTest(unittest.TestCase):
+    def test_next_slot_keeps_phase(self):
+        self.assertEqual(next_slot(1000, 300, 50), 1250)
+        self.assertEqual(next_slot(1250, 300, 50), 1550)
+        self.assertEqual(next_slot(10, 300, 50), 50)
+
+    def test_keys_are_spread_across_interval(self):
+        clock = FakeClock()
+        schedule = PhaseSchedule(clock)
+        schedule.sync(dict.fromkeys(range(3000), 300))
+
+        per_minute = []
+        for _ in range(5):
+            clock.now += 60
+            per_minute.append(len(schedule.pop_due()))
+
+        self.assertEqual(sum(per_minute), 3000)
+        # Равномерно: около 600 в минуту, без пачки в начале интервала.
+        for count in per_minute:
+            self.assertLess(abs(count - 600), 120)
+
+    def test_key_keeps_phase_between_restarts_and_runs_once_per_interval(self):
+        clock = FakeClock()
+        first = PhaseSchedule(clock)
+        second = PhaseSchedule(clock)
+        first.sync({"site": 300})
+        second.sync({"site": 300})
+        self.assertEqual(first.next_due(), second.next_due())
+        self.assertAlmostEqual(first.next_due() % 300, stable_phase("site", 300) % 300)
+
+        seen = []
+        for _ in range(600):
+            clock.now += 1
+            seen += [clock.now] * len(first.pop_due())
+        self.assertEqual(len(seen), 2)
+        self.assertEqual(seen[1] - seen[0], 300)
+
+    def test_late_pop_returns_oldest_due_once(self):
+        clock = FakeClock()
+        schedule = PhaseSchedule(clock)
+        schedule.sync({"site": 60})
+        first_due = schedule.next_due()
+
+        clock.now = first_due + 250
+        self.assertEqual(schedule.pop_due(), [("site", first_due)])
+        self.assertGreater(schedule.next_due(), clock.now)
+        self.assertEqual(schedule.interval("site"), 60)
+
+    def test_sync_drops_missing_keys_and_applies_new_interval(self):
+        clock = FakeClock()
+        schedule = PhaseSchedule(clock)
+        schedule.sync({"a": 300, "b": 300})
+        schedule.sync({"a": 60})
+
+        self.assertNotIn("b", schedule)
+        self.assertLessEqual(schedule.next_due() - clock.now, 60)
+        clock.now += 300
+        self.assertEqual([key for key, _ in schedule.pop_due()], ["a"])
+
+
+def site_row(target_id):
+    row = [None] * 15
+    row[0], row[8], row[9], row[14] = target_id * 10, target_id, f"https://t{target_id}.example", False
+    return tuple(row)
+
+
+class FakeSiteStore:
+    """Подменяет iter_site_check_batches: запоминает прочитанные пачки, первые failures чтений падают."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.batches = []
+
+    def __call__(self, target_ids, batch_size):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("connection lost")
+        target_ids = list(target_ids)
+        for start in range(0, len(target_ids), batch_size):
+            batch = target_ids[start:start + batch_size]
+            self.batches.append(batch)
+            yield batch, [site_row(target_id) for target_id in batch]
+
+
+async def wait_until(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("условие не выполнилось")
+        await asyncio.sleep(0.005)
+
+
+class MonitorEngineTestCase(unittest.IsolatedAsyncioTestCase):
+    """Движок с поддельными чтением из БД, сетевой проверкой и записью; probe ждёт self.gate."""
+
+    async def asyncSetUp(self):
+        self.store = FakeSiteStore()
+        self.probed = []
+        self.persisted = []
+        self.gate = asyncio.Event()
+        self.retry_delays = {}
+
+        async def probe_target(check, http_session=None):
+            self.probed.append((check.target_id, check.attempt, check.due_at))
+            await self.gate.wait()
+            delay = self.retry_delays.pop(check.target_id, None)
+            if delay is not None:
+                return delay
+            check.probe = scheduler.TargetProbe(status="ok")
+            return None
+
+        async def persist_target(bot, check):
+            self.persisted.append(check.target_id)
+
+        for name, value in {
+            "iter_site_check_batches": self.store,
+            "probe_target": probe_target,
+            "persist_target": persist_target,
+            "record_network_changes": lambda checks: None,
+            "SCHEDULER_REPORT_SECONDS": 10 ** 9,
+            "LOAD_RETRY_SECONDS": 0.01,
+        }.items():
+            patcher = patch.object(scheduler, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def start(self, engine):
+        # Тик вызывают сами тесты, run() оставляем только стадии конвейера.
+        engine.tick = lambda: None
+        task = engine.start()
+
+        async def stop():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        self.addAsyncCleanup(stop)
+
+    def enqueue(self, engine, due):
+        engine._pending.update(due)
+        engine._pending_changed.set()
+
+
+class MonitorPipelineTest(MonitorEngineTestCase):
+    async def test_checks_follow_priority_then_age_and_memory_is_bounded(self):
+        engine = scheduler.MonitorEngine(None, workers=2)
+        engine._priorities = {
+            1: PRIORITY_LOW, 2: PRIORITY_HIGH, 3: PRIORITY_NORMAL, 4: PRIORITY_NORMAL, **dict.fromkeys(range(5, 13), PRIORITY_LOW)
+        }
+        with patch.object(scheduler, "CHECK_STREAM_BATCH_SIZE", 1):
+            self.start(engine)
+            self.enqueue(engine, {1: 100.0, 2: 300.0, 3: 200.0, 4: 150.0, **{i: 500.0 + i for i in range(5, 13)}})
+            await wait_until(lambda: len(self.probed) == 2 and engine.queue.full())
+            await asyncio.sleep(0.05)
+
+            # 2 проверки у воркеров, 2 в очереди, 1 ждёт места: остальные пачки ещё не прочитаны.
+            self.assertEqual(len(engine._in_flight), 5)
+            self.assertEqual(len(self.store.batches), 5)
+            self.assertEqual(engine.stats()["queued"], 10)
+
+            self.gate.set()
+            await wait_until(lambda: len(self.persisted) == 12)
+
+        self.assertEqual([target_id for target_id, _, _ in self.probed], [2, 4, 3, 1, *range(5, 13)])
+        self.assertEqual(engine._in_flight, {})
+        self.assertEqual(engine.results.qsize(), 0)
+        self.assertEqual(engine.checks, 12)
+
+    async def test_retry_returns_through_bounded_queue(self):
+        engine = scheduler.MonitorEngine(None, workers=1)
+        self.retry_delays[1] = 0.01
+        self.gate.set()
+        self.start(engine)
+        self.enqueue(engine, {1: 100.0, 2: 200.0})
+
+        await wait_until(lambda: len(self.persisted) == 2)
+
+        self.assertEqual([(target_id, attempt) for target_id, attempt, _ in self.probed], [(1, 1), (2, 1), (1, 2)])
+        self.assertEqual(self.persisted, [2, 1])
+        self.assertEqual(engine._in_flight, {})
+        self.assertEqual(len(engine.retries), 0)
+
+    async def test_load_error_keeps_targets_pending_and_loader_alive(self):
+        engine = scheduler.MonitorEngine(None, workers=1)
+        self.store.failures = 1
+        self.gate.set()
+        self.start(engine)
+
+        with patch("builtins.print") as log:
+            self.enqueue(engine, {1: 100.0})
+            await wait_until(lambda: self.persisted == [1])
+            self.enqueue(engine, {2: 200.0})
+            await wait_until(lambda: self.persisted == [1, 2])
+
+        self.assertIn("connection lost", log.call_args_list[0].args[0])
+        self.assertEqual(engine._pending, {})
+
+
+class MonitorBacklogTest(MonitorEngineTestCase):
+    async def test_overlapping_due_waits_in_backlog_and_keeps_its_due_time(self):
+        clock = FakeClock()
+        engine = scheduler.MonitorEngine(None, interval_minutes=1, workers=1, clock=clock)
+        with patch.object(scheduler, "get_active_target_schedule", lambda interval, priority: {7: (1, PRIORITY_NORMAL)}):
+            engine.sync()
+            due = engine.schedule.next_due()
+            self.start(engine)
+            tick = scheduler.MonitorEngine.tick.__get__(engine)
+
+            clock.now = due + 5
+            tick()
+            await wait_until(lambda: len(self.probed) == 1)
+
+            # Следующий слот и ещё один наступают, пока первая проверка идёт.
+            clock.now = due + 61
+            tick()
+            clock.now = due + 125
+            tick()
+            self.assertEqual(engine._backlog, {7: due + 60})
+            self.assertEqual(engine.overlaps, 2)
+            self.assertEqual(engine.stats()["backlog"], 1)
+
+            self.gate.set()
+            await wait_until(lambda: self.persisted == [7])
+            self.assertEqual(engine._in_flight, {})
+
+            clock.now = due + 130
+            tick()
+            await wait_until(lambda: self.persisted == [7, 7])
+
+        self.assertEqual([due_at for _, _, due_at in self.probed], [due, due + 60])
+        self.assertEqual(engine._backlog, {})
+        stats = engine.stats()
+        self.assertEqual(stats["overlaps"], 2)
+        # Вторая проверка началась на 70 с позже своего срока — позже следующего слота.
+        self.assertEqual(stats["late"], 1)
+        self.assertEqual(stats["lag_p95"], 70)
+        self.assertEqual(stats["checks"], 2)
+
+
+class SiteNotificationTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.bot = Mock(send_message=AsyncMock())
+        for name in ("set_site_flags_by_id", "log_event"):
+            patcher = patch.object(scheduler, name)
+            setattr(self, name, patcher.start())
+            self.addCleanup(patcher.stop)
+
+    async def apply(self, flags, ssl_days=30, incident_started_at=None):
+        result = ResourceCheckResult(
+            url="https://t1.example",
+            http={"ok": True, "status_code": 200, "url": "https://t1.example", "latency_ms": 10},
+            ssl_days=ssl_days,
+            domain_days=100,
+        )
+        outcome = scheduler.TargetOutcome(0, incident_started_at)
+        row = (10, 100, "https://t1.example") + site_row(1)[3:]
+        await scheduler.apply_site_result(self.bot, row, flags, result, outcome, 100, None, None)
+
+    async def test_unknown_certificate_expiry_is_not_reported_as_renewal(self):
+        await self.apply({"ssl": True}, ssl_days=-1)
+
+        self.bot.send_message.assert_not_called()
+        self.set_site_flags_by_id.assert_not_called()
+
+    async def test_renewed_certificate_clears_flag(self):
+        await self.apply({"ssl": True}, ssl_days=90)
+
+        self.assertIn("SSL продлён", self.bot.send_message.call_args.args[1])
+        self.set_site_flags_by_id.assert_called_once_with(10, ssl=False, ssl_ts=None)
+
+    async def test_recovery_is_sent_only_to_subscribers_told_about_the_outage(self):
+        started = datetime(2026, 1, 1)
+        await self.apply({}, incident_started_at=started)
+        self.bot.send_message.assert_not_called()
+
+        await self.apply({"http": True}, incident_started_at=started)
+        self.bot.send_message.assert_called_once()
+        self.set_site_flags_by_id.assert_called_once_with(10, http=False, http_ts=None)
+        self.log_event.assert_not_called()
+
+    def test_recovery_is_logged_once_per_target(self):
+        check = Mock(target_id=1, url="https://t1.example", rows=[(10, None, None, datetime(2026, 1, 1))] * 3)
+        result = ResourceCheckResult(check.url, {"ok": True, "status_code": 200}, 30, 100)
+        with patch.object(scheduler, "clear_target_incident"), patch.object(scheduler, "update_target_status"), \
+                patch.object(scheduler, "update_target_success"), patch.object(scheduler, "set_target_flags"):
+            outcome = scheduler.apply_target_result(check, {"http_fail_count": 5}, result, "up")
+
+        self.log_event.assert_called_once_with(check.url, "Сайт восстановился")
+        self.assertEqual(outcome.http_fail_count, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
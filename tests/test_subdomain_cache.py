@@ -0,0 +1,152 @@
+import asyncio
+import sys
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from bot.checks.subdomain_cache import SubdomainScanCache
+from bot.checks.subfinder import CrtShProgress
+
+
+class FakeCrtSh:
+    """Источник crt.sh: записи (id, имя) от новых к старым, как отдаёт настоящий."""
+
+    def __init__(self, entries, truncated=None):
+        self.entries = entries
+        self.truncated = truncated
+        self.calls = []
+
+    async def __call__(self, domain, session=None, on_progress=None, min_id=None):
+        self.calls.append(min_id)
+        await asyncio.sleep(0)
+        progress = CrtShProgress(truncated=self.truncated, done=True)
+        found = set()
+        for entry_id, name in self.entries:
+            progress.max_id = max(progress.max_id or 0, entry_id)
+            if min_id is not None and entry_id <= min_id:
+                break
+            found.add(name)
+        await on_progress(progress)
+        return found
+
+
+class SubdomainScanCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.stored = {}
+        self.crtsh = FakeCrtSh([(30, "b.example.com"), (20, "a.example.com")])
+
+        def load(domain):
+            return self.stored.get(domain)
+
+        def save(domain, subdomains, scanned_at, last_crtsh_id):
+            self.stored[domain] = {"subdomains": subdomains, "scanned_at": scanned_at, "last_crtsh_id": last_crtsh_id}
+
+        self.cache = SubdomainScanCache(ttl=3600, load=load, save=save, sources={"crt.sh": self.crtsh})
+
+    def test_repeat_scan_is_served_from_cache(self):
+        first = asyncio.run(self.cache.scan("example.com"))
+        second = asyncio.run(self.cache.scan("example.com"))
+
+        self.assertFalse(first.from_cache)
+        self.assertTrue(second.from_cache)
+        self.assertEqual(second.subdomains, ["a.example.com", "b.example.com"])
+        self.assertEqual(self.crtsh.calls, [None])
+        self.assertEqual(self.stored["example.com"]["last_crtsh_id"], 30)
+
+    def test_fresh_store_row_skips_discovery(self):
+        self.stored["example.com"] = {
+            "subdomains": ["old.example.com"], "scanned_at": datetime.utcnow(), "last_crtsh_id": 10,
+        }
+
+        scan = asyncio.run(self.cache.scan("example.com"))
+
+        self.assertTrue(scan.from_cache)
+        self.assertEqual(scan.subdomains, ["old.example.com"])
+        self.assertEqual(self.crtsh.calls, [])
+
+    def test_stale_store_row_is_refreshed_incrementally(self):
+        self.stored["example.com"] = {
+            "subdomains": ["a.example.com", "old.example.com"],
+            "scanned_at": datetime.utcnow() - timedelta(hours=2),
+            "last_crtsh_id": 20,
+        }
+
+        scan = asyncio.run(self.cache.scan("example.com"))
+
+        self.assertEqual(self.crtsh.calls, [20])
+        self.assertEqual(scan.subdomains, ["a.example.com", "b.example.com", "old.example.com"])
+        self.assertEqual(scan.added, 1)
+        self.assertEqual(self.stored["example.com"]["last_crtsh_id"], 30)
+        self.assertEqual(self.cache.stats()["incremental_scans"], 1)
+
+    def test_truncated_crtsh_answer_keeps_previous_id(self):
+        self.crtsh.truncated = "bytes"
+        scanned_at = datetime.utcnow() - timedelta(hours=2)
+        self.stored["example.com"] = {"subdomains": [], "scanned_at": scanned_at, "last_crtsh_id": 5}
+
+        scan = asyncio.run(self.cache.scan("example.com"))
+
+        self.assertFalse(scan.complete)
+        self.assertEqual(self.stored["example.com"]["last_crtsh_id"], 5)
+        # Имена сохранены, но строка осталась устаревшей.
+        self.assertEqual(self.stored["example.com"]["subdomains"], ["a.example.com", "b.example.com"])
+        self.assertEqual(self.stored["example.com"]["scanned_at"], scanned_at)
+
+    def test_incomplete_scan_is_retried_after_short_ttl(self):
+        async def broken(domain, session=None, on_progress=None):
+            raise OSError("нет сети")
+
+        async def other(domain, session=None, on_progress=None):
+            return {"c.example.com"}
+
+        self.cache = SubdomainScanCache(
+            ttl=3600,
+            load=lambda domain: self.stored.get(domain),
+            save=lambda domain, subdomains, scanned_at, last_crtsh_id: self.stored.__setitem__(
+                domain, {"subdomains": subdomains, "scanned_at": scanned_at, "last_crtsh_id": last_crtsh_id}
+            ),
+            sources={"crt.sh": broken, "other": other},
+            incomplete_ttl=0,
+        )
+
+        async def run():
+            return await self.cache.scan("example.com"), await self.cache.scan("example.com")
+
+        first, second = asyncio.run(run())
+
+        self.assertFalse(first.complete)
+        self.assertFalse(second.from_cache)
+        self.assertEqual(second.subdomains, ["c.example.com"])
+        self.assertEqual(self.cache.stats()["full_scans"], 2)
+        self.assertIsNone(self.stored["example.com"]["last_crtsh_id"])
+
+    def test_failed_sources_are_not_cached(self):
+        async def broken(domain, session=None, on_progress=None):
+            raise OSError("нет сети")
+
+        cache = SubdomainScanCache(ttl=3600, sources={"crt.sh": broken})
+
+        async def run():
+            await cache.scan("example.com")
+            await cache.scan("example.com")
+
+        asyncio.run(run())
+        self.assertEqual(cache.stats()["full_scans"], 2)
+
+    def test_concurrent_scans_share_one_discovery(self):
+        async def run():
+            return await asyncio.gather(*(self.cache.scan("example.com") for _ in range(3)))
+
+        results = asyncio.run(run())
+
+        self.assertEqual(self.crtsh.calls, [None])
+        self.assertEqual({tuple(scan.subdomains) for scan in results}, {("a.example.com", "b.example.com")})
+        self.assertEqual(self.cache.stats()["joined"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
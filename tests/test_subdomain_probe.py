@@ -0,0 +1,104 @@
+import asyncio
+import csv
+import os
+import sys
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from aiohttp import web
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from bot.checks import subdomain_probe
+from bot.checks.subdomain_probe import STATUS_RESOLVED, STATUS_UNRESOLVED, STATUS_WILDCARD, validate_subdomains
+from bot.checks.subfinder import export_subdomains_csv
+from bot.infra.dns_resolver import DnsResolver
+from bot.infra.http_client import create_http_session
+
+
+def fake_resolver(delay=0.0):
+    async def lookup(hostname):
+        await asyncio.sleep(delay)
+        return None if hostname.startswith("dead") else "127.0.0.1"
+
+    return DnsResolver(lookup=lookup)
+
+
+class BulkResolveTest(unittest.TestCase):
+    # Обычный asyncio.run: IsolatedAsyncioTestCase включает debug-режим цикла и искажает замер.
+    def test_thousands_of_names_resolve_concurrently(self):
+        names = [f"{'dead' if i % 4 == 0 else 'host'}{i}.example.com" for i in range(2000)] + ["*.example.com"]
+        progress = []
+
+        started = time.monotonic()
+        probes = asyncio.run(validate_subdomains(
+            names, resolver=fake_resolver(delay=0.05), concurrency=200, on_progress=lambda done, total: progress.append(done)
+        ))
+        elapsed = time.monotonic() - started
+
+        # 2000 lookups по 50 мс последовательно заняли бы 100 с.
+        self.assertLess(elapsed, 5)
+        self.assertEqual([probe.name for probe in probes], names)
+        self.assertEqual(probes[0].status, STATUS_UNRESOLVED)
+        self.assertEqual((probes[1].ip, probes[1].status), ("127.0.0.1", STATUS_RESOLVED))
+        self.assertEqual(probes[-1].status, STATUS_WILDCARD)
+        self.assertEqual(sum(probe.alive for probe in probes), 1500)
+        self.assertEqual(progress[-1], len(names))
+
+
+class SubdomainValidationTest(unittest.IsolatedAsyncioTestCase):
+    async def test_http_probe_uses_resolved_ip_and_falls_back_to_http(self):
+        hosts = []
+
+        async def handler(request):
+            hosts.append(request.headers["Host"])
+            return web.Response(status=204 if request.headers["Host"].startswith("api") else 200)
+
+        app = web.Application()
+        app.router.add_get("/", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        sessions = []
+
+        def own_session(**kwargs):
+            sessions.append(kwargs)
+            return create_http_session(**kwargs)
+
+        try:
+            with patch.dict(subdomain_probe.HTTP_PROBE_PORTS, {"https": port, "http": port}), \
+                    patch("bot.infra.http_client.create_http_session", own_session):
+                probes = await validate_subdomains(
+                    ["www.example.com", "api.example.com", "dead.example.com"],
+                    probe_http=True,
+                    resolver=fake_resolver(),
+                    concurrency=50,
+                )
+        finally:
+            await runner.cleanup()
+
+        # Без переданной сессии зонд открывает свою на concurrency соединений, а не берёт пул мониторинга.
+        self.assertEqual(sessions, [{"limit": 50, "limit_per_host": 0}])
+        self.assertEqual([probe.status for probe in probes], ["200", "204", STATUS_UNRESOLVED])
+        self.assertEqual(sorted(hosts), ["api.example.com", "www.example.com"])
+        self.assertIsNotNone(probes[0].latency_ms)
+
+        path = await export_subdomains_csv([probe.name for probe in probes], "example.com", probes)
+        try:
+            with open(path, newline="", encoding="utf-8") as f:
+                rows = list(csv.reader(f))
+        finally:
+            os.remove(path)
+        self.assertEqual(rows[0], ["Subdomain", "IP", "Status", "Latency ms"])
+        self.assertEqual(rows[1][:3], ["www.example.com", "127.0.0.1", "200"])
+        self.assertEqual(rows[3], ["dead.example.com", "", STATUS_UNRESOLVED, ""])
+
+
+if __name__ == "__main__":
+    unittest.main()
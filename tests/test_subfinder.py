@@ -0,0 +1,215 @@
+import asyncio
+import json
+import sys
+import unittest
+from pathlib import Path
+
+from aiohttp import web
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from functools import partial
+
+from bot.checks.subfinder import discover_subdomains, fetch_crtsh_subdomains, fetch_dnsdumpster_subdomains
+from bot.infra.http_client import close_http_session, create_http_session
+
+
+def crtsh_entries(count):
+    return [
+        {"id": i, "name_value": f"host{i % 50}.example.com\n*.example.com\nEXAMPLE.COM\nevil-example.com"}
+        for i in range(count)
+    ]
+
+
+class CrtShStreamTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.body = json.dumps(crtsh_entries(2000)).encode()
+        self.queries = []
+
+        async def crtsh(request):
+            self.queries.append(dict(request.query))
+            resp = web.StreamResponse(headers={"Content-Type": "application/json"})
+            await resp.prepare(request)
+            for offset in range(0, len(self.body), 4096):
+                await resp.write(self.body[offset:offset + 4096])
+                await asyncio.sleep(0)
+            await resp.write_eof()
+            return resp
+
+        app = web.Application()
+        app.router.add_get("/", crtsh)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/"
+        self.session = create_http_session()
+
+    async def asyncTearDown(self):
+        await close_http_session(self.session)
+        await self.runner.cleanup()
+
+    async def test_streams_and_dedups_names(self):
+        updates = []
+
+        subdomains = await fetch_crtsh_subdomains(
+            "example.com", session=self.session, on_progress=updates.append, url=self.url
+        )
+
+        self.assertEqual(self.queries, [{"q": "%.example.com", "output": "json"}])
+        self.assertEqual(len(subdomains), 52)
+        self.assertIn("*.example.com", subdomains)
+        self.assertNotIn("evil-example.com", subdomains)
+        final = updates[-1]
+        self.assertTrue(final.done)
+        self.assertIsNone(final.truncated)
+        self.assertEqual((final.entries, final.bytes_read), (2000, len(self.body)))
+        # Прогресс приходит по мере чтения, а не один раз в конце.
+        self.assertGreater(len(updates), 5)
+
+    async def test_limits_stop_reading_early(self):
+        for limits, reason in (
+            ({"max_bytes": 10000}, "bytes"),
+            ({"max_entries": 100}, "entries"),
+            ({"max_subdomains": 10}, "subdomains"),
+        ):
+            with self.subTest(reason=reason):
+                updates = []
+                subdomains = await fetch_crtsh_subdomains(
+                    "example.com", session=self.session, on_progress=updates.append, url=self.url, **limits
+                )
+
+                self.assertEqual(updates[-1].truncated, reason)
+                self.assertLess(updates[-1].bytes_read, len(self.body))
+                self.assertTrue(subdomains)
+
+    async def test_min_id_stops_at_first_known_entry(self):
+        self.body = json.dumps(list(reversed(crtsh_entries(2000)))).encode()
+        updates = []
+
+        subdomains = await fetch_crtsh_subdomains(
+            "example.com", session=self.session, on_progress=updates.append, url=self.url, min_id=1990
+        )
+
+        final = updates[-1]
+        self.assertEqual(final.max_id, 1999)
+        self.assertEqual(final.skipped, 1)
+        self.assertLess(final.bytes_read, len(self.body))
+        self.assertIn("host41.example.com", subdomains)
+        self.assertNotIn("host40.example.com", subdomains)
+
+
+DNSDUMPSTER_FORM = '<form><input type="hidden" name="csrfmiddlewaretoken" value="tok123"></form>'
+DNSDUMPSTER_TABLE = """
+<table class="table table-bordered table-hover">
+  <tr><td>mail.example.com<br>smtp banner</td><td>1.2.3.4</td></tr>
+  <tr><td>host1.example.com</td><td>1.2.3.5</td></tr>
+  <tr><td>other.org</td><td>1.2.3.6</td></tr>
+</table>
+"""
+
+
+class SubdomainDiscoveryTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.token = "tok123"
+        self.posts = []
+
+        async def crtsh(request):
+            await asyncio.sleep(0.05)
+            return web.json_response(crtsh_entries(3))
+
+        async def dnsdumpster_form(request):
+            await asyncio.sleep(0.3)
+            return web.Response(text=DNSDUMPSTER_FORM.replace("tok123", self.token), content_type="text/html")
+
+        async def dnsdumpster_search(request):
+            self.posts.append(dict(await request.post()))
+            return web.Response(text=DNSDUMPSTER_TABLE, content_type="text/html")
+
+        async def hanging(request):
+            await asyncio.sleep(30)
+            return web.Response(text="[]")
+
+        async def stalled(request):
+            # Первые записи приходят сразу, остаток ответа — никогда.
+            resp = web.StreamResponse()
+            await resp.prepare(request)
+            await resp.write(json.dumps(crtsh_entries(2))[:-1].encode() + b",")
+            await asyncio.sleep(30)
+            return resp
+
+        app = web.Application()
+        app.router.add_get("/crtsh/", crtsh)
+        app.router.add_get("/dnsdumpster", dnsdumpster_form)
+        app.router.add_post("/dnsdumpster", dnsdumpster_search)
+        app.router.add_get("/hanging/", hanging)
+        app.router.add_get("/stalled/", stalled)
+        # Отменяем обработчик, когда клиент отключился, чтобы cleanup не ждал «зависший» ответ.
+        self.runner = web.AppRunner(app, handler_cancellation=True)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        base = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+        self.session = create_http_session()
+        self.sources = {
+            "crt.sh": partial(fetch_crtsh_subdomains, url=f"{base}/crtsh/"),
+            "dnsdumpster": partial(fetch_dnsdumpster_subdomains, url=f"{base}/dnsdumpster"),
+        }
+        self.hanging = partial(fetch_crtsh_subdomains, url=f"{base}/hanging/")
+        self.stalled = partial(fetch_crtsh_subdomains, url=f"{base}/stalled/")
+
+    async def asyncTearDown(self):
+        await close_http_session(self.session)
+        await self.runner.cleanup()
+
+    async def test_sources_run_concurrently_and_merge(self):
+        finished = []
+
+        discovery = await discover_subdomains(
+            "example.com",
+            sources=self.sources,
+            session=self.session,
+            on_source_done=lambda result, merged: finished.append((result.name, len(merged))),
+        )
+
+        self.assertEqual(
+            discovery.subdomains,
+            ["*.example.com", "example.com", "host0.example.com", "host1.example.com", "host2.example.com",
+             "mail.example.com"],
+        )
+        # Быстрый источник отдаёт результат первым, не дожидаясь медленного.
+        self.assertEqual(finished, [("crt.sh", 5), ("dnsdumpster", 6)])
+        self.assertEqual(self.posts, [{"csrfmiddlewaretoken": "tok123", "targetip": "example.com"}])
+        self.assertTrue(all(result.ok for result in discovery.sources))
+
+    async def test_failing_and_slow_sources_do_not_block_results(self):
+        self.token = ""
+        sources = dict(self.sources, hanging=self.hanging)
+
+        started = asyncio.get_running_loop().time()
+        discovery = await discover_subdomains("example.com", sources=sources, session=self.session, deadline=1)
+        elapsed = asyncio.get_running_loop().time() - started
+
+        by_name = {result.name: result for result in discovery.sources}
+        self.assertLess(elapsed, 2)
+        self.assertEqual(len(discovery.subdomains), 5)
+        self.assertTrue(by_name["crt.sh"].ok)
+        self.assertIn("CSRF", by_name["dnsdumpster"].error)
+        self.assertTrue(by_name["hanging"].timed_out)
+
+    async def test_source_cut_by_deadline_keeps_names_already_read(self):
+        discovery = await discover_subdomains(
+            "example.com", sources={"crt.sh": self.stalled}, session=self.session, deadline=0.5
+        )
+
+        result = discovery.sources[0]
+        self.assertTrue(result.timed_out)
+        names = ["*.example.com", "example.com", "host0.example.com", "host1.example.com"]
+        self.assertEqual(result.subdomains, set(names))
+        self.assertEqual(discovery.subdomains, names)
+
+
+if __name__ == "__main__":
+    unittest.main()
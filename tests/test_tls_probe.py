@@ -0,0 +1,114 @@
+import asyncio
+import ssl
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from bot.checks.tls_probe import fetch_certificate, parse_certificate
+
+
+def make_certificate(days_valid=30):
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([
+        x509.NameAttribute(NameOID.COMMON_NAME, "localhost"),
+        x509.NameAttribute(NameOID.ORGANIZATION_NAME, "Webcheck Test CA"),
+    ])
+    now = datetime.now(timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(days=1))
+        .not_valid_after(now + timedelta(days=days_valid, hours=1))
+        .add_extension(x509.SubjectAlternativeName([x509.DNSName("localhost")]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    return cert, key
+
+
+class TlsProbeTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        cert, key = make_certificate(days_valid=30)
+        self.cert = cert
+        self.tmp = tempfile.TemporaryDirectory()
+        cert_path = Path(self.tmp.name) / "cert.pem"
+        key_path = Path(self.tmp.name) / "key.pem"
+        cert_path.write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+        key_path.write_bytes(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ))
+        server_ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_ctx.load_cert_chain(cert_path, key_path)
+        self.client_ctx = ssl.create_default_context(cafile=str(cert_path))
+
+        async def handle(reader, writer):
+            try:
+                await reader.read(1)
+            finally:
+                writer.close()
+
+        self.server = await asyncio.start_server(handle, "127.0.0.1", 0, ssl=server_ctx)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.tmp.cleanup()
+
+    async def test_fetches_certificate_metadata_and_timings(self):
+        details = await fetch_certificate("localhost", self.port, ssl_context=self.client_ctx)
+
+        self.assertTrue(details["ok"])
+        self.assertEqual(details["days"], 30)
+        self.assertEqual(details["subject"], "localhost")
+        self.assertEqual(details["issuer"], "Webcheck Test CA")
+        self.assertEqual(details["san"], ["localhost"])
+        self.assertEqual(details["fingerprint"], self.cert.fingerprint(hashes.SHA256()).hex())
+        self.assertIsNotNone(details["connect_ms"])
+        self.assertIsNotNone(details["handshake_ms"])
+
+    async def test_untrusted_certificate_is_reported_as_failure(self):
+        details = await fetch_certificate("localhost", self.port)
+
+        self.assertFalse(details["ok"])
+        self.assertEqual(details["days"], -1)
+        self.assertTrue(details["error"].startswith("TLS:"))
+
+    async def test_closed_port_fails_fast(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+        details = await fetch_certificate("localhost", self.port, ssl_context=self.client_ctx)
+
+        self.assertFalse(details["ok"])
+        self.assertTrue(details["error"].startswith("TCP:"))
+
+
+class ParseCertificateTest(unittest.TestCase):
+    def test_days_are_counted_from_given_moment(self):
+        cert, _ = make_certificate(days_valid=10)
+        der = cert.public_bytes(serialization.Encoding.DER)
+
+        details = parse_certificate(der, now=datetime.now(timezone.utc) + timedelta(days=5))
+
+        self.assertEqual(details["days"], 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
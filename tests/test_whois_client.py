@@ -0,0 +1,245 @@
+import asyncio
+import json
+import sys
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+from aiohttp import web
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from bot.checks.whois_client import RdapClient, WhoisClient, WhoisError, WhoisThrottled, parse_rdap
+from bot.checks.whois_parser import parse_whois
+from bot.infra.http_client import close_http_session, create_http_session
+
+
+class StandInWhoisServer:
+    """Локальный WHOIS-сервер: отвечает по словарю запрос -> текст и считает соединения."""
+
+    def __init__(self, answers, delay=0.0):
+        self.answers = answers
+        self.delay = delay
+        self.queries = []
+        self.active = 0
+        self.max_active = 0
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.address = f"127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+        return self
+
+    async def __aexit__(self, *exc):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            query = (await reader.readline()).decode().strip()
+            self.queries.append(query)
+            await asyncio.sleep(self.delay)
+            writer.write(self.answers.get(query, "No match\r\n").encode())
+            await writer.drain()
+        finally:
+            self.active -= 1
+            writer.close()
+
+
+REGISTRY_ANSWER = (
+    "   Domain Name: EXAMPLE.TEST\r\n"
+    "   Registrar WHOIS Server: {referral}\r\n"
+    "   Registry Expiry Date: 2031-08-13T04:00:00Z\r\n"
+    "   Registrar: Registry View Inc.\r\n"
+)
+
+REGISTRAR_ANSWER = (
+    "Domain Name: example.test\r\n"
+    "Registrar WHOIS Server: {referral}\r\n"
+    "Registrar: Example Registrar LLC\r\n"
+    "Registrar URL: https://registrar.example\r\n"
+)
+
+
+class WhoisClientTest(unittest.IsolatedAsyncioTestCase):
+    async def test_discovers_server_via_iana_and_follows_referral(self):
+        async with StandInWhoisServer({}) as registrar, StandInWhoisServer({}) as registry, \
+                StandInWhoisServer({}) as iana:
+            iana.answers["test"] = f"domain:       TEST\r\nrefer:        {registry.address}\r\n"
+            registry.answers["example.test"] = REGISTRY_ANSWER.format(referral=registrar.address)
+            registrar.answers["example.test"] = REGISTRAR_ANSWER.format(referral=registrar.address)
+            client = WhoisClient(iana_server=iana.address, servers={})
+
+            responses = await client.lookup("example.test")
+            await client.lookup("example.test")
+
+        self.assertEqual([server for server, _ in responses], [registry.address, registrar.address])
+        # Сервер зоны запоминается после первого обращения к IANA.
+        self.assertEqual(iana.queries, ["test"])
+        self.assertEqual(registrar.queries, ["example.test", "example.test"])
+
+    async def test_missing_referral_server_keeps_registry_answer(self):
+        async with StandInWhoisServer({}) as registry:
+            registry.answers["example.test"] = REGISTRY_ANSWER.format(referral="127.0.0.1:1")
+            client = WhoisClient(servers={"test": registry.address}, timeout=1)
+
+            responses = await client.lookup("example.test")
+
+        self.assertEqual(len(responses), 1)
+
+    async def test_slow_server_times_out(self):
+        async with StandInWhoisServer({"example.test": "late"}, delay=1) as registry:
+            client = WhoisClient(servers={"test": registry.address}, timeout=0.1)
+
+            with self.assertRaises(WhoisError):
+                await client.lookup("example.test")
+
+    async def test_connections_per_server_are_limited(self):
+        async with StandInWhoisServer({}, delay=0.05) as registry:
+            client = WhoisClient(
+                servers={"test": registry.address}, max_connections_per_server=2, rate_per_server=1000, burst_per_server=10
+            )
+
+            await asyncio.gather(*(client.lookup(f"d{i}.test") for i in range(6)))
+
+        self.assertEqual(len(registry.queries), 6)
+        self.assertEqual(registry.max_active, 2)
+
+    async def test_token_bucket_paces_queries_to_one_server(self):
+        async with StandInWhoisServer({}) as registry:
+            client = WhoisClient(servers={"test": registry.address}, rate_per_server=20, burst_per_server=2)
+
+            started = asyncio.get_running_loop().time()
+            await asyncio.gather(*(client.lookup(f"d{i}.test") for i in range(6)))
+            elapsed = asyncio.get_running_loop().time() - started
+
+        # 2 запроса сразу, остальные 4 — по одному раз в 50 мс.
+        self.assertGreaterEqual(elapsed, 0.18)
+        self.assertEqual(len(registry.queries), 6)
+
+    async def test_throttling_answer_pauses_server(self):
+        async with StandInWhoisServer({}) as registry:
+            registry.answers["example.test"] = "%% Query rate limit exceeded. Try again later.\r\n"
+            client = WhoisClient(servers={"test": registry.address}, timeout=1, throttle_backoff=60)
+
+            with self.assertRaises(WhoisThrottled) as first:
+                await client.lookup("example.test")
+            with self.assertRaises(WhoisThrottled):
+                await client.lookup("other.test")
+
+        self.assertEqual(first.exception.retry_after, 60)
+        # Пока сервер на паузе, к нему не подключаемся.
+        self.assertEqual(registry.queries, ["example.test"])
+        self.assertEqual(client.stats()["throttled"], 1)
+        self.assertEqual(client.stats()["rejected"], 1)
+
+    async def test_full_queue_rejects_instead_of_waiting(self):
+        async with StandInWhoisServer({}) as registry:
+            client = WhoisClient(
+                servers={"test": registry.address}, rate_per_server=10, burst_per_server=1, max_queue_per_server=2
+            )
+
+            results = await asyncio.gather(
+                *(client.lookup(f"d{i}.test") for i in range(5)), return_exceptions=True
+            )
+
+        rejected = [result for result in results if isinstance(result, WhoisThrottled)]
+        self.assertEqual(len(rejected), 2)
+        self.assertEqual(len(registry.queries), 3)
+
+    def test_parse_merged_answers(self):
+        expires_at, registrar, contact_url = parse_whois(
+            REGISTRY_ANSWER.format(referral="x") + REGISTRAR_ANSWER.format(referral="x")
+        )
+
+        self.assertEqual(expires_at, datetime(2031, 8, 13, 4, 0))
+        self.assertEqual(registrar, "Registry View Inc.")
+        self.assertEqual(contact_url, "https://registrar.example")
+
+
+RDAP_DOMAIN = {
+    "objectClassName": "domain",
+    "ldhName": "example.test",
+    "events": [
+        {"eventAction": "registration", "eventDate": "2001-08-13T04:00:00Z"},
+        {"eventAction": "expiration", "eventDate": "2031-08-13T04:00:00Z"},
+    ],
+    "entities": [
+        {
+            "roles": ["registrar"],
+            "vcardArray": ["vcard", [["version", {}, "text", "4.0"], ["fn", {}, "text", "Example Registrar LLC"]]],
+            "links": [{"href": "https://registrar.example"}],
+        }
+    ],
+}
+
+
+class RdapClientTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.requests = []
+
+        self.bootstrap_down = False
+
+        async def bootstrap(request):
+            self.requests.append(request.path)
+            if self.bootstrap_down:
+                return web.Response(status=503)
+            base = f"http://127.0.0.1:{request.url.port}/rdap/"
+            return web.json_response({"services": [[["test"], [base]]]})
+
+        async def domain(request):
+            self.requests.append(request.path)
+            if request.match_info["name"] != "example.test":
+                return web.Response(status=404)
+            return web.Response(text=json.dumps(RDAP_DOMAIN), content_type="application/rdap+json")
+
+        app = web.Application()
+        app.router.add_get("/dns.json", bootstrap)
+        app.router.add_get("/rdap/domain/{name}", domain)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.now = 0.0
+        self.client = RdapClient(
+            bootstrap_url=f"http://127.0.0.1:{port}/dns.json", timeout=2, retry_after=60, clock=lambda: self.now
+        )
+        self.session = create_http_session()
+
+    async def asyncTearDown(self):
+        await close_http_session(self.session)
+        await self.runner.cleanup()
+
+    async def test_lookup_uses_bootstrap_once(self):
+        data = await self.client.lookup("example.test", session=self.session)
+        missing = await self.client.lookup("missing.test", session=self.session)
+        other_zone = await self.client.lookup("example.org", session=self.session)
+
+        self.assertEqual(parse_rdap(data), (datetime(2031, 8, 13, 4, 0), "Example Registrar LLC", "https://registrar.example"))
+        self.assertIsNone(missing)
+        self.assertIsNone(other_zone)
+        self.assertEqual(self.requests.count("/dns.json"), 1)
+
+    async def test_failed_bootstrap_is_not_retried_until_timeout(self):
+        self.bootstrap_down = True
+        first = await self.client.lookup("example.test", session=self.session)
+        second = await self.client.lookup("example.test", session=self.session)
+
+        self.assertIsNone(first)
+        self.assertIsNone(second)
+        self.assertEqual(self.requests, ["/dns.json"])
+
+        self.bootstrap_down = False
+        self.now = 61
+        data = await self.client.lookup("example.test", session=self.session)
+
+        self.assertIsNotNone(data)
+        self.assertEqual(self.requests.count("/dns.json"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import sys
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from bot.checks.whois_parser import GENERIC_FORMAT, format_for, parse_whois, parse_whois_date
+
+CORPUS = ROOT / "tests" / "whois_corpus"
+
+# Имя файла корпуса: <сервер>__<домен>.txt
+EXPECTED = {
+    "whois.verisign-grs.com__google.com": (datetime(2028, 9, 14, 4, 0), "MarkMonitor Inc.", "http://www.markmonitor.com"),
+    "whois.markmonitor.com__google.com": (datetime(2028, 9, 13, 7, 0), "MarkMonitor, Inc.", "http://www.markmonitor.com"),
+    "whois.tcinet.ru__yandex.ru": (datetime(2027, 9, 30, 21, 0), "RU-CENTER-RU", "https://www.nic.ru/whois"),
+    "whois.tcinet.ru__xn--d1acufc.xn--p1ai": (
+        datetime(2027, 5, 12, 21, 0), "REGRU-RF", "https://www.reg.ru/whois/admin_contact"
+    ),
+    "whois.publicinterestregistry.org__wikipedia.org": (
+        datetime(2029, 1, 13, 0, 12, 14), "MarkMonitor Inc.", "http://www.markmonitor.com"
+    ),
+    "whois.nic.uk__bbc.co.uk": (datetime(2030, 12, 13), "British Broadcasting Corporation [Tag = BBC]", "http://www.bbc.co.uk"),
+    "whois.denic.de__heise.de": (None, None, None),
+    "whois.jprs.jp__nic.ad.jp": (datetime(2027, 3, 31), None, None),
+    "whois.registro.br__registro.br": (datetime(2030, 2, 21), None, None),
+    "whois.nic.fr__afnic.fr": (datetime(2027, 12, 31, 23, 0), "AFNIC", "http://www.afnic.fr"),
+    "whois.nic.io__github.io": (datetime(2027, 3, 8, 21, 31, 17), "MarkMonitor Inc.", "http://www.markmonitor.com"),
+    "whois.nic.cz__nic.cz": (datetime(2032, 3, 15), "REG-CZNIC", None),
+}
+
+
+class WhoisCorpusTest(unittest.TestCase):
+    def test_corpus_is_covered(self):
+        self.assertEqual({path.stem for path in CORPUS.glob("*.txt")}, set(EXPECTED))
+
+    def test_parses_recorded_responses(self):
+        for name, expected in EXPECTED.items():
+            server = name.split("__", 1)[0]
+            text = (CORPUS / f"{name}.txt").read_text(encoding="utf-8")
+            with self.subTest(name=name):
+                self.assertEqual(tuple(parse_whois(text, server)), expected)
+
+    def test_unknown_server_uses_generic_format(self):
+        text = (CORPUS / "whois.tcinet.ru__yandex.ru.txt").read_text(encoding="utf-8")
+
+        self.assertIs(format_for("127.0.0.1:4343"), GENERIC_FORMAT)
+        self.assertEqual(parse_whois(text, "127.0.0.1:4343").expires_at, datetime(2027, 9, 30, 21, 0))
+
+    def test_changed_registry_format_falls_back_to_generic(self):
+        record = parse_whois("registrar: X\nExpiration Date: 2031-01-02\n", "whois.tcinet.ru")
+
+        self.assertEqual(record.expires_at, datetime(2031, 1, 2))
+        self.assertEqual(record.registrar, "X")
+
+
+class WhoisDateTest(unittest.TestCase):
+    def test_known_formats(self):
+        cases = {
+            "2031-08-13": datetime(2031, 8, 13),
+            "2031-08-13T04:00:00Z": datetime(2031, 8, 13, 4, 0),
+            "2031-08-13T04:00:00.000Z": datetime(2031, 8, 13, 4, 0),
+            "2031-08-13T04:00:00+0000": datetime(2031, 8, 13, 4, 0),
+            "2031.08.13 13:00:00": datetime(2031, 8, 13, 13, 0),
+            "2031/08/13": datetime(2031, 8, 13),
+            "20310813": datetime(2031, 8, 13),
+            "13-Aug-2031": datetime(2031, 8, 13),
+            "13 August 2031": datetime(2031, 8, 13),
+            "August 13, 2031": datetime(2031, 8, 13),
+            "13.08.2031": datetime(2031, 8, 13),
+        }
+        for value, expected in cases.items():
+            with self.subTest(value=value):
+                self.assertEqual(parse_whois_date(value), expected)
+
+    def test_unknown_or_invalid_dates(self):
+        for value in ("", "never", "2031-13-45", "31-Foo-2031"):
+            with self.subTest(value=value):
+                self.assertIsNone(parse_whois_date(value))
+
+
+if __name__ == "__main__":
+    unittest.main()